@@ -0,0 +1,110 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the Viterbi algorithm of the HMM taggers
+
+Compares the Viterbi algorithm on the dictionaries with the vectorized
+Viterbi algorithm (with the conversion of the dictionaries and on the
+arrays only) and with the stay/switch Viterbi algorithm for several
+numbers of states, then measures the time and the decoding error of the
+beam-pruned Viterbi algorithm against the exact Viterbi algorithm.
+
+Usage: python bench_hmm_viterbi.py [number of elements]
+"""
+import sys
+import random
+from math import log
+
+import numpy
+from nltk.classify.api import ClassifierI
+
+from tagenwa.tag.hmm import ClassifierBasedHMMTagger, viterbi_arrays, viterbi_switch_arrays, viterbi_beam_arrays
+
+from bench_langid_classify import bench
+
+
+class RandomClassifier(ClassifierI):
+	"""Classifier returning the probabilities given in the featuresets."""
+	
+	def __init__(self, labels):
+		self._labels = labels
+	
+	def labels(self):
+		return self._labels
+	
+	def prob_classify(self, featureset):
+		return featureset
+
+
+class SwitchHMMTagger(ClassifierBasedHMMTagger):
+	"""Tagger with a constant probability to switch to another state."""
+	
+	switch = False
+	
+	def logemit(self, featureset):
+		return featureset
+	
+	def logtrans(self, featureset1, featureset2):
+		return self._get_matrix('switch', lambda states: dict(((s1, s2), self.logswitch(None, None)[s1 != s2])
+			for s1 in states for s2 in states))
+	
+	def has_switch_transitions(self):
+		return self.switch
+	
+	def logswitch(self, featureset1, featureset2):
+		pdiff = 0.1 / len(self.states)
+		return log(1 - pdiff * (len(self.states) - 1)), log(pdiff)
+
+
+if __name__ == '__main__':
+	length = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	rng = random.Random(0)
+	for size in (5, 10, 20, 60, 100):
+		labels = [u'l%03i' % i for i in xrange(size)]
+		tagger = SwitchHMMTagger(RandomClassifier(labels))
+		sequence = [dict((label, log(rng.random())) for label in labels) for i in xrange(length)]
+		print 'states: %i, elements: %i' % (size, length)
+		tagger.vectorize_min_states = size + 1
+		bench('dicts', tagger.viterbi, sequence, repeat=1)
+		tagger.vectorize_min_states = size
+		bench('numpy', tagger.viterbi, sequence, repeat=1)
+		tagger.switch = True
+		tagger.switch_min_states = 0
+		bench('numpy switch', tagger.viterbi, sequence, repeat=1)
+		tagger.switch = False
+		
+		# Arrays only
+		loginit = numpy.zeros(size)
+		logemit = numpy.array([[element[label] for label in labels] for element in sequence])
+		logtrans = tagger.logtrans(None, None)
+		logtrans = numpy.array([[logtrans[i,j] for j in labels] for i in labels])
+		bench('viterbi_arrays', lambda s: viterbi_arrays(loginit, logemit, logtrans), sequence)
+		logstay = numpy.repeat(logtrans[0, 0], length - 1)
+		logswitch = numpy.repeat(logtrans[0, 1], length - 1)
+		bench('switch arrays', lambda s: viterbi_switch_arrays(loginit, logemit, logstay, logswitch), sequence)
+	
+	# Beam-pruned Viterbi algorithm on sequences of peaked emissions with rare switches
+	count = 10
+	generator = numpy.random.RandomState(0)
+	for size in (60, 300):
+		labels = [u'l%03i' % i for i in xrange(size)]
+		tagger = SwitchHMMTagger(RandomClassifier(labels))
+		loginit = numpy.zeros(size)
+		logtrans = tagger.logtrans(None, None)
+		logtrans = numpy.array([[logtrans[i,j] for j in labels] for i in labels])
+		sequences = []
+		for i in xrange(count):
+			# the hidden state switches every 50 elements in average and has the highest emissions
+			states = numpy.cumsum(generator.rand(length) < 0.02) % size
+			logemit = numpy.log(generator.rand(length, size) ** 4)
+			logemit[numpy.arange(length), states] = numpy.log(generator.rand(length) * 0.5 + 0.5)
+			sequences.append(logemit)
+		print 'beam, states: %i, elements: %i, sequences: %i' % (size, length, count)
+		bench('exact', lambda d: [viterbi_arrays(loginit, e, logtrans) for e in d], sequences)
+		exact = [viterbi_arrays(loginit, e, logtrans) for e in sequences]
+		for beam, threshold in ((1, None), (2, None), (5, None), (10, None), (20, None), (None, 5.0), (None, 10.0), (None, 20.0)):
+			decode = lambda d: [viterbi_beam_arrays(loginit, e, logtrans, beam=beam, threshold=threshold) for e in d]
+			bench('beam %s, thr. %s' % (beam, threshold), decode, sequences)
+			paths = decode(sequences)
+			tokens = sum((p != q).sum() for p, q in zip(exact, paths))
+			errors = sum((p != q).any() for p, q in zip(exact, paths))
+			print '    token error rate: %.4f, sequence error rate: %.2f' % (float(tokens) / (count * length), float(errors) / count)
@@ -0,0 +1,76 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the scoring of the n-gram language classifier
+
+Usage: python bench_langid_classify.py [number of tokens] [number of messages]
+"""
+import sys
+import time
+
+from tagenwa.langid.ngram import tokenize, NgramLanguageTraining, NgramLanguageClassifier
+
+
+TEXTS = {
+	u'en': u'The quick brown fox jumps over the lazy dog. When he saw him, he said that the weather was nice.',
+	u'fr': u'Le cœur a ses raisons que la raison ne connaît point. Quand il le vit, il lui dit que le temps était beau.',
+	u'de': u'Der Straßenbahnfahrer überquert die Brücke um 12 Uhr. Als er ihn sah, sagte er, dass das Wetter schön sei.',
+	u'el': u'Σε γνωρίζω από την κόψη του σπαθιού την τρομερή. Σε γνωρίζω από την όψη που με βιά μετράει τη γη.',
+}
+
+
+def reference_logscores(probdists, ngrams):
+	"""Return the log-likelihoods computed language by language from the probability distributions."""
+	return dict((lang, sum(probdist.logprob(ngram) for ngram in ngrams)) for lang, probdist in probdists.iteritems())
+
+
+def bench(name, function, ngrams, repeat=3):
+	best = None
+	for i in xrange(repeat):
+		start = time.time()
+		function(ngrams)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print '  %-18s %.3fs  %10.0f items/s' % (name, best, len(ngrams) / best)
+
+
+if __name__ == '__main__':
+	size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	for n in (2, 3, 4):
+		training = NgramLanguageTraining(n=n)
+		for lang, text in TEXTS.iteritems():
+			training.add(text, lang)
+		classifier = NgramLanguageClassifier(training)
+		probdists = training.get_probdists()
+		tokens = tokenize(u' '.join(TEXTS.values()))
+		tokens = (tokens * (size // len(tokens) + 1))[:size]
+		ngrams = training.get_ngrams(tokens)
+		print 'n = %i, n-grams: %i, languages: %i' % (n, len(ngrams), len(TEXTS))
+		bench('probdists', lambda g: reference_logscores(probdists, g), ngrams)
+		bench('compiled model', classifier._model.logscores, ngrams)
+	
+	# Batch classification of short messages
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+	sentences = [s for text in TEXTS.values() for s in text.split(u'. ')]
+	messages = (sentences * (count // len(sentences) + 1))[:count]
+	training = NgramLanguageTraining(n=3)
+	for lang, text in TEXTS.iteritems():
+		training.add(text, lang)
+	classifier = NgramLanguageClassifier(training)
+	print 'messages: %i' % len(messages)
+	bench('prob_classify_text', lambda m: [classifier.prob_classify_text(t) for t in m], messages)
+	bench('batch', classifier.batch_prob_classify_texts, messages)
+	
+	# Early exit on long documents
+	documents = [u' '.join([text] * 1000) for text in TEXTS.values()]
+	print 'documents: %i, characters: %i' % (len(documents), sum(len(d) for d in documents))
+	bench('classify_text', lambda d: [classifier.classify_text(t) for t in d], documents)
+	bench('margin=50', lambda d: [classifier.classify_text(t, margin=50.0) for t in d], documents)
+	bench('budget=1000', lambda d: [classifier.classify_text(t, budget=1000) for t in d], documents)
+	
+	# Windowed language profile of a mixed document
+	document = u' '.join(TEXTS.values() * 25)
+	tokens = tokenize(document)
+	print 'profile: %i tokens, window: 20' % len(tokens)
+	windows = lambda t: [classifier.prob_classify_text(u''.join(t[i:i+20])) for i in xrange(len(t) - 19)]
+	bench('windows', windows, tokens, repeat=1)
+	bench('language_profile', lambda t: classifier.language_profile(document, 20), tokens, repeat=1)
@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+"""
+Comparison of the exact and hashed n-gram language models
+
+Reports the accuracy, the memory used by the compiled model and the throughput
+of the classifier with exact trigrams and with hashed n-grams of orders 1 to 4
+at several numbers of buckets (see bench_langid_prune.py for the texts).
+
+Usage: python bench_langid_hashed.py [directory] [number of words per test text]
+"""
+import sys
+import time
+
+from tagenwa.langid.ngram import NgramLanguageTraining, HashedNgramLanguageTraining, NgramLanguageClassifier
+
+from bench_langid_prune import read_directory, split
+from bench_langid_classify import TEXTS
+
+
+def model_size(model):
+	"""Return the approximate number of bytes used by a compiled model."""
+	if hasattr(model, '_tables'):
+		return sum(table.itemsize * len(table) for table in model._tables)
+	vectors = model._vectors.copy()
+	size = sys.getsizeof(vectors)
+	for ngram, vector in vectors.iteritems():
+		size += sys.getsizeof(ngram) + sys.getsizeof(vector) + sum(sys.getsizeof(v) for v in vector)
+	return size
+
+
+def evaluate(training, test):
+	"""Return the accuracy, the size of the model and the throughput of the classifier."""
+	classifier = NgramLanguageClassifier(training)
+	start = time.time()
+	correct = sum(1 for lang, text in test if classifier.classify_text(text) == lang)
+	elapsed = time.time() - start
+	return float(correct) / len(test), model_size(classifier._model), len(test) / elapsed
+
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1:
+		lines = read_directory(sys.argv[1])
+	else:
+		lines = dict((lang, text.replace(u'. ', u', ').split(u', ')) for lang, text in TEXTS.iteritems())
+	words = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+	texts, test = split(lines, words)
+	trainings = [('exact n=3', NgramLanguageTraining(n=3))]
+	for bits in (10, 14, 18):
+		trainings.append(('hashed 2^%i' % bits, HashedNgramLanguageTraining(orders=(1, 2, 3, 4), buckets=1 << bits)))
+	print 'languages: %i, training texts: %i, test texts: %i' % (len(lines), len(texts), len(test))
+	print '  %-16s %8s %12s %10s' % ('model', 'accuracy', 'bytes', 'texts/s')
+	for name, training in trainings:
+		for lang, text in texts:
+			training.add(text, lang)
+		accuracy, size, throughput = evaluate(training, test)
+		print '  %-16s %8.3f %12i %10.0f' % (name, accuracy, size, throughput)
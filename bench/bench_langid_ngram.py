@@ -0,0 +1,59 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the n-gram extraction for language identification
+
+Usage: python bench_langid_ngram.py [number of tokens]
+"""
+import itertools
+import sys
+import time
+
+from tagenwa.langid.ngram import tokenize, NgramExtractor, _SPACEPUNCT, _DECIMALS
+from tagenwa.utils.iterators import sliding_tuples
+
+
+TEXT = (
+	u'The quick brown fox jumps over the lazy dog. '
+	u'Le cœur a ses raisons que la raison ne connaît point. '
+	u'Der Straßenbahnfahrer überquert die Brücke um 12 Uhr. '
+	u'Σε γνωρίζω από την κόψη του σπαθιού την τρομερή. '
+)
+
+
+def sliding_ngrams(n):
+	"""Return the previous n-gram function based on sliding tuples."""
+	if n <= 2:
+		check_not_none = []
+	else:
+		check_not_none = [(n - 1) / 2] if n % 2 else [n / 2 -1, n / 2]
+	def get_ngrams(token):
+		if _SPACEPUNCT.match(token) is not None or _DECIMALS.match(token) is not None:
+			return []
+		return [u''.join(tu) for tu in sliding_tuples(token.lower(), n, fill_value=u' ') if all(tu[i] != u' ' for i in check_not_none)]
+	return get_ngrams
+
+
+def bench(name, function, tokens, repeat=3):
+	best = None
+	for i in xrange(repeat):
+		start = time.time()
+		count = len(function(tokens))
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	print '  %-16s %9i n-grams  %.3fs  %10.0f tokens/s' % (name, count, best, len(tokens) / best)
+
+
+if __name__ == '__main__':
+	size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+	tokens = tokenize(TEXT)
+	tokens = (tokens * (size // len(tokens) + 1))[:size]
+	print 'tokens: %i' % len(tokens)
+	for n in xrange(1, 6):
+		print 'n = %i' % n
+		reference = sliding_ngrams(n)
+		extractor = NgramExtractor(n)
+		hashed = NgramExtractor(n, hashed=True, buckets=1 << 20)
+		bench('sliding_tuples', lambda t: list(itertools.chain.from_iterable(reference(token) for token in t)), tokens)
+		bench('per token', lambda t: list(itertools.chain.from_iterable(extractor(token) for token in t)), tokens)
+		bench('batch', extractor.batch, tokens)
+		bench('batch (hashed)', hashed.batch, tokens)
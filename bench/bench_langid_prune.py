@@ -0,0 +1,133 @@
+# -*- coding: UTF-8 -*-
+"""
+Evaluation of the pruning of the n-gram language models
+
+Reports the accuracy, the size and the throughput of the classifier at each
+pruning level. The texts are read from a directory containing one
+subdirectory of text files per language or, without a directory, from the
+first lines of each language of the europarl_raw corpus of NLTK (one line out
+of three is used for the test).
+
+Usage: python bench_langid_prune.py [directory] [number of words per test text]
+"""
+import codecs
+import os
+import sys
+import tempfile
+import time
+
+from tagenwa.langid.ngram import NgramLanguageTraining, NgramLanguageClassifier
+
+
+## Languages of the europarl_raw corpus (code and name of the corpus)
+EUROPARL_LANGUAGES = [
+	('da', 'danish'),
+	('de', 'german'),
+	('el', 'greek'),
+	('en', 'english'),
+	('es', 'spanish'),
+	('fi', 'finnish'),
+	('fr', 'french'),
+	('it', 'italian'),
+	('nl', 'dutch'),
+	('pt', 'portuguese'),
+	('sv', 'swedish'),
+]
+
+## Number of lines of each language read from the europarl_raw corpus
+EUROPARL_LINES = 3000
+
+LEVELS = [
+	{},
+	{'min_count': 2},
+	{'min_count': 3},
+	{'min_count': 5},
+	{'top_k': 1000},
+	{'top_k': 300},
+	{'top_k': 100},
+	{'top_k': 30},
+	{'max_vocabulary': 3000},
+	{'max_vocabulary': 1000},
+	{'max_vocabulary': 300},
+	{'max_vocabulary': 100},
+]
+
+
+def read_directory(path):
+	"""Return the list of lines of each language of the directory."""
+	lines = {}
+	for lang in sorted(os.listdir(path)):
+		directory = os.path.join(path, lang)
+		if not os.path.isdir(directory):
+			continue
+		for name in sorted(os.listdir(directory)):
+			with codecs.open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+				lines.setdefault(lang, []).extend(line.strip() for line in f if line.strip())
+	return lines
+
+
+def read_europarl(max_lines=EUROPARL_LINES):
+	"""Return the first lines of each language of the europarl_raw corpus."""
+	import nltk.corpus.europarl_raw as europarl_raw
+	lines = {}
+	for lang, name in EUROPARL_LANGUAGES:
+		corpus = getattr(europarl_raw, name)
+		lang_lines = lines[lang] = []
+		for fileid in corpus.fileids():
+			lang_lines.extend(line.strip() for line in corpus.raw(fileid).splitlines() if line.strip())
+			if len(lang_lines) >= max_lines:
+				break
+		del lang_lines[max_lines:]
+	return lines
+
+
+def split(lines, words):
+	"""Split the lines of each language into training texts and short test texts."""
+	training = []
+	test = []
+	for lang, lang_lines in lines.iteritems():
+		for i, line in enumerate(lang_lines):
+			if i % 3:
+				training.append((lang, line))
+			else:
+				tokens = line.split()
+				test.extend((lang, u' '.join(tokens[j:j+words])) for j in xrange(0, len(tokens), words))
+	return training, test
+
+
+def evaluate(training, test, **pruning):
+	"""Return the accuracy, the number of n-grams, the size of the model file
+	and the throughput of the classifier pruned with the given options."""
+	classifier = NgramLanguageClassifier(training, **pruning)
+	fd, path = tempfile.mkstemp()
+	os.close(fd)
+	try:
+		classifier.save(path, **pruning)
+		size = os.path.getsize(path)
+	finally:
+		os.remove(path)
+	start = time.time()
+	correct = sum(1 for lang, text in test if classifier.classify_text(text) == lang)
+	elapsed = time.time() - start
+	return float(correct) / len(test), len(classifier._model), size, len(test) / elapsed
+
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1:
+		lines = read_directory(sys.argv[1])
+	else:
+		try:
+			lines = read_europarl()
+		except LookupError:
+			sys.exit('The europarl_raw corpus of NLTK is not installed: give a directory of texts.\n\n' + __doc__.strip())
+	words = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+	texts, test = split(lines, words)
+	training = NgramLanguageTraining(n=3)
+	for lang, text in texts:
+		training.add(text, lang)
+	print 'languages: %i, training texts: %i, test texts: %i' % (len(lines), len(texts), len(test))
+	print '  %-24s %8s %9s %10s %10s' % ('pruning', 'accuracy', 'n-grams', 'bytes', 'texts/s')
+	for pruning in LEVELS:
+		name = ', '.join('%s=%s' % item for item in pruning.items()) or 'none'
+		accuracy, ngrams, size, throughput = evaluate(training, test, **pruning)
+		print '  %-24s %8.3f %9i %10i %10.0f' % (name, accuracy, ngrams, size, throughput)
@@ -0,0 +1,28 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the HMM language tagger
+
+Usage: python bench_langid_tag.py [number of documents]
+"""
+import sys
+
+from tagenwa.langid.ngram import NgramLanguageTraining, NgramLanguageClassifier, NgramHMMLanguageTagger
+
+from bench_langid_classify import TEXTS, bench
+
+
+if __name__ == '__main__':
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	training = NgramLanguageTraining(n=3)
+	for lang, text in TEXTS.iteritems():
+		training.add(text, lang)
+	classifier = NgramLanguageClassifier(training)
+	documents = [u' '.join(TEXTS.values())] * count
+	print 'documents: %i, languages: %i' % (len(documents), len(TEXTS))
+	
+	# Cache of the emissions of the tokens
+	uncached = NgramHMMLanguageTagger(classifier, cache_size=None)
+	tagger = NgramHMMLanguageTagger(classifier)
+	bench('no cache', lambda d: [uncached.tag_text(t) for t in d], documents)
+	bench('cache', lambda d: [tagger.tag_text(t) for t in d], documents)
+	print '  %s' % tagger.cache_info()
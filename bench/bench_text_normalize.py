@@ -0,0 +1,68 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the normalization functions and of the fused normalizer
+
+Usage: python bench_text_normalize.py [text size in MB]
+"""
+import sys
+import time
+
+from tagenwa.text.normalize import normalize_eol, collapse_spaces, remove_ligatures, \
+	remove_combining_marks, Normalizer, StreamNormalizer
+
+
+SAMPLES = [
+	u'The quick brown fox jumps over the lazy dog.\r\n',
+	u'Un cœur d’artichaut, ex   æquo, à côté de l’église.\r\n',
+	u'Der Straßenbahnfahrer überquert die Brücke.\t\t\n',
+	u'Σε γνωρίζω από την κόψη του σπαθιού την τρομερή.\r',
+	u'日本語のテキスト　と  English   words.\n',
+]
+
+
+def make_text(size):
+	"""Return a text of approximately `size` characters."""
+	sample = u''.join(SAMPLES)
+	return sample * (size // len(sample) + 1)
+
+
+def sequential(text):
+	return remove_combining_marks(remove_ligatures(collapse_spaces(normalize_eol(text))))
+
+
+def stream(text, chunk_size=65536):
+	chunks = (text[i:i+chunk_size] for i in xrange(0, len(text), chunk_size))
+	return u''.join(StreamNormalizer().normalize_stream(chunks))
+
+
+def bench(function, text, repeat=3):
+	"""Return the best time of the function over the text."""
+	best = None
+	for i in xrange(repeat):
+		start = time.time()
+		function(text)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+
+if __name__ == '__main__':
+	size = float(sys.argv[1]) if len(sys.argv) > 1 else 4.0
+	text = make_text(int(size * 1024 * 1024))
+	megabytes = len(text.encode('utf-8')) / (1024.0 * 1024.0)
+	normalizer = Normalizer()
+	assert sequential(text) == normalizer.normalize(text) == stream(text)
+	
+	functions = [
+		('normalize_eol', normalize_eol),
+		('collapse_spaces', collapse_spaces),
+		('remove_ligatures', remove_ligatures),
+		('remove_combining_marks', remove_combining_marks),
+		('sequential', sequential),
+		('Normalizer', normalizer.normalize),
+		('StreamNormalizer', stream),
+	]
+	print 'text: %.1f MB (UTF-8)' % megabytes
+	for name, function in functions:
+		elapsed = bench(function, text)
+		print '  %-24s %.3fs  %8.1f MB/s' % (name, elapsed, megabytes / elapsed)
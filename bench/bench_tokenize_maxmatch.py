@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+"""
+Benchmark of the maximum matching segmenter on large synthetic lexicons
+
+Usage: python bench_tokenize_maxmatch.py [lexicon size...]
+"""
+import random
+import sys
+import time
+
+from tagenwa.tokenize.maxmatch import MaximumMatchingSegmenter
+
+
+def random_lexicon(size, alphabet, rng):
+	"""Return a set of random words of 1 to 4 characters from the alphabet."""
+	words = set()
+	while len(words) < size:
+		words.add(u''.join(rng.choice(alphabet) for i in xrange(rng.randint(1, 4))))
+	return sorted(words)
+
+
+def bench(size, text_length=200000, seed=0):
+	rng = random.Random(seed)
+	# 3000 common CJK unified ideographs
+	alphabet = [unichr(o) for o in xrange(0x4E00, 0x4E00 + 3000)]
+	lexicon = random_lexicon(size, alphabet, rng)
+	
+	start = time.time()
+	segmenters = [
+		MaximumMatchingSegmenter(lexicon, method=u'longest'),
+		MaximumMatchingSegmenter(lexicon, method=u'minimum'),
+	]
+	build_time = (time.time() - start) / len(segmenters)
+	
+	# Text made of words of the lexicon and unknown characters
+	parts = []
+	length = 0
+	while length < text_length:
+		part = rng.choice(lexicon) if rng.random() < 0.9 else rng.choice(alphabet)
+		parts.append(part)
+		length += len(part)
+	text = u''.join(parts)
+	
+	print 'lexicon: %i words, trie build: %.2fs' % (size, build_time)
+	for segmenter in segmenters:
+		start = time.time()
+		segments = segmenter.segment(text)
+		elapsed = time.time() - start
+		print '  %-8s %8i chars  %8i segments  %.3fs  %10.0f chars/s' % (
+			segmenter.method, len(text), len(segments), elapsed, len(text) / elapsed)
+
+
+if __name__ == '__main__':
+	sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000, 500000]
+	for size in sizes:
+		bench(size)
@@ -0,0 +1,880 @@
+# -*- coding: UTF-8 -*-
+"""
+Compiled n-gram language models
+
+"""
+__license__ = "MIT"
+
+from array import array
+from math import log
+from itertools import chain, repeat
+from operator import itemgetter
+import heapq
+import json
+import mmap
+import struct
+import sys
+
+from nltk.probability import FreqDist
+
+from tagenwa.utils.cache import LRUCache
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is only required for the batch scoring
+	numpy = None
+
+_NINF = float('-inf')
+
+
+def _require_numpy():
+	"""Raise an ImportError if NumPy is not available."""
+	if numpy is None:
+		raise ImportError('The NumPy module could not be imported.')
+
+
+def _log2(x):
+	"""Return the base 2 logarithm of x (minus infinity for zero)."""
+	return log(x, 2) if x > 0 else _NINF
+
+
+def _normalization(totals, bins, gamma):
+	"""Return the additive smoothing and the denominator of the log-probabilities
+	of each language from its number of n-grams and its number of bins
+	(with the same corner case as NLTK)."""
+	gammas = []
+	denominators = []
+	for total, b in zip(totals, bins):
+		divisor = total + b * gamma
+		if divisor == 0:
+			gammas.append(0.0)
+			denominators.append(0.0)
+		else:
+			gammas.append(float(gamma))
+			denominators.append(_log2(divisor))
+	return gammas, denominators
+
+
+
+def prune_freqdists(freqdists, min_count=None, top_k=None, max_vocabulary=None):
+	"""Return pruned copies of the frequency distributions of the n-grams in each language.
+	
+	The pruning options are applied in the following order:
+	
+	- min_count: remove the n-grams seen less than min_count times in a language,
+	- top_k: keep the top_k most frequent n-grams of each language,
+	- max_vocabulary: keep the max_vocabulary n-grams with the largest total
+	  count over all the languages.
+	
+	The ties are broken by the order of the n-grams so that the pruning is
+	deterministic.
+	
+	>>> from nltk.probability import FreqDist
+	>>> pruned = prune_freqdists({u'en': FreqDist(u'aaabbc'), u'fr': FreqDist(u'ccd')}, min_count=2)
+	>>> sorted(pruned[u'en'].items()), sorted(pruned[u'fr'].items())
+	([(u'a', 3), (u'b', 2)], [(u'c', 2)])
+	>>> pruned = prune_freqdists({u'en': FreqDist(u'aaabbc'), u'fr': FreqDist(u'ccd')}, max_vocabulary=2)
+	>>> sorted(pruned[u'en'].items()), sorted(pruned[u'fr'].items())
+	([(u'a', 3), (u'c', 1)], [(u'c', 2)])
+	
+	:param freqdists: frequency distribution of each language
+	:type freqdists: dict
+	:param min_count: minimum count of the n-grams in a language
+	:type min_count: int
+	:param top_k: maximum number of n-grams in each language
+	:type top_k: int
+	:param max_vocabulary: maximum number of distinct n-grams in all the languages
+	:type max_vocabulary: int
+	:rtype: dict
+	"""
+	counts = {}
+	for lang, fd in freqdists.iteritems():
+		items = fd.iteritems()
+		if min_count is not None:
+			items = [(ngram, c) for ngram, c in items if c >= min_count]
+		if top_k is not None:
+			items = heapq.nsmallest(top_k, items, key=lambda item: (-item[1], item[0]))
+		counts[lang] = dict(items)
+	
+	if max_vocabulary is not None:
+		totals = {}
+		for lang_counts in counts.itervalues():
+			for ngram, c in lang_counts.iteritems():
+				totals[ngram] = totals.get(ngram, 0) + c
+		if len(totals) > max_vocabulary:
+			vocabulary = frozenset(heapq.nsmallest(max_vocabulary, totals, key=lambda ngram: (-totals[ngram], ngram)))
+			for lang in counts:
+				counts[lang] = dict((ngram, c) for ngram, c in counts[lang].iteritems() if ngram in vocabulary)
+	
+	pruned = {}
+	for lang, lang_counts in counts.iteritems():
+		pruned[lang] = FreqDist()
+		pruned[lang].update(lang_counts)
+	return pruned
+
+
+
+## Previous value of an n-gram absent from a version of a `_VectorTable`
+_MISSING = object()
+
+
+class _VectorTable(object):
+	"""Persistent mapping of the n-grams to their vectors.
+	
+	The latest version of the table owns a dict which is updated in place by
+	`update`, while the previous version keeps only the previous vectors of
+	the changed n-grams and a reference to the next version, so that a new
+	version is created in a time proportional to the number of changed
+	n-grams and the latest version is read at the speed of a dict.
+	The state of a version is replaced before its dict is modified, so that
+	the previous versions can still be read during an update (but the
+	updates must not run concurrently).
+	"""
+	
+	def __init__(self, vectors, size=None):
+		# (None, dict) for the latest version or (previous vectors, next version)
+		self._state = (None, vectors)
+		self._size = len(vectors) if size is None else size
+	
+	
+	def __len__(self):
+		return self._size
+	
+	
+	def __contains__(self, ngram):
+		return self.get(ngram, _MISSING) is not _MISSING
+	
+	
+	def get(self, ngram, default=None):
+		"""Return the vector of the n-gram in this version or the default."""
+		table = self
+		while True:
+			previous, following = table._state
+			if previous is None:
+				value = following.get(ngram, default)
+				# The version may have been replaced during the lookup
+				previous = table._state[0]
+				if previous is None or ngram not in previous:
+					return value
+			if ngram in previous:
+				value = previous[ngram]
+				return default if value is _MISSING else value
+			table = table._state[1]
+	
+	
+	def lookup(self, ngrams, default):
+		"""Return the list of the vectors of the n-grams (or the default)."""
+		previous, vectors = self._state
+		if previous is None:
+			get = vectors.get
+			values = [get(ngram, default) for ngram in ngrams]
+			if self._state[0] is None:
+				return values
+		get = self.get
+		return [get(ngram, default) for ngram in ngrams]
+	
+	
+	def copy(self):
+		"""Return a new dict of the vectors of the n-grams in this version."""
+		# Previous vectors of each version from this version to the latest one
+		layers = []
+		table = self
+		while True:
+			previous, following = table._state
+			if previous is None:
+				vectors = dict(following)
+				# The version may have been replaced during the copy
+				previous = table._state[0]
+				if previous is not None:
+					layers.append(previous)
+				break
+			layers.append(previous)
+			table = following
+		for previous in reversed(layers):
+			for ngram, vector in previous.iteritems():
+				if vector is _MISSING:
+					vectors.pop(ngram, None)
+				else:
+					vectors[ngram] = vector
+		return vectors
+	
+	
+	def update(self, changes):
+		"""Return a new version where the n-grams have the vectors of the changes.
+		
+		This version is not modified. If it is not the latest version,
+		the new version is a copy of the whole table.
+		"""
+		previous, vectors = self._state
+		if previous is not None:
+			vectors = self.copy()
+			vectors.update(changes)
+			return _VectorTable(vectors)
+		previous = dict((ngram, vectors.get(ngram, _MISSING)) for ngram in changes)
+		added = sum(1 for vector in previous.itervalues() if vector is _MISSING)
+		version = _VectorTable(vectors, self._size + added)
+		self._state = (previous, version)
+		vectors.update(changes)
+		return version
+
+
+
+class NgramLanguageModel(object):
+	"""Compiled table of the log-probabilities of the n-grams in each language.
+	
+	The log-probabilities are the ones of the expected likelihood estimation
+	(`ELEProbDist`) of the frequency distribution of each language,
+	in base 2 as returned by NLTK:
+	
+	    logprob(g, l) = log2(count(g, l) + gamma) - log2(N(l) + gamma * B(l))
+	
+	Each n-gram is mapped to a packed vector of its numerators in all the languages,
+	so that the log-likelihood of a sequence of n-grams in all the languages is
+	the sum of their vectors minus the number of n-grams times the vector of
+	the denominators. The n-grams unseen in every language are mapped to the
+	unseen vector.
+	
+	>>> from nltk.probability import FreqDist
+	>>> model = NgramLanguageModel.from_freqdists({u'en': FreqDist(u'abcd'), u'fr': FreqDist(u'abc')})
+	>>> sorted(model.languages)
+	[u'en', u'fr']
+	>>> dict(zip(model.languages, model.logprob(u'a')))[u'en']
+	-2.0
+	"""
+	
+	def __init__(self, languages, vectors, unseen, denominators):
+		"""Create a new compiled n-gram language model.
+		
+		:param languages: list of the languages
+		:type languages: list
+		:param vectors: numerators of the log-probabilities of each n-gram in each language
+		:type vectors: dict of tuples or _VectorTable
+		:param unseen: numerators of the log-probabilities of the unseen n-grams
+		:type unseen: tuple
+		:param denominators: denominators of the log-probabilities in each language
+		:type denominators: tuple
+		"""
+		self.languages = list(languages)
+		self._vectors = vectors if isinstance(vectors, _VectorTable) else _VectorTable(vectors)
+		self._unseen = tuple(unseen)
+		self._denominators = tuple(denominators)
+		self._arrays = None
+	
+	
+	@classmethod
+	def from_freqdists(cls, freqdists, gamma=0.5):
+		"""Compile the model from the frequency distributions of the n-grams in each language.
+		
+		:param freqdists: frequency distribution of each language
+		:type freqdists: dict
+		:param gamma: additive smoothing of the counts (0.5 for the expected likelihood estimation)
+		:type gamma: float
+		"""
+		languages = list(freqdists)
+		fds = [freqdists[lang] for lang in languages]
+		
+		gammas, denominators = _normalization([fd.N() for fd in fds], [fd.B() for fd in fds], gamma)
+		unseen = tuple(_log2(g) for g in gammas)
+		
+		# Vector of the numerators of each n-gram seen in at least one language
+		vectors = {}
+		for ngram in set().union(*fds):
+			vectors[ngram] = tuple(_log2(fd[ngram] + g) for fd, g in zip(fds, gammas))
+		return cls(languages, vectors, unseen, denominators)
+	
+	
+	def update(self, language, freqdist, ngrams=None, gamma=0.5):
+		"""Return a new model where the column of a language is compiled from
+		its new frequency distribution (or added if the language is new).
+		
+		Only the vectors of the given n-grams are recompiled and the other
+		vectors are shared with this model, which is not modified: the new
+		model is created in a time proportional to the number of n-grams
+		(see `_VectorTable`). If the n-grams are None, the n-grams of the
+		frequency distribution and the n-grams seen in the previous column of
+		the language are recompiled. A new language is appended after the
+		other languages so that their indexes do not change, but every vector
+		is extended (as when the smoothing of the language changes).
+		
+		:param language: language to update
+		:param freqdist: new frequency distribution of the language
+		:type freqdist: FreqDist
+		:param ngrams: n-grams whose counts changed in the language (None if unknown)
+		:type ngrams: iterable
+		:param gamma: additive smoothing of the counts
+		:type gamma: float
+		:rtype: NgramLanguageModel
+		"""
+		(g,), (denominator,) = _normalization([freqdist.N()], [freqdist.B()], gamma)
+		numerator = _log2(g)
+		languages = list(self.languages)
+		denominators = list(self._denominators)
+		unseen = list(self._unseen)
+		if language in languages:
+			i = languages.index(language)
+			if unseen[i] != numerator:
+				# The smoothing of the language changed: recompile its whole column
+				ngrams = self._vectors.copy()
+			elif ngrams is None:
+				ngrams = set(freqdist).union(ngram for ngram, vector in self._vectors.copy().iteritems() if vector[i] != unseen[i])
+			denominators[i] = denominator
+			unseen[i] = numerator
+			vectors = self._vectors
+		else:
+			i = len(languages)
+			languages.append(language)
+			denominators.append(denominator)
+			unseen.append(numerator)
+			ngrams = freqdist
+			vectors = _VectorTable(dict((ngram, vector + (numerator,)) for ngram, vector in self._vectors.copy().iteritems()))
+		unseen = tuple(unseen)
+		get = vectors.get
+		changes = {}
+		for ngram in ngrams:
+			vector = get(ngram, unseen)
+			changes[ngram] = vector[:i] + (_log2(freqdist[ngram] + g),) + vector[i+1:]
+		return NgramLanguageModel(languages, vectors.update(changes), unseen, denominators)
+	
+	
+	def __len__(self):
+		"""Return the number of n-grams in the model."""
+		return len(self._vectors)
+	
+	
+	def __contains__(self, ngram):
+		"""Return True if the n-gram is seen in at least one language."""
+		return ngram in self._vectors
+	
+	
+	def logprob(self, ngram):
+		"""Return the list of the log-probabilities of the n-gram in each language."""
+		vector = self._lookup([ngram])[0]
+		return [v - d for v, d in zip(vector, self._denominators)]
+	
+	
+	def unseen_logprob(self):
+		"""Return the list of the log-probabilities of an n-gram unseen in each language."""
+		return [v - d for v, d in zip(self._unseen, self._denominators)]
+	
+	
+	def logscores(self, ngrams, indexes=None):
+		"""Return the list of the log-likelihoods of the sequence of n-grams in each language.
+		
+		:param ngrams: sequence of n-grams
+		:type ngrams: list
+		:param indexes: indexes of the languages to score (all the languages if None)
+		:type indexes: list
+		:rtype: list
+		"""
+		vectors = self._lookup(ngrams)
+		denominators = self._denominators
+		if indexes is not None:
+			# Keep only the columns of the languages to score
+			if len(indexes) == 1:
+				i = indexes[0]
+				vectors = [(vector[i],) for vector in vectors]
+			else:
+				vectors = map(itemgetter(*indexes), vectors)
+			denominators = [denominators[i] for i in indexes]
+		if not vectors:
+			return [0.0] * len(denominators)
+		count = len(vectors)
+		# Sum the vectors column by column
+		return [sum(column) - count * d for column, d in zip(zip(*vectors), denominators)]
+	
+	
+	def _lookup(self, ngrams):
+		"""Return the list of the vectors of the n-grams."""
+		return self._vectors.lookup(ngrams, self._unseen)
+	
+	
+	def get_arrays(self):
+		"""Return the model as NumPy arrays (requires NumPy).
+		
+		:return: tuple (index, numerators, denominators) where index maps each
+			n-gram to a row of the matrix of numerators (the last row is the
+			unseen vector) and denominators is the vector of denominators
+		:rtype: tuple
+		"""
+		_require_numpy()
+		if self._arrays is None:
+			vectors = self._vectors.copy()
+			ngrams = list(vectors)
+			index = dict((ngram, i) for i, ngram in enumerate(ngrams))
+			numerators = numpy.array([vectors[ngram] for ngram in ngrams] + [self._unseen], dtype=numpy.float64)
+			numerators = numerators.reshape((len(ngrams) + 1, len(self.languages)))
+			denominators = numpy.array(self._denominators, dtype=numpy.float64)
+			self._arrays = (index, numerators, denominators)
+		return self._arrays
+	
+	
+	def batch_logscores(self, sequences):
+		"""Return the log-likelihoods of many sequences of n-grams in each language (requires NumPy).
+		
+		The sequences are counted into a sparse sequence-by-n-gram matrix
+		(in coordinate format) which is multiplied by the matrix of numerators.
+		
+		:param sequences: list of sequences of n-grams
+		:type sequences: list
+		:return: array of shape (number of sequences, number of languages)
+		:rtype: numpy.ndarray
+		"""
+		index, numerators, denominators = self.get_arrays()
+		size = len(numerators)
+		lengths = numpy.array([len(ngrams) for ngrams in sequences], dtype=numpy.int64)
+		rows = self._get_rows(index, sequences, int(lengths.sum()))
+		docs = numpy.repeat(numpy.arange(len(sequences), dtype=numpy.int64), lengths)
+		
+		# Count the distinct pairs (sequence, n-gram), sorted by sequence
+		keys, counts = numpy.unique(docs * size + rows, return_counts=True)
+		docs, rows = numpy.divmod(keys, size)
+		
+		# Multiply the sparse matrix of counts by the matrix of numerators
+		scores = numpy.zeros((len(sequences), len(self.languages)), dtype=numpy.float64)
+		if len(keys):
+			products = numerators[rows] * counts[:, numpy.newaxis]
+			starts = numpy.flatnonzero(numpy.concatenate(([True], docs[1:] != docs[:-1])))
+			scores[docs[starts]] = numpy.add.reduceat(products, starts, axis=0)
+		scores -= lengths[:, numpy.newaxis] * denominators
+		return scores
+	
+	
+	def _get_rows(self, index, sequences, total):
+		"""Return the array of the rows of the n-grams of all the sequences in the matrix of numerators."""
+		unseen = len(index)
+		return numpy.fromiter(map(index.get, chain.from_iterable(sequences), repeat(unseen, total)),
+			dtype=numpy.int64, count=total)
+
+
+
+class HashedNgramLanguageModel(NgramLanguageModel):
+	"""Compiled language model of hashed n-grams (integer ids lower than a number of buckets).
+	
+	The numerators of the log-probabilities of the buckets are stored in one
+	fixed-size array of single precision floats per language, so that the size
+	of the model only depends on the number of buckets and of languages.
+	The log-probabilities of a bucket are the ones of the expected likelihood
+	estimation of its count as in `NgramLanguageModel`.
+	
+	>>> from array import array
+	>>> model = HashedNgramLanguageModel.from_counts({u'en': array('L', [1, 1, 0, 0])})
+	>>> [round(logscore, 6) for logscore in model.logscores([0, 0, 1])]
+	[-3.0]
+	"""
+	
+	def __init__(self, languages, tables, unseen, denominators):
+		"""Create a new compiled language model of hashed n-grams.
+		
+		:param languages: list of the languages
+		:type languages: list
+		:param tables: array of the numerators of the log-probabilities of the buckets in each language
+		:type tables: list of arrays
+		:param unseen: numerators of the log-probabilities of an empty bucket in each language
+		:type unseen: tuple
+		:param denominators: denominators of the log-probabilities in each language
+		:type denominators: tuple
+		"""
+		self.buckets = len(tables[0]) if tables else 0
+		self._tables = tables
+		super(HashedNgramLanguageModel, self).__init__(languages, {}, unseen, denominators)
+	
+	
+	@classmethod
+	def from_counts(cls, counts, gamma=0.5):
+		"""Compile the model from the arrays of the counts of the buckets in each language.
+		
+		:param counts: array of the counts of the buckets of each language
+		:type counts: dict
+		:param gamma: additive smoothing of the counts
+		:type gamma: float
+		"""
+		languages = list(counts)
+		arrays = [counts[lang] for lang in languages]
+		gammas, denominators = _normalization([sum(a) for a in arrays], [len(a) - a.count(0) for a in arrays], gamma)
+		tables = [_compile_table(a, g) for a, g in zip(arrays, gammas)]
+		unseen = tuple(_log2(g) for g in gammas)
+		return cls(languages, tables, unseen, denominators)
+	
+	
+	def update(self, language, counts, ngrams=None, gamma=0.5):
+		"""Return a new model where the table of a language is compiled from
+		its new array of counts (or added if the language is new).
+		
+		The tables of the other languages are shared with this model,
+		which is not modified. The n-grams are ignored.
+		
+		:param language: language to update
+		:param counts: new array of the counts of the buckets of the language
+		:type counts: array
+		:param gamma: additive smoothing of the counts
+		:type gamma: float
+		:rtype: HashedNgramLanguageModel
+		"""
+		(g,), (denominator,) = _normalization([sum(counts)], [len(counts) - counts.count(0)], gamma)
+		languages = list(self.languages)
+		tables = list(self._tables)
+		unseen = list(self._unseen)
+		denominators = list(self._denominators)
+		if language in languages:
+			i = languages.index(language)
+			tables[i] = _compile_table(counts, g)
+			unseen[i] = _log2(g)
+			denominators[i] = denominator
+		else:
+			languages.append(language)
+			tables.append(_compile_table(counts, g))
+			unseen.append(_log2(g))
+			denominators.append(denominator)
+		return HashedNgramLanguageModel(languages, tables, unseen, denominators)
+	
+	
+	def __len__(self):
+		"""Return the number of buckets of the model."""
+		return self.buckets
+	
+	
+	def __contains__(self, i):
+		"""Return True if the id is a bucket of the model."""
+		return 0 <= i < self.buckets
+	
+	
+	def logprob(self, i):
+		"""Return the list of the log-probabilities of the bucket in each language."""
+		return [table[i] - d for table, d in zip(self._tables, self._denominators)]
+	
+	
+	def logscores(self, ids, indexes=None):
+		"""Return the list of the log-likelihoods of the sequence of bucket ids in each language.
+		
+		:param ids: sequence of bucket ids
+		:type ids: list
+		:param indexes: indexes of the languages to score (all the languages if None)
+		:type indexes: list
+		:rtype: list
+		"""
+		tables = self._tables
+		denominators = self._denominators
+		if indexes is not None:
+			tables = [tables[i] for i in indexes]
+			denominators = [denominators[i] for i in indexes]
+		count = len(ids)
+		return [sum(map(table.__getitem__, ids)) - count * d for table, d in zip(tables, denominators)]
+	
+	
+	def get_arrays(self):
+		"""Return the model as NumPy arrays (requires NumPy).
+		
+		The index is None as the rows of the matrix of numerators are the bucket ids.
+		"""
+		_require_numpy()
+		if self._arrays is None:
+			numerators = numpy.array([numpy.frombuffer(table, dtype=numpy.float32) for table in self._tables], dtype=numpy.float64).T
+			numerators = numerators.reshape((self.buckets, len(self.languages)))
+			denominators = numpy.array(self._denominators, dtype=numpy.float64)
+			self._arrays = (None, numerators, denominators)
+		return self._arrays
+	
+	
+	def _get_rows(self, index, sequences, total):
+		"""Return the array of the bucket ids of all the sequences."""
+		return numpy.fromiter(chain.from_iterable(sequences), dtype=numpy.int64, count=total)
+
+
+def _compile_table(counts, gamma):
+	"""Return the array of the numerators of the log-probabilities of the buckets."""
+	# Compute the logarithm once for each distinct count
+	logs = dict((c, _log2(c + gamma)) for c in set(counts))
+	return array('f', map(logs.__getitem__, counts))
+
+
+
+################################################################################
+# Binary model files
+################################################################################
+
+## Magic string at the beginning of the model files
+_MAGIC = b'TAGENWA-LANGID\x00\x01'
+
+## Integer formats of the offsets and counts (unsigned 32 bits) and of the language ids (unsigned 16 bits)
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+_UINT16 = 'H'
+_MAX_UINT32 = 0xFFFFFFFF
+_MAX_UINT16 = 0xFFFF
+
+
+def _write_array(f, typecode, values):
+	"""Write the values as a little-endian array of integers."""
+	values = array(typecode, values)
+	if sys.byteorder == 'big':
+		values.byteswap()
+	values.tofile(f)
+
+
+def write_model(path, freqdists, gamma=0.5, **metadata):
+	"""Write the frequency distributions of the n-grams in each language
+	into a compact binary model file.
+	
+	The file contains a magic string, a JSON header (languages, number of
+	n-grams and of bins of each language, positions of the sections and the
+	given metadata), the table of the n-grams sorted by their UTF-8 encoding
+	(offsets and UTF-8 bytes) and the sparse matrix of the counts of each
+	n-gram in each language (offsets of the rows, language ids and counts).
+	All the integers are little-endian. A ValueError is raised before the
+	file is opened if a count or an offset does not fit in 32 bits or if
+	there are more than 65536 languages.
+	
+	:param path: path of the model file
+	:type path: str
+	:param freqdists: frequency distribution of each language
+	:type freqdists: dict
+	:param gamma: additive smoothing of the counts
+	:type gamma: float
+	:param metadata: additional metadata (must be serializable in JSON)
+	"""
+	languages = list(freqdists)
+	if len(languages) > _MAX_UINT16 + 1:
+		raise ValueError('A model file cannot contain more than %i languages.' % (_MAX_UINT16 + 1))
+	fds = [freqdists[lang] for lang in languages]
+	encoded = sorted((ngram.encode('utf-8'), ngram) for ngram in set().union(*fds))
+	
+	# Table of the n-grams and sparse matrix of the counts
+	offsets = array(_UINT32, [0])
+	rows = array(_UINT32, [0])
+	ids = array(_UINT16)
+	counts = array(_UINT32)
+	for key, ngram in encoded:
+		end = offsets[-1] + len(key)
+		if end > _MAX_UINT32:
+			raise ValueError('The n-grams exceed the maximum size of the table of a model file (%i bytes).' % _MAX_UINT32)
+		offsets.append(end)
+		for j, fd in enumerate(fds):
+			c = fd[ngram]
+			if c:
+				if c > _MAX_UINT32:
+					raise ValueError('The count of the n-gram %r in %s (%i) exceeds the maximum count of a model file (%i).' % (ngram, languages[j], c, _MAX_UINT32))
+				ids.append(j)
+				counts.append(c)
+		if len(ids) > _MAX_UINT32:
+			raise ValueError('The counts exceed the maximum number of entries of a model file (%i).' % _MAX_UINT32)
+		rows.append(len(ids))
+	
+	# Compute the positions of the sections (aligned on 8 bytes): the header
+	# contains them, so the first section is moved after the end of the
+	# serialized header until it fits before it
+	header = {
+		u'languages': languages,
+		u'totals': [fd.N() for fd in fds],
+		u'bins': [fd.B() for fd in fds],
+		u'gamma': gamma,
+		u'size': len(encoded),
+		u'metadata': metadata,
+	}
+	sections = [(u'offsets', offsets, 4), (u'strings', None, offsets[-1]), (u'rows', rows, 4), (u'ids', ids, 2), (u'counts', counts, 4)]
+	start = 0
+	while True:
+		position = start
+		for name, values, size in sections:
+			header[name] = position
+			position = _align(position + (size * len(values) if values is not None else size))
+		data = json.dumps(header).encode('utf-8')
+		end = _align(len(_MAGIC) + 4 + len(data))
+		if end <= start:
+			break
+		start = end
+	if len(data) > 0xFFFFFFFF:
+		raise ValueError('The header of the model file is too large (%i bytes).' % len(data))
+	
+	with open(path, 'wb') as f:
+		f.write(_MAGIC)
+		f.write(struct.pack('<I', len(data)))
+		f.write(data)
+		for name, values, size in sections:
+			f.write(b'\x00' * (header[name] - f.tell()))
+			if values is not None:
+				_write_array(f, values.typecode, values)
+			else:
+				for key, ngram in encoded:
+					f.write(key)
+
+
+def _align(position, alignment=8):
+	"""Return the position rounded up to the alignment."""
+	return (position + alignment - 1) // alignment * alignment
+
+
+
+class MappedNgramLanguageModel(NgramLanguageModel):
+	"""Compiled n-gram language model read from a binary model file (see `write_model`).
+	
+	The file is memory-mapped and only its header is parsed when the model is
+	loaded: the n-grams are searched in the sorted table of the file and
+	their vectors are computed when they are looked up. The vectors of the
+	n-grams seen in the model are kept in a bounded LRU cache (the unseen
+	n-grams are not cached).
+	"""
+	
+	def __init__(self, path, cache_size=100000):
+		"""Load the model from a binary model file.
+		
+		:param path: path of the model file
+		:type path: str
+		:param cache_size: maximum number of vectors of n-grams in the cache
+		:type cache_size: int
+		"""
+		with open(path, 'rb') as f:
+			self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		buf = self._mmap
+		if buf[:len(_MAGIC)] != _MAGIC:
+			raise ValueError('The file %s is not a language model file.' % path)
+		length, = struct.unpack_from('<I', buf, len(_MAGIC))
+		start = len(_MAGIC) + 4
+		header = json.loads(buf[start:start+length].decode('utf-8'))
+		self.metadata = header[u'metadata']
+		self._size = header[u'size']
+		self._offsets = header[u'offsets']
+		self._strings = header[u'strings']
+		self._rows = header[u'rows']
+		self._ids = header[u'ids']
+		self._counts = header[u'counts']
+		
+		gammas, denominators = _normalization(header[u'totals'], header[u'bins'], header[u'gamma'])
+		self._gamma = header[u'gamma']
+		self._gammas = gammas
+		super(MappedNgramLanguageModel, self).__init__(header[u'languages'], {}, [_log2(g) for g in gammas], denominators)
+		# Vectors of the seen n-grams last looked up
+		self._cache = LRUCache(cache_size)
+	
+	
+	def close(self):
+		"""Close the memory-mapped file."""
+		self._mmap.close()
+	
+	
+	def __len__(self):
+		"""Return the number of n-grams in the model."""
+		return self._size
+	
+	
+	def __contains__(self, ngram):
+		"""Return True if the n-gram is seen in at least one language."""
+		return self._find(ngram.encode('utf-8')) is not None
+	
+	
+	def _find(self, key):
+		"""Return the index of the UTF-8 encoded n-gram in the table or None."""
+		buf = self._mmap
+		offsets = self._offsets
+		strings = self._strings
+		unpack_from = struct.unpack_from
+		lo, hi = 0, self._size
+		while lo < hi:
+			mid = (lo + hi) // 2
+			start, end = unpack_from('<II', buf, offsets + 4 * mid)
+			value = buf[strings+start:strings+end]
+			if value < key:
+				lo = mid + 1
+			elif value > key:
+				hi = mid
+			else:
+				return mid
+		return None
+	
+	
+	def _lookup(self, ngrams):
+		"""Return the list of the vectors of the n-grams (cached)."""
+		get = self._cache.get
+		vectors = []
+		for ngram in ngrams:
+			vector = get(ngram)
+			if vector is None:
+				vector = self._load_vector(ngram)
+			vectors.append(vector)
+		return vectors
+	
+	
+	def _load_vector(self, ngram):
+		"""Read the vector of the n-gram from the file and cache it if it is seen."""
+		i = self._find(ngram.encode('utf-8'))
+		if i is None:
+			return self._unseen
+		buf = self._mmap
+		start, end = struct.unpack_from('<II', buf, self._rows + 4 * i)
+		ids = struct.unpack_from('<%iH' % (end - start), buf, self._ids + 2 * start)
+		counts = struct.unpack_from('<%iI' % (end - start), buf, self._counts + 4 * start)
+		vector = list(self._unseen)
+		gammas = self._gammas
+		for j, c in zip(ids, counts):
+			vector[j] = _log2(c + gammas[j])
+		vector = tuple(vector)
+		self._cache[ngram] = vector
+		return vector
+	
+	
+	def _read_ngrams(self):
+		"""Return the list of the n-grams of the table."""
+		buf = self._mmap
+		offsets = self._read_array(_UINT32, self._offsets, self._size + 1)
+		strings = buf[self._strings:self._strings+offsets[-1]]
+		return [strings[offsets[i]:offsets[i+1]].decode('utf-8') for i in xrange(self._size)]
+	
+	
+	def _read_array(self, typecode, position, count):
+		"""Return the array of the little-endian integers at the position."""
+		values = array(typecode)
+		values.fromstring(self._mmap[position:position+values.itemsize*count])
+		if sys.byteorder == 'big':
+			values.byteswap()
+		return values
+	
+	
+	def _read_matrix(self):
+		"""Return the arrays of the sparse matrix of the counts (rows, ids, counts)."""
+		rows = self._read_array(_UINT32, self._rows, self._size + 1)
+		ids = self._read_array(_UINT16, self._ids, rows[-1])
+		counts = self._read_array(_UINT32, self._counts, rows[-1])
+		return rows, ids, counts
+	
+	
+	def update(self, language, freqdist, ngrams=None, gamma=None):
+		"""Return a new in-memory model where the column of a language is updated.
+		
+		The whole model is read from the file first (see `NgramLanguageModel.update`).
+		"""
+		model = NgramLanguageModel.from_freqdists(self.get_freqdists(), self._gamma)
+		return model.update(language, freqdist, gamma=self._gamma if gamma is None else gamma)
+	
+	
+	def get_freqdists(self):
+		"""Return the frequency distribution of the n-grams in each language."""
+		ngrams = self._read_ngrams()
+		rows, ids, counts = self._read_matrix()
+		entries = [{} for lang in self.languages]
+		for i, ngram in enumerate(ngrams):
+			for k in xrange(rows[i], rows[i+1]):
+				entries[ids[k]][ngram] = counts[k]
+		freqdists = {}
+		for lang, counts in zip(self.languages, entries):
+			freqdist = FreqDist()
+			freqdist.update(counts)
+			freqdists[lang] = freqdist
+		return freqdists
+	
+	
+	def get_arrays(self):
+		"""Return the model as NumPy arrays (requires NumPy).
+		
+		See `NgramLanguageModel.get_arrays`.
+		"""
+		_require_numpy()
+		if self._arrays is None:
+			ngrams = self._read_ngrams()
+			index = dict((ngram, i) for i, ngram in enumerate(ngrams))
+			rows, ids, counts = [numpy.array(values, dtype=numpy.int64) for values in self._read_matrix()]
+			numerators = numpy.empty((self._size + 1, len(self.languages)), dtype=numpy.float64)
+			numerators[:] = self._unseen
+			gammas = numpy.array(self._gammas, dtype=numpy.float64)
+			numerators[numpy.repeat(numpy.arange(self._size), numpy.diff(rows)), ids] = numpy.log2(counts + gammas[ids])
+			denominators = numpy.array(self._denominators, dtype=numpy.float64)
+			self._arrays = (index, numerators, denominators)
+		return self._arrays
@@ -5,17 +5,37 @@ Character n-gram language classifier
 """
 __license__ = "MIT"
 
+from array import array
 from collections import defaultdict
 from math import log, log1p, exp
+from multiprocessing import Pool
+import bisect
+import codecs
+import copy
+import fnmatch
+import heapq
+import os
 import unicodedata
 import itertools
 import re
+from zlib import crc32
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is only required for the batch classification
+	numpy = None
 
 from nltk.classify.api import ClassifierI
 from nltk.probability import FreqDist, ELEProbDist, DictionaryProbDist
 
-from tagenwa.utils.iterators import sliding_tuples, merge_tagged
+from tagenwa.text.script import script
+from tagenwa.utils.cache import LRUCache
+from tagenwa.utils.iterators import merge_tagged
+from tagenwa.utils.sketch import MisraGries
 from tagenwa.tag.hmm import ClassifierBasedHMMTagger
+from tagenwa.langid.model import NgramLanguageModel, MappedNgramLanguageModel, HashedNgramLanguageModel, \
+	write_model, prune_freqdists
 
 
 
@@ -23,6 +43,9 @@ from tagenwa.tag.hmm import ClassifierBasedHMMTagger
 # N-gram and feature sets
 ###############################################################################
 
+_LN2 = log(2)
+_NINF = float('-inf')
+
 _SPACEPUNCT = re.compile(ur'(\s+|\W)', re.U)
 _DECIMALS = re.compile(ur'\d+', re.U)
 
@@ -36,6 +59,30 @@ def tokenize(text):
 	return [t for t in _SPACEPUNCT.split(text) if t]
 
 
+def get_scripts(ngrams):
+	"""Return the set of the scripts of the characters of the n-grams
+	except the Common and Inherited scripts.
+	
+	>>> sorted(get_scripts([u' ab', u'\u0436\u0438 ', u'12']))
+	[u'Cyrillic', u'Latin']
+	"""
+	cache = _SCRIPT_CACHE
+	scripts = set()
+	for c in set(u''.join(ngrams)):
+		try:
+			s = cache[c]
+		except KeyError:
+			s = script(c)
+			if s in (u'Common', u'Inherited'):
+				s = None
+			cache[c] = s
+		if s is not None:
+			scripts.add(s)
+	return scripts
+
+_SCRIPT_CACHE = {}
+
+
 def build_ngram_function(n):
 	"""Return an function returning a list of character n-grams from a string
 	for use in language identification.
@@ -56,22 +103,133 @@ def build_ngram_function(n):
 	:return: function returning a list of n-grams
 	:rtype: function(unicode)
 	"""
-	assert(isinstance(n, int) and n > 0)
+	return NgramExtractor(n)
+
+
+class NgramExtractor(object):
+	"""Extractor of the character n-grams of tokens for use in language identification.
+	
+	The n-grams are the same as the ones of `build_ngram_function` and
+	are sliced directly from the token padded with spaces.
+	The extractor can also return the n-grams as integer ids (CRC-32 of the
+	UTF-8 encoded n-gram, optionally modulo a number of buckets)
+	and extract the n-grams of many tokens at once.
+	
+	>>> extract = NgramExtractor(3)
+	>>> extract(u'Abc')
+	[u' ab', u'abc', u'bc ']
+	>>> extract.batch([u'Abc', u'de'])
+	[u' ab', u'abc', u'bc ', u' de', u'de ']
+	>>> NgramExtractor(3, hashed=True, buckets=1000).batch([u'Abc', u'de'])
+	[808, 578, 952, 318, 156]
+	"""
+	
+	def __init__(self, n, hashed=False, buckets=None):
+		"""Create a new n-gram extractor.
+		
+		:param n: size of the n-grams
+		:type n: int
+		:param hashed: return integer ids instead of the n-grams if true
+		:type hashed: bool
+		:param buckets: number of buckets of the integer ids (no limit if None)
+		:type buckets: int
+		"""
+		assert(isinstance(n, int) and n > 0)
+		self.n = n
+		self.hashed = hashed
+		self.buckets = buckets
+		
+		# Positions that must not be a place-holder space to be a ngram
+		if n <= 2:
+			self._checks = []
+		else:
+			self._checks = [(n - 1) / 2] if n % 2 else [n / 2 -1, n / 2]
+		self._padding = u' ' * (n - 1)
 	
-	# List items that must not be None to be a ngram
-	if n <= 2:
-		check_not_none = []
-	else:
-		check_not_none = [(n - 1) / 2] if n % 2 else [n / 2 -1, n / 2]
 	
-	def get_ngrams(token):
+	def __call__(self, token):
+		"""Return the list of n-grams of the token."""
 		if _SPACEPUNCT.match(token) is not None or _DECIMALS.match(token) is not None:
 			# If the token contains only spaces or punctuation
 			# or if it contains only decimal digits,
 			# return an empty list
 			return []
-		return [u''.join(tu) for tu in sliding_tuples(token.lower(), n, fill_value=u' ') if all(tu[i] != u' ' for i in check_not_none)]
-	return get_ngrams
+		padding = self._padding
+		return self._slice(padding + token.lower() + padding)
+	
+	
+	def batch(self, tokens):
+		"""Return the list of n-grams of all the tokens.
+		
+		The padded tokens are joined in one string sharing their padding
+		so that the n-grams of all the tokens are sliced at once.
+		"""
+		tokens = [token.lower() for token in tokens
+			if _SPACEPUNCT.match(token) is None and _DECIMALS.match(token) is None]
+		if not tokens:
+			return []
+		padding = self._padding
+		return self._slice(padding + padding.join(tokens) + padding)
+	
+	
+	def _slice(self, text):
+		"""Return the list of n-grams sliced from the padded text."""
+		n = self.n
+		checks = self._checks
+		indexes = xrange(len(text) - n + 1)
+		if not checks:
+			ngrams = [text[i:i+n] for i in indexes]
+		elif len(checks) == 1:
+			k = checks[0]
+			ngrams = [text[i:i+n] for i in indexes if text[i+k] != u' ']
+		else:
+			k, l = checks
+			ngrams = [text[i:i+n] for i in indexes if text[i+k] != u' ' and text[i+l] != u' ']
+		if self.hashed:
+			return self._hash(ngrams)
+		return ngrams
+	
+	
+	def _hash(self, ngrams):
+		"""Return the list of integer ids of the n-grams."""
+		if self.buckets:
+			buckets = self.buckets
+			return [(crc32(ngram.encode('utf-8')) & 0xffffffff) % buckets for ngram in ngrams]
+		return [crc32(ngram.encode('utf-8')) & 0xffffffff for ngram in ngrams]
+
+
+class HashedNgramExtractor(object):
+	"""Extractor of the hashed character n-grams of several orders.
+	
+	The n-grams of each order are the ones of `NgramExtractor` and are
+	returned as integer ids lower than the number of buckets.
+	
+	>>> extract = HashedNgramExtractor(orders=(1, 2), buckets=1000)
+	>>> extract(u'ab')
+	[907, 681, 275, 885, 306]
+	"""
+	
+	def __init__(self, orders=(1, 2, 3, 4), buckets=1 << 18):
+		"""Create a new extractor of hashed n-grams.
+		
+		:param orders: sizes of the n-grams
+		:type orders: tuple
+		:param buckets: number of buckets of the ids
+		:type buckets: int
+		"""
+		self.orders = tuple(orders)
+		self.buckets = buckets
+		self._extractors = [NgramExtractor(n, hashed=True, buckets=buckets) for n in self.orders]
+	
+	
+	def __call__(self, token):
+		"""Return the list of the ids of the n-grams of the token."""
+		return list(itertools.chain.from_iterable(extract(token) for extract in self._extractors))
+	
+	
+	def batch(self, tokens):
+		"""Return the list of the ids of the n-grams of all the tokens."""
+		return list(itertools.chain.from_iterable(extract.batch(tokens) for extract in self._extractors))
 
 
 ###############################################################################
@@ -98,82 +256,677 @@ class NgramLanguageTraining(object):
 	
 	def add(self, text, language):
 		"""Add the given text to the training data"""
+		self.add_ngrams(self.get_ngrams(self._tokenize(text)), language)
+	
+	
+	def add_ngrams(self, ngrams, language):
+		"""Add the n-grams of a text to the training data"""
 		# Create the frequency distribution if it doesn't exist yet
 		if language not in self._freqdists:
 			self._freqdists[language] = FreqDist()
 		freqdist = self._freqdists[language]
 		
 		# Update the frequency distribution
-		tokens = self._tokenize(text)
-		for token in tokens:
-			freqdist.update(self._ngrams(token))
+		freqdist.update(ngrams)
+	
 	
+	def get_ngrams(self, tokens):
+		"""Return the list of n-grams of all the tokens."""
+		batch = getattr(self._ngrams, 'batch', None)
+		if batch is not None:
+			return batch(tokens)
+		return list(itertools.chain.from_iterable(self._ngrams(token) for token in tokens))
 	
-	def add_corpus(self, corpus, language):
-		"""Add the given corpus to the training data"""
-		for fileid in corpus.fileids():
-			self.add(corpus.raw(fileid), language)
+	
+	def add_corpus(self, corpus, language, processes=None):
+		"""Add the given corpus to the training data
+		
+		If the number of processes is given, the files of the corpus are
+		counted in parallel (see `add_files`).
+		"""
+		if processes is None:
+			for fileid in corpus.fileids():
+				self.add(corpus.raw(fileid), language)
+		else:
+			shards = [(corpus.abspath(fileid), corpus.encoding(fileid) or 'utf-8', language) for fileid in corpus.fileids()]
+			self._add_shards(shards, processes)
 	
 	
-	def get_freqdists(self):
-		"""Return the frequency distributions learned from the training data"""
+	def add_files(self, paths, language, encoding='utf-8', processes=None):
+		"""Add the given text files to the training data.
+		
+		Each file is a shard whose n-grams are counted into a plain dictionary
+		by a pool of processes; the counts of the shards are then merged
+		into the frequency distribution of the language.
+		The n-gram and tokenize functions must be picklable.
+		
+		:param paths: paths of the text files
+		:type paths: iterable
+		:param language: language of the files
+		:param encoding: encoding of the files
+		:type encoding: str
+		:param processes: number of processes (the number of CPUs if None)
+		:type processes: int
+		"""
+		self._add_shards([(path, encoding, language) for path in paths], processes)
+	
+	
+	def add_directory(self, path, language=None, pattern='*.txt', encoding='utf-8', processes=None):
+		"""Add the text files of a directory to the training data in parallel.
+		
+		If the language is None, each subdirectory is a language named after
+		the subdirectory (e.g. path/en/*.txt, path/fr/*.txt).
+		
+		:param path: path of the directory
+		:type path: str
+		:param language: language of the files or None
+		:param pattern: shell-style pattern of the names of the files
+		:type pattern: str
+		:param encoding: encoding of the files
+		:type encoding: str
+		:param processes: number of processes (the number of CPUs if None)
+		:type processes: int
+		"""
+		if language is not None:
+			directories = [(path, language)]
+		else:
+			directories = [(os.path.join(path, name), name) for name in sorted(os.listdir(path))
+				if os.path.isdir(os.path.join(path, name))]
+		shards = []
+		for directory, lang in directories:
+			for name in sorted(fnmatch.filter(os.listdir(directory), pattern)):
+				filename = os.path.join(directory, name)
+				if os.path.isfile(filename):
+					shards.append((filename, encoding, lang))
+		self._add_shards(shards, processes)
+	
+	
+	def _add_shards(self, shards, processes=None):
+		"""Count the n-grams of the shards (path, encoding, language) in parallel
+		and merge the counts into the frequency distributions."""
+		tasks = [(path, encoding, language, self._ngrams, self._tokenize) for path, encoding, language in shards]
+		if processes == 1:
+			self._merge_counts(itertools.imap(_count_shard, tasks))
+		else:
+			pool = Pool(processes)
+			try:
+				self._merge_counts(pool.imap_unordered(_count_shard, tasks))
+			finally:
+				pool.close()
+				pool.join()
+	
+	
+	def _merge_counts(self, results):
+		"""Merge the counts (language, dict) into the frequency distributions."""
+		for language, counts in results:
+			if language not in self._freqdists:
+				self._freqdists[language] = FreqDist()
+			self._freqdists[language].update(counts)
+	
+	
+	def get_freqdists(self, **pruning):
+		"""Return the frequency distributions learned from the training data
+		
+		If pruning options are given (min_count, top_k or max_vocabulary),
+		return pruned copies of the frequency distributions (see `prune_freqdists`).
+		"""
+		if pruning:
+			return prune_freqdists(self._freqdists, **pruning)
 		return self._freqdists
 	
 	
-	def get_probdists(self):
-		"""Return the probability distributions learned from the training data"""
-		return dict((lang, ELEProbDist(self._freqdists[lang])) for lang in self._freqdists)
+	def get_probdists(self, **pruning):
+		"""Return the probability distributions learned from the training data
+		
+		See `get_freqdists` for the pruning options.
+		"""
+		freqdists = self.get_freqdists(**pruning)
+		return dict((lang, ELEProbDist(freqdists[lang])) for lang in freqdists)
+	
+	
+	def get_model(self, **pruning):
+		"""Return the compiled model of the log-probabilities of the n-grams in each language.
+		
+		The model gives the same log-probabilities as the probability
+		distributions returned by `get_probdists`.
+		See `get_freqdists` for the pruning options.
+		"""
+		return NgramLanguageModel.from_freqdists(self.get_freqdists(**pruning))
+	
+	
+	def update_model(self, model, language, ngrams=None, **pruning):
+		"""Return a copy of the compiled model where only the language is
+		compiled again from the training data (see `NgramLanguageModel.update`).
+		
+		:param model: compiled model of the training before the update
+		:type model: NgramLanguageModel
+		:param language: language to update
+		:param ngrams: n-grams added to the language since the model was compiled (None if unknown)
+		:type ngrams: iterable
+		:param pruning: pruning options of the model (min_count or top_k, see `get_freqdists`)
+		"""
+		if pruning.get('max_vocabulary') is not None:
+			raise ValueError('A model pruned with max_vocabulary cannot be updated language by language.')
+		freqdist = self.get_freqdists()[language]
+		if pruning:
+			# The pruning may remove n-grams of the previous model
+			freqdist = prune_freqdists({language: freqdist}, **pruning)[language]
+			ngrams = None
+		return model.update(language, freqdist, ngrams)
+	
+	
+	def get_script_languages(self, min_share=0.01, languages=None, **pruning):
+		"""Return the languages associated with each script in the training data.
+		
+		A language is associated with a script if the characters of this script
+		account for at least min_share of the characters of the n-grams of the
+		language (ignoring the Common and Inherited scripts).
+		See `get_freqdists` for the pruning options.
+		
+		:param min_share: minimum share of the characters of a script in a language
+		:type min_share: float
+		:param languages: languages to consider (all the languages if None)
+		:type languages: iterable
+		:return: sorted list of the languages of each script
+		:rtype: dict
+		"""
+		freqdists = self.get_freqdists()
+		if languages is not None:
+			freqdists = dict((lang, freqdists[lang]) for lang in languages)
+		if pruning:
+			freqdists = prune_freqdists(freqdists, **pruning)
+		script_languages = {}
+		for lang, freqdist in freqdists.iteritems():
+			counts = {}
+			for ngram, c in freqdist.iteritems():
+				for s in get_scripts([ngram]):
+					counts[s] = counts.get(s, 0) + c
+			total = sum(counts.itervalues())
+			for s, c in counts.iteritems():
+				if c >= min_share * total:
+					script_languages.setdefault(s, []).append(lang)
+		return dict((s, sorted(languages)) for s, languages in script_languages.iteritems())
+	
+	
+	def save(self, path, **pruning):
+		"""Save the frequency distributions into a compact binary model file.
+		
+		Only the training instances using a `NgramExtractor` on the n-grams
+		themselves can be saved; the tokenize function is not saved.
+		See `get_freqdists` for the pruning options.
+		"""
+		if not isinstance(self._ngrams, NgramExtractor) or self._ngrams.hashed:
+			raise ValueError('Only a training with a n-gram extractor of the n-grams can be saved.')
+		write_model(path, self.get_freqdists(**pruning), n=self._ngrams.n, scripts=self.get_script_languages(**pruning))
+	
+	
+	@classmethod
+	def load(cls, path, tokenize_function=None):
+		"""Load a training instance saved with `save`."""
+		model = MappedNgramLanguageModel(path)
+		try:
+			training = cls(n=model.metadata[u'n'], tokenize_function=tokenize_function)
+			training._freqdists = model.get_freqdists()
+		finally:
+			model.close()
+		return training
+	
+
+
+class HashedNgramLanguageTraining(NgramLanguageTraining):
+	"""Training of a n-gram language classifier with the hashing trick.
+	
+	The n-grams of several orders are hashed into a fixed number of buckets
+	(see `HashedNgramExtractor`) and the counts of the buckets are stored in
+	one fixed-size array per language, so that the memory used by the training
+	and by its model (see `HashedNgramLanguageModel`) does not depend on
+	the size of the vocabulary. The model files and the script prefilter are
+	not available for the hashed n-grams.
+	"""
+	
+	def __init__(self, orders=(1, 2, 3, 4), buckets=1 << 18, tokenize_function=None):
+		"""Create a new training instance with hashed n-grams.
+		
+		:param orders: sizes of the n-grams
+		:type orders: tuple
+		:param buckets: number of buckets of the n-grams
+		:type buckets: int
+		"""
+		super(HashedNgramLanguageTraining, self).__init__(ngram_function=HashedNgramExtractor(orders, buckets),
+			tokenize_function=tokenize_function)
+		self.buckets = buckets
+		self._counts = {}
+	
+	
+	def _get_counts(self, language):
+		"""Return the array of the counts of the buckets of the language."""
+		if language not in self._counts:
+			self._counts[language] = array('L', [0]) * self.buckets
+		return self._counts[language]
+	
+	
+	def add_ngrams(self, ids, language):
+		"""Add the bucket ids of the n-grams of a text to the training data"""
+		counts = self._get_counts(language)
+		for i in ids:
+			counts[i] += 1
 	
+	
+	def _merge_counts(self, results):
+		"""Merge the counts (language, dict) into the arrays of counts."""
+		for language, shard_counts in results:
+			counts = self._get_counts(language)
+			for i, c in shard_counts.iteritems():
+				counts[i] += c
+	
+	
+	def get_freqdists(self, **pruning):
+		"""Return the frequency distributions of the bucket ids learned from the training data
+		
+		See `NgramLanguageTraining.get_freqdists` for the pruning options.
+		"""
+		freqdists = {}
+		for lang, counts in self._counts.iteritems():
+			freqdists[lang] = FreqDist()
+			freqdists[lang].update(dict((i, c) for i, c in enumerate(counts) if c))
+		if pruning:
+			return prune_freqdists(freqdists, **pruning)
+		return freqdists
+	
+	
+	def get_model(self, **pruning):
+		"""Return the compiled model of the log-probabilities of the buckets in each language.
+		
+		See `NgramLanguageTraining.get_freqdists` for the pruning options.
+		"""
+		if not pruning:
+			return HashedNgramLanguageModel.from_counts(self._counts)
+		counts = {}
+		for lang, freqdist in self.get_freqdists(**pruning).iteritems():
+			counts[lang] = array('L', [0]) * self.buckets
+			for i, c in freqdist.iteritems():
+				counts[lang][i] = c
+		return HashedNgramLanguageModel.from_counts(counts)
+	
+	
+	def update_model(self, model, language, ngrams=None, **pruning):
+		"""Return a copy of the compiled model where only the table of the
+		language is compiled again (see `HashedNgramLanguageModel.update`).
+		
+		See `NgramLanguageTraining.update_model` for the pruning options.
+		"""
+		if pruning.get('max_vocabulary') is not None:
+			raise ValueError('A model pruned with max_vocabulary cannot be updated language by language.')
+		counts = self._counts[language]
+		if pruning:
+			freqdist = FreqDist()
+			freqdist.update(dict((i, c) for i, c in enumerate(counts) if c))
+			counts = array('L', [0]) * self.buckets
+			for i, c in prune_freqdists({language: freqdist}, **pruning)[language].iteritems():
+				counts[i] = c
+		return model.update(language, counts)
+	
+	
+	def get_script_languages(self, min_share=0.01, languages=None, **pruning):
+		"""The scripts of the hashed n-grams are unknown."""
+		raise ValueError('The languages of the scripts are not available for the hashed n-grams.')
+
+
+
+class StreamingNgramLanguageTraining(NgramLanguageTraining):
+	"""Training of a n-gram language classifier in a bounded memory.
+	
+	The n-grams of each language are counted approximately by a
+	`tagenwa.utils.sketch.MisraGries` summary keeping at most 2 * capacity
+	n-grams, so that the memory does not grow with the size of the stream.
+	The frequent n-grams are kept and their counts are underestimated by at
+	most `get_errors()[language]`.  The summaries are compacted into the
+	exact frequency distributions used by the models (and by `save`) when
+	they are requested, or periodically with `add_stream`.
+	"""
+	
+	def __init__(self, n=None, ngram_function=None, tokenize_function=None, capacity=100000):
+		"""Create a new streaming training instance.
+		
+		:param capacity: number of n-grams kept in the summary of each language
+		:type capacity: int
+		"""
+		super(StreamingNgramLanguageTraining, self).__init__(n=n, ngram_function=ngram_function,
+			tokenize_function=tokenize_function)
+		self.capacity = capacity
+		self._summaries = {}
+		self._changed = False
+	
+	
+	def _get_summary(self, language):
+		"""Return the summary of the language, starting from its frequency distribution if any."""
+		if language not in self._summaries:
+			summary = MisraGries(self.capacity)
+			if language in self._freqdists:
+				summary.update_counts(self._freqdists[language])
+			self._summaries[language] = summary
+		self._changed = True
+		return self._summaries[language]
+	
+	
+	def add_ngrams(self, ngrams, language):
+		"""Add the n-grams of a text to the training data"""
+		self._get_summary(language).update(ngrams)
+	
+	
+	def add_stream(self, records, compact_every=None):
+		"""Add a stream of texts to the training data.
+		
+		:param records: iterable of (text, language) pairs
+		:type records: iterable
+		:param compact_every: number of records between two compactions (never if None)
+		:type compact_every: int
+		:return: number of records added
+		:rtype: int
+		"""
+		count = 0
+		for text, language in records:
+			self.add(text, language)
+			count += 1
+			if compact_every and count % compact_every == 0:
+				self.compact()
+		return count
+	
+	
+	def _merge_counts(self, results):
+		"""Merge the counts (language, dict) into the summaries."""
+		for language, counts in results:
+			self._get_summary(language).update_counts(counts)
+	
+	
+	def compact(self):
+		"""Copy the counts of the summaries into the frequency distributions."""
+		for language, summary in self._summaries.iteritems():
+			freqdist = FreqDist()
+			freqdist.update(summary.counts)
+			self._freqdists[language] = freqdist
+		self._changed = False
+	
+	
+	def get_freqdists(self, **pruning):
+		"""Return the frequency distributions compacted from the summaries
+		
+		See `NgramLanguageTraining.get_freqdists` for the pruning options.
+		"""
+		if self._changed:
+			self.compact()
+		return super(StreamingNgramLanguageTraining, self).get_freqdists(**pruning)
+	
+	
+	def update_model(self, model, language, ngrams=None, **pruning):
+		"""Return a copy of the compiled model where only the language is
+		compiled again (see `NgramLanguageTraining.update_model`).
+		
+		Every n-gram of the language is compiled again as the summary may
+		have dropped n-grams since the model was compiled.
+		"""
+		return super(StreamingNgramLanguageTraining, self).update_model(model, language, None, **pruning)
+	
+	
+	def get_errors(self):
+		"""Return the maximum underestimation of the counts of the n-grams in each language."""
+		return dict((language, summary.error) for language, summary in self._summaries.iteritems())
+
+
+
+def _count_shard(task):
+	"""Return the language and the counts of the n-grams of a text file.
+	
+	The file is read by blocks of lines to bound the memory.
+	"""
+	path, encoding, language, ngram_function, tokenize_function = task
+	batch = getattr(ngram_function, 'batch', None)
+	counts = {}
+	get = counts.get
+	with codecs.open(path, 'r', encoding=encoding) as f:
+		for lines in iter(lambda: list(itertools.islice(f, 10000)), []):
+			tokens = tokenize_function(u''.join(lines))
+			if batch is not None:
+				ngrams = batch(tokens)
+			else:
+				ngrams = itertools.chain.from_iterable(ngram_function(token) for token in tokens)
+			for ngram in ngrams:
+				counts[ngram] = get(ngram, 0) + 1
+	return language, counts
+
+
+
+def _normalize_logscores(logscores):
+	"""Return the probability distribution of the log scores normalized in log space
+	(uniform if every log score is minus infinity)."""
+	# Normalize with logsumexp (NLTK's sum_logs does not support several null probabilities)
+	maximum = max(logscores.itervalues())
+	if maximum == _NINF:
+		return DictionaryProbDist(dict((label, 1.0) for label in logscores), normalize=True)
+	logtotal = maximum + log(sum(exp(logscore - maximum) for logscore in logscores.itervalues()))
+	# DictionaryProbDist expects base 2 log-probabilities
+	return DictionaryProbDist(dict((label, (logscore - logtotal) / _LN2) for label, logscore in logscores.iteritems()), log=True)
+
 
 
 class NgramLanguageClassifier(ClassifierI):
 	"""A n-gram language classifier.
 	
+	The probability distributions of the training are compiled into a
+	`NgramLanguageModel` so that the score of a n-gram in every language is
+	a single dictionary lookup and a vector addition.
+	
+	If the prefilter is enabled, only the languages associated with the scripts
+	of the n-grams in the training (see `NgramLanguageTraining.get_script_languages`)
+	are scored and the other languages have a null probability.
+	All the languages are scored if no language is associated with these scripts.
+	
+	The classifier can learn new texts with `update`, which compiles again
+	only the languages of the texts. The compiled model, the labels and the
+	candidate languages of the scripts are replaced at once, so that each
+	classification (and each sequence tagged with a snapshot of the classifier,
+	see `snapshot`) uses either the previous or the updated model.
 	"""
 	
-	def __init__(self, training, cutoff=None):
+	def __init__(self, training, cutoff=None, model=None, prefilter=False, **pruning):
 		"""
 		:param training: the training data for the language classification.
 		:type training: NgramLanguageTraining
+		:param model: the compiled model of the training (compiled from the training if None)
+		:type model: NgramLanguageModel
+		:param prefilter: score only the candidate languages of the scripts of the n-grams
+		:type prefilter: bool
+		:param pruning: pruning options of the compiled model (see `NgramLanguageTraining.get_freqdists`)
 		"""
 		self._training = training
-		self._probdists = training.get_probdists()
-		self._languages = self._probdists.keys() + [u'und']
 		self._cutoff = cutoff
+		self._pruning = pruning
+		compiled = model is None
+		if compiled:
+			model = training.get_model(**pruning)
+		
+		# Languages of each script
+		self._script_languages = None
+		if prefilter:
+			metadata = getattr(model, 'metadata', {})
+			if not compiled and u'scripts' in metadata:
+				script_languages = metadata[u'scripts']
+			else:
+				script_languages = training.get_script_languages(**pruning)
+			self._script_languages = dict((s, set(languages)) for s, languages in script_languages.iteritems())
+		self._state = self._get_state(model)
+	
+	
+	def _get_state(self, model):
+		"""Return the tuple (model, labels, indexes of the candidate languages of each script)."""
+		labels = model.languages + [u'und']
+		script_candidates = None
+		if self._script_languages is not None:
+			indexes = dict((lang, i) for i, lang in enumerate(model.languages))
+			script_candidates = dict((s, frozenset(indexes[lang] for lang in languages if lang in indexes))
+				for s, languages in self._script_languages.iteritems())
+		return model, labels, script_candidates
+	
+	
+	@property
+	def _model(self):
+		"""The compiled model of the classifier."""
+		return self._state[0]
+	
+	
+	def update(self, labeled_texts):
+		"""Add the labeled texts to the training and update the classifier.
+		
+		Only the languages of the texts are compiled again into a copy of the
+		model (see `NgramLanguageTraining.update_model`), which then replaces
+		the model of the classifier. The updates must not run concurrently.
+		
+		:param labeled_texts: iterable of (text, language) pairs
+		:type labeled_texts: iterable
+		"""
+		model = self._state[0]
+		if isinstance(model, MappedNgramLanguageModel):
+			raise ValueError('A classifier loaded from a model file cannot be updated: '
+				'create it from the training loaded with NgramLanguageTraining.load.')
+		training = self._training
+		added = {}
+		for text, language in labeled_texts:
+			ngrams = training.get_ngrams(training._tokenize(text))
+			training.add_ngrams(ngrams, language)
+			added.setdefault(language, set()).update(ngrams)
+		for language, ngrams in added.iteritems():
+			model = training.update_model(model, language, ngrams, **self._pruning)
+		
+		# Update the languages of the scripts of the updated languages
+		if self._script_languages is not None:
+			script_languages = dict((s, languages - set(added)) for s, languages in self._script_languages.iteritems())
+			for s, languages in training.get_script_languages(languages=added, **self._pruning).iteritems():
+				script_languages.setdefault(s, set()).update(languages)
+			self._script_languages = script_languages
+		self._state = self._get_state(model)
+	
+	
+	def add(self, text, language):
+		"""Add the given text to the training and update the classifier (see `update`)."""
+		self.update([(text, language)])
+	
+	
+	def snapshot(self):
+		"""Return a copy of the classifier which is not affected by the next updates.
+		
+		The copy shares the training and the compiled model of the classifier.
+		"""
+		return copy.copy(self)
+	
+	
+	def save(self, path, **pruning):
+		"""Save the training of the classifier into a compact binary model file.
+		
+		See `NgramLanguageTraining.get_freqdists` for the pruning options.
+		"""
+		self._training.save(path, **pruning)
+	
+	
+	@classmethod
+	def load(cls, path, cutoff=None, tokenize_function=None, prefilter=False):
+		"""Load a classifier from a model file saved with `save`.
+		
+		The model file is memory-mapped so that the classifier is loaded
+		without reading the n-grams of the model (see `MappedNgramLanguageModel`).
+		The training of the returned classifier is empty.
+		"""
+		model = MappedNgramLanguageModel(path)
+		training = NgramLanguageTraining(n=model.metadata[u'n'], tokenize_function=tokenize_function)
+		return cls(training, cutoff=cutoff, model=model, prefilter=prefilter)
 	
 	
 	def labels(self):
 		"""Return the list of category labels used by this classifier."""
-		return self._languages
+		return self._state[1]
 	
 	
-	def score_classify(self, featureset):
-		"""Return a dict of scores (unnormalized probability estimates) for each language.
-		
+	def log_score_classify(self, featureset):
+		"""Return a dict of log scores (logarithms of the unnormalized probability
+		estimates) for each language.
 		
+		Unlike the scores, the log scores do not underflow for long sequences
+		of n-grams.
 		"""
 		
 		if u'ngrams' not in featureset:
 			raise ValueError('The feature set does not contain a feature named "ngrams".')
 		
-		# Calculate the score of each language as the unnormalized join probability of each n-gram
-		scores = {}
+		# Calculate the log score of each candidate language as the unnormalized join log-probability of each n-gram
+		ngrams = featureset[u'ngrams']
+		model, labels, script_candidates = self._state
+		languages = model.languages
+		indexes = self._get_candidates(ngrams, script_candidates, len(languages))
 		logpriors = featureset.get(u'logpriors', {})
-		for lang in self._probdists:
-			probdist = self._probdists[lang]
-			scores[lang] = exp(sum(probdist.logprob(ngram) for ngram in featureset[u'ngrams']) + logpriors.get(lang, 0.0))
-		# Add a score for the "undetermined language"
-		if self._cutoff:
-			scores[u'und'] = pow(self._cutoff, len(featureset[u'ngrams']))
+		logscores = {}
+		if indexes is None:
+			for lang, logscore in zip(languages, model.logscores(ngrams)):
+				logscores[lang] = logscore + logpriors.get(lang, 0.0)
 		else:
-			scores[u'und'] = min(scores.values())
-		return scores
+			for i, logscore in zip(indexes, model.logscores(ngrams, indexes)):
+				logscores[languages[i]] = logscore + logpriors.get(languages[i], 0.0)
+		# Add a log score for the "undetermined language"
+		logscores[u'und'] = self._get_und_logscore(model, logscores.values(), len(ngrams), indexes is not None)
+		# Set a null probability to the other languages
+		if indexes is not None:
+			for lang in languages:
+				logscores.setdefault(lang, _NINF)
+		return logscores
+	
+	
+	def _get_und_logscore(self, model, logscores, count, prefiltered):
+		"""Return the log score of the "undetermined language" of count n-grams
+		from the log scores of the scored languages.
+		
+		If the languages are prefiltered, the log scores of the other languages
+		are not computed: their lower bound is the log-likelihood of unseen
+		n-grams (mostly the case of the n-grams of the scripts of the other languages).
+		"""
+		if self._cutoff:
+			return count * log(self._cutoff)
+		if prefiltered:
+			return min(min(logscores), count * min(model.unseen_logprob()))
+		return min(logscores)
+	
+	
+	def _get_candidates(self, ngrams, script_candidates, count):
+		"""Return the sorted list of the indexes of the candidate languages
+		of the n-grams (among count languages) or None for all the languages."""
+		if script_candidates is None:
+			return None
+		return self._get_script_candidates(get_scripts(ngrams), script_candidates, count)
+	
+	
+	def _get_script_candidates(self, scripts, script_candidates, count):
+		"""Return the sorted list of the indexes of the candidate languages
+		of the scripts (among count languages) or None for all the languages."""
+		candidates = set()
+		for s in scripts:
+			candidates.update(script_candidates.get(s, ()))
+		if not candidates or len(candidates) == count:
+			return None
+		return sorted(candidates)
+	
+	
+	def score_classify(self, featureset):
+		"""Return a dict of scores (unnormalized probability estimates) for each language.
+		
+		The scores underflow to zero for long sequences of n-grams:
+		use `log_score_classify` instead.
+		"""
+		return dict((label, exp(logscore)) for label, logscore in self.log_score_classify(featureset).iteritems())
 	
 	
 	def prob_classify(self, featureset):
-		"""Return a probability distribution over labels for the given featureset."""
-		scores = self.score_classify(featureset)
-		return DictionaryProbDist(scores, normalize=True)
+		"""Return a probability distribution over labels for the given featureset.
+		
+		The log scores are normalized in log space.
+		"""
+		return _normalize_logscores(self.log_score_classify(featureset))
 	
 	
 	def classify(self, featureset):
@@ -195,21 +948,238 @@ class NgramLanguageClassifier(ClassifierI):
 	def prob_classify_text(self, text, logpriors=None):
 		"""Return a probability distribution over labels for the given text."""
 		tokens = self._training._tokenize(text)
-		ngrams = itertools.chain.from_iterable(
-			self.get_token_featureset(token)[u'ngrams'] for token in tokens
-		)
 		featureset = {
 			u'text': text,
-			u'ngrams': list(ngrams),
+			u'ngrams': self._training.get_ngrams(tokens),
 		}
 		if logpriors is not None:
 			featureset[u'logpriors'] = logpriors
 		return self.prob_classify(featureset)
 	
 	
-	def classify_text(self, text, logpriors=None):
-		"""Return the most appropriate label for the given text."""
-		return self.prob_classify_text(text).max()
+	def classify_text(self, text, logpriors=None, margin=None, budget=None):
+		"""Return the most appropriate label for the given text.
+		
+		If a margin or a budget is given, the text is classified incrementally
+		and the classification stops early (see `early_classify_text`).
+		"""
+		if margin is not None or budget is not None:
+			return self.early_classify_text(text, logpriors=logpriors, margin=margin, budget=budget)[0]
+		return self.prob_classify_text(text, logpriors=logpriors).max()
+	
+	
+	def early_classify_text(self, text, logpriors=None, margin=None, budget=None, chunk_size=256):
+		"""Classify the text incrementally and stop as soon as the language is settled.
+		
+		The text is read by chunks of about chunk_size characters cut after
+		a space or a punctuation (so that the tokens are not split) and the
+		log scores of the n-grams of each chunk are added to the running log
+		scores. The classification stops when the difference between the log
+		scores of the two best languages reaches the margin or when the budget
+		of n-grams is spent (the n-grams of the last chunk are then scored
+		token by token up to the budget). With the prefilter, only the
+		candidate languages of the scripts of the n-grams read are compared.
+		
+		:param margin: difference of the log scores of the two best languages
+			to stop the classification (see `log_score_classify`)
+		:type margin: float
+		:param budget: maximum number of n-grams to score
+		:type budget: int
+		:param chunk_size: minimum number of characters of the chunks
+		:type chunk_size: int
+		:return: tuple (label, number of characters of the text used, up to
+			the end of the last token scored)
+		:rtype: tuple
+		"""
+		tokenize = self._training._tokenize
+		get_ngrams = self._training.get_ngrams
+		model, labels, script_candidates = self._state
+		languages = model.languages
+		logpriors = logpriors or {}
+		totals = [logpriors.get(lang, 0.0) for lang in languages]
+		count = 0
+		used = 0
+		scripts = set()
+		indexes = None
+		while used < len(text):
+			# Cut the next chunk after a space or a punctuation
+			match = _SPACEPUNCT.search(text, used + chunk_size)
+			end = match.end() if match is not None else len(text)
+			tokens = tokenize(text[used:end])
+			ngrams = get_ngrams(tokens)
+			if budget is not None and count + len(ngrams) >= budget:
+				ngrams, end = self._get_budget_ngrams(text, used, tokens, budget - count)
+			totals = [t + s for t, s in zip(totals, model.logscores(ngrams))]
+			count += len(ngrams)
+			used = end
+			if script_candidates is not None:
+				scripts.update(get_scripts(ngrams))
+				indexes = self._get_script_candidates(scripts, script_candidates, len(languages))
+			if budget is not None and count >= budget:
+				break
+			scored = totals if indexes is None else [totals[i] for i in indexes]
+			if margin is not None and len(scored) > 1:
+				first, second = heapq.nlargest(2, scored)
+				if first - second >= margin:
+					break
+		
+		# Add the log score of the "undetermined language"
+		if indexes is None:
+			logscores = dict(zip(languages, totals))
+		else:
+			logscores = dict((languages[i], totals[i]) for i in indexes)
+		logscores[u'und'] = self._get_und_logscore(model, logscores.values(), count, indexes is not None)
+		# The ties are broken in favor of the greatest label as by `DictionaryProbDist.max`
+		return max((logscore, label) for label, logscore in logscores.iteritems())[1], used
+	
+	
+	def _get_budget_ngrams(self, text, start, tokens, size):
+		"""Return the first size n-grams of the tokens of the text from the
+		start and the end of the last token of these n-grams in the text."""
+		get_ngrams = self._training.get_ngrams
+		ngrams = []
+		end = start
+		for token in tokens:
+			if len(ngrams) >= size:
+				break
+			ngrams.extend(get_ngrams([token]))
+			position = text.find(token, end)
+			if position >= 0:
+				end = position + len(token)
+		return ngrams[:size], end
+	
+	
+	def language_profile(self, text, window, step=1, logpriors=None):
+		"""Return the probability distribution over labels of each window of tokens of the text.
+		
+		The log scores of the n-grams of each token in each language are
+		computed once and accumulated into prefix sums, so that the log scores
+		of a window are the difference of two prefix sums and the profile is
+		computed in a time linear in the length of the text. The probabilities
+		of a window are the ones of `prob_classify_text` on its tokens.
+		The windows start every step tokens and the last window ends
+		at the end of the text.
+		
+		:param window: number of tokens of each window
+		:type window: int
+		:param step: number of tokens between the starts of two windows
+		:type step: int
+		:param logpriors: log prior of each language
+		:type logpriors: dict
+		:return: list of tuples (start, end, probability distribution) where
+			start and end are the indexes of the first and after the last
+			tokens of the window in the tokens of the text
+		:rtype: list
+		"""
+		if window < 1 or step < 1:
+			raise ValueError('The window and the step must be positive integers.')
+		model, labels, script_candidates = self._state
+		languages = model.languages
+		ngram_function = self._training._ngrams
+		tokens = self._training._tokenize(text)
+		if not tokens:
+			return []
+		
+		# Prefix sums of the log scores and of the numbers of n-grams of the tokens
+		totals = [0.0] * len(languages)
+		prefix = [totals]
+		counts = [0]
+		positions = {}
+		for t, token in enumerate(tokens):
+			ngrams = ngram_function(token)
+			totals = [total + logscore for total, logscore in zip(totals, model.logscores(ngrams))]
+			prefix.append(totals)
+			counts.append(counts[-1] + len(ngrams))
+			if script_candidates is not None:
+				# Positions of the tokens of each script
+				for s in get_scripts(ngrams):
+					positions.setdefault(s, []).append(t)
+		
+		starts = range(0, max(len(tokens) - window, 0) + 1, step)
+		if starts[-1] + window < len(tokens):
+			starts.append(len(tokens) - window)
+		logpriors = logpriors or {}
+		priors = [logpriors.get(lang, 0.0) for lang in languages]
+		profile = []
+		for start in starts:
+			end = min(start + window, len(tokens))
+			logscores = dict(zip(languages, [b - a + p for a, b, p in zip(prefix[start], prefix[end], priors)]))
+			
+			# Candidate languages of the scripts present in the window
+			candidates = None
+			if script_candidates is not None:
+				candidates = set()
+				for s, indexes in positions.iteritems():
+					i = bisect.bisect_left(indexes, start)
+					if i < len(indexes) and indexes[i] < end:
+						candidates.update(script_candidates.get(s, ()))
+				if not candidates or len(candidates) == len(languages):
+					candidates = None
+			
+			# Add the log score of the "undetermined language"
+			scored = logscores.values() if candidates is None else [logscores[languages[i]] for i in candidates]
+			logscores[u'und'] = self._get_und_logscore(model, scored, counts[end] - counts[start], candidates is not None)
+			
+			# Set a null probability to the languages of the scripts absent from the window
+			if candidates is not None:
+				for i, lang in enumerate(languages):
+					if i not in candidates:
+						logscores[lang] = _NINF
+			profile.append((start, end, _normalize_logscores(logscores)))
+		return profile
+	
+	
+	def batch_prob_classify_texts(self, texts, logpriors=None):
+		"""Return the probabilities of each label for many texts at once (requires NumPy).
+		
+		The n-grams of all the texts are scored together by the compiled model
+		and the scores are normalized in log space. With the prefilter, the
+		languages which are not candidates of the scripts of a text have a
+		null probability as with `prob_classify_text`.
+		
+		:param texts: list of texts
+		:type texts: list
+		:param logpriors: log prior of each language
+		:type logpriors: dict
+		:return: array of shape (number of texts, number of labels) whose columns
+			follow the order of the labels returned by `labels`
+		:rtype: numpy.ndarray
+		"""
+		if numpy is None:
+			raise ImportError('The NumPy module could not be imported.')
+		tokenize = self._training._tokenize
+		get_ngrams = self._training.get_ngrams
+		sequences = [get_ngrams(tokenize(text)) for text in texts]
+		model, labels, script_candidates = self._state
+		logscores = model.batch_logscores(sequences)
+		if logpriors:
+			logscores += numpy.array([logpriors.get(lang, 0.0) for lang in model.languages])
+		
+		# Add the log score of the "undetermined language"
+		if self._cutoff:
+			lengths = numpy.array([len(ngrams) for ngrams in sequences], dtype=numpy.float64)
+			und = lengths * log(self._cutoff)
+		else:
+			und = logscores.min(axis=1)
+		if script_candidates is not None:
+			# Set a null probability to the languages which are not candidates
+			for row, ngrams in enumerate(sequences):
+				indexes = self._get_candidates(ngrams, script_candidates, len(model.languages))
+				if indexes is not None:
+					und[row] = self._get_und_logscore(model, logscores[row, indexes], len(ngrams), True)
+					others = numpy.ones(len(model.languages), dtype=bool)
+					others[indexes] = False
+					logscores[row, others] = _NINF
+		logscores = numpy.column_stack((logscores, und))
+		
+		# Normalize with logsumexp (uniform probabilities if every score is null)
+		maxima = logscores.max(axis=1)
+		maxima[~numpy.isfinite(maxima)] = 0.0
+		probs = numpy.exp(logscores - maxima[:, numpy.newaxis])
+		sums = probs.sum(axis=1)
+		probs[sums == 0] = 1.0
+		probs /= probs.sum(axis=1)[:, numpy.newaxis]
+		return probs
 
 
 
@@ -218,57 +1188,197 @@ class NgramLanguageClassifier(ClassifierI):
 ###############################################################################
 
 class NgramHMMLanguageTagger(ClassifierBasedHMMTagger):
+	"""A HMM language tagger using a n-gram language classifier.
+	
+	The emission log-probabilities of the tokens are cached by the n-grams of
+	the token (and the log priors) in a bounded LRU cache shared by all the
+	sequences tagged, so that the frequent tokens are classified once.
+	The cache belongs to one model of the classifier: it is replaced by an
+	empty cache when the model changes (see `NgramLanguageClassifier.update`),
+	while the sequences still tagged with the previous model keep using
+	the previous cache.
 	
-	def __init__(self, classifier, loginit=None, logtrans=None, *args, **kwargs):
+	The probability to switch to another language depends on whether the
+	tokens have n-grams (words) or not (spaces and punctuations).
+	The three possible transition matrices are computed once for each
+	set of languages. As the transitions only distinguish staying in the
+	same language from switching to another language, the Viterbi algorithm
+	runs in a time linear in the number of languages (see `logswitch`)
+	unless the transitions are given to the constructor.
+	"""
+	
+	def __init__(self, classifier, loginit=None, logtrans=None, cache_size=100000,
+			pswitch_nonwords=1E-10, pswitch_after_nonword=1E-15, pswitch_words=1E-20, *args, **kwargs):
+		"""
+		:param classifier: the n-gram language classifier
+		:type classifier: NgramLanguageClassifier
+		:param cache_size: maximum number of tokens in the cache of the emissions (no cache if 0 or None)
+		:type cache_size: int
+		:param pswitch_nonwords: probability to switch to each other language between two tokens without n-grams
+		:type pswitch_nonwords: float
+		:param pswitch_after_nonword: probability to switch to each other language after a token without n-grams
+		:type pswitch_after_nonword: float
+		:param pswitch_words: probability to switch to each other language after a token with n-grams
+		:type pswitch_words: float
+		:raise ValueError: if a probability to switch is not positive or
+			if its total over the other languages is not lower than 1
+		"""
 		super(NgramHMMLanguageTagger, self).__init__(classifier, loginit=loginit, logtrans=logtrans, *args, **kwargs)
+		self.pswitch_nonwords = pswitch_nonwords
+		self.pswitch_after_nonword = pswitch_after_nonword
+		self.pswitch_words = pswitch_words
+		self._check_pswitch(len(self.states))
+		# Model of the classifier and cache of the emissions computed with this model
+		self._emission = (None, LRUCache(cache_size) if cache_size else None)
+	
+	
+	def cache_info(self):
+		"""Return the statistics of the cache of the emissions (see `LRUCache.info`) or None without cache."""
+		cache = self._emission[1]
+		if cache is None:
+			return None
+		return cache.info()
+	
+	
+	def _get_cache(self, model):
+		"""Return the cache of the emissions computed with the model.
 		
+		If the cache belongs to another model, it is replaced by an empty
+		cache (with the same statistics) instead of being cleared, so that
+		a sequence still tagged with the other model cannot fill the new cache.
+		"""
+		emission_model, cache = self._emission
+		if emission_model is not model:
+			if cache is not None:
+				previous = cache
+				cache = LRUCache(previous.maxsize)
+				cache.hits, cache.misses = previous.hits, previous.misses
+			self._emission = (model, cache)
+		return cache
+	
+	
+	def logemit(self, featureset):
+		"""Return the emission log-probabilities of the token from the cache or from the classifier."""
+		cache = self._get_cache(self._classifier._model)
+		if cache is None:
+			return super(NgramHMMLanguageTagger, self).logemit(featureset)
+		logpriors = featureset.get(u'logpriors')
+		ngrams = tuple(featureset[u'ngrams'])
+		key = (ngrams, frozenset(logpriors.iteritems())) if logpriors else ngrams
+		logemit = cache.get(key)
+		if logemit is None:
+			logemit = super(NgramHMMLanguageTagger, self).logemit(featureset)
+			cache[key] = logemit
+		return logemit
+	
 	
 	def _get_logtrans(self, pdiff):
 		"""Return a transition log probability matrix with a defined probability
 		for transition to a different state.
 		
+		The matrix is computed once for each set of states and must not be modified.
 		"""
-		log_not_pdiff = log1p(pdiff * (len(self.states)-1))
-		log_pdiff = log(pdiff)
-		return dict(((s1, s2), log_not_pdiff if s1==s2 else log_pdiff) for s1 in self.states for s2 in self.states)
+		def build(states):
+			log_not_pdiff, log_pdiff = self._get_logswitch(pdiff)
+			return dict(((s1, s2), log_not_pdiff if s1==s2 else log_pdiff) for s1 in states for s2 in states)
+		return self._get_matrix(('switch', pdiff), build)
 	
 	
-	def logtrans(self, featureset1, featureset2):
+	def _check_pswitch(self, count):
+		"""Raise a ValueError if a probability to switch to each other language
+		is not valid with count languages."""
+		for name in ('pswitch_nonwords', 'pswitch_after_nonword', 'pswitch_words'):
+			pswitch = getattr(self, name)
+			if not (pswitch > 0 and pswitch * (count - 1) < 1):
+				raise ValueError('The probability %s (%r) must be positive and lower than 1/%i with %i languages.' % (name, pswitch, max(count - 1, 1), count))
+	
+	
+	def _get_logswitch(self, pdiff):
+		"""Return the log probabilities to stay in the same state and to switch to each other state."""
+		def build(states):
+			# The languages of the classifier may have changed since the constructor
+			self._check_pswitch(len(states))
+			return log1p(-pdiff * (len(states)-1)), log(pdiff)
+		return self._get_matrix(('stay', pdiff), build)
+	
+	
+	def _get_pswitch(self, featureset1, featureset2):
+		"""Return the probability to switch to each other language between the two tokens."""
 		if not featureset1[u'ngrams'] and not featureset2[u'ngrams']:
-			return self._get_logtrans(1E-10)
+			return self.pswitch_nonwords
 		elif not featureset1[u'ngrams']:
-			return self._get_logtrans(1E-15)
+			return self.pswitch_after_nonword
 		else:
-			return self._get_logtrans(1E-20)
+			return self.pswitch_words
+	
+	
+	def logtrans(self, featureset1, featureset2):
+		return self._get_logtrans(self._get_pswitch(featureset1, featureset2))
+	
+	
+	def has_switch_transitions(self):
+		"""Return True unless the transitions are given to the constructor."""
+		return 'logtrans' not in self.__dict__
+	
 	
+	def logswitch(self, featureset1, featureset2):
+		"""Return the log probabilities to stay in the same language and to switch to each other language."""
+		return self._get_logswitch(self._get_pswitch(featureset1, featureset2))
 	
-	def tag_text(self, text, logpriors=None):
+	
+	def tag(self, unlabeled_sequence, beam=None, beam_threshold=None):
+		"""Tag the given sequence with the highest probable state sequence.
+		
+		The sequence is tagged with a snapshot of the classifier, so that the
+		updates of the classifier during the tagging only affect the next sequences.
+		The beam and the beam threshold of the Viterbi algorithm are described
+		in `AbstractHMMTaggerI.viterbi`.
+		"""
+		tagger = copy.copy(self)
+		tagger._classifier = self._classifier.snapshot()
+		# The cache of the model of the snapshot is shared with the copy
+		model = tagger._classifier._model
+		tagger._emission = (model, self._get_cache(model))
+		return super(NgramHMMLanguageTagger, tagger).tag(unlabeled_sequence, beam=beam, beam_threshold=beam_threshold)
+	
+	
+	def tag_text(self, text, logpriors=None, beam=None, beam_threshold=None):
 		"""Return a list of tagged tokens from the given text."""
 		tokens = self._classifier._training._tokenize(text)
 		get_featureset = self._classifier.get_token_featureset
-		labeled_sequence = self.tag([get_featureset(token, logpriors=logpriors) for token in tokens])
+		labeled_sequence = self.tag([get_featureset(token, logpriors=logpriors) for token in tokens], beam=beam, beam_threshold=beam_threshold)
 		return [(token[u'text'], tag) for token, tag in labeled_sequence]
 	
 	
-	def split_text(self, text, logpriors=None):
+	def split_text(self, text, logpriors=None, beam=None, beam_threshold=None):
 		"""Split the given text into a list of tuples (text part, language)."""
-		return list(merge_tagged(self.tag_text(text, logpriors=logpriors), lambda x:u''.join(x)))
+		return list(merge_tagged(self.tag_text(text, logpriors=logpriors, beam=beam, beam_threshold=beam_threshold), lambda x:u''.join(x)))
 
 
 
-def demo():
-	"""Small demo of a language identifier using the europarl_raw corpus"""
-	import nltk.corpus.europarl_raw as europarl_raw
+def demo(path=None):
+	"""Small demo of a language identifier using the europarl_raw corpus
 	
-	# Build the training data
-	print 'Training the language identification...'
-	training = NgramLanguageTraining(n=3)
-	training.add_corpus(europarl_raw.english, 'en')
-	training.add_corpus(europarl_raw.french, 'fr')
+	If a path is given, the model is saved to this path after the training
+	or loaded from it if it already exists.
+	"""
+	if path is not None and os.path.exists(path):
+		print 'Loading the language identification...'
+		classifier = NgramLanguageClassifier.load(path)
+	else:
+		import nltk.corpus.europarl_raw as europarl_raw
+		
+		# Build the training data
+		print 'Training the language identification...'
+		training = NgramLanguageTraining(n=3)
+		training.add_corpus(europarl_raw.english, 'en')
+		training.add_corpus(europarl_raw.french, 'fr')
+		if path is not None:
+			training.save(path)
+		classifier = NgramLanguageClassifier(training)
 	
-	# Build the language classifier and the tagger
+	# Build the tagger
 	print 'Building the tagger...'
-	classifier = NgramLanguageClassifier(training)
 	tagger = NgramHMMLanguageTagger(classifier)
 	
 	# Test the tagger
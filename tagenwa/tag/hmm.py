@@ -3,16 +3,285 @@
 Abstract classes for a HMM tagger and a classifier-based HMM tagger
 """
 from math import log
+from operator import add
+
+try:
+	import numpy
+except ImportError:
+	# NumPy is only required for the vectorized Viterbi algorithm
+	numpy = None
 
 from nltk.tag.api import TaggerI, FeaturesetTaggerI
 
+_NINF = float('-inf')
+
+## Maximum number of distinct transition matrices kept converted by the Viterbi algorithms
+_MAX_MATRICES = 8
+
+
+
+def viterbi_arrays(loginit, logemit, logtrans, index=None):
+	"""Return the most probable sequence of hidden states of arrays of
+	log-probabilities (requires NumPy).
+	
+	At each step, the log-probabilities of all the pairs of states are
+	computed at once by broadcasting and the best previous states are saved
+	into an integer array of back pointers. The ties are broken in favor
+	of the first state.
+	
+	:param loginit: initial log-probabilities (S)
+	:type loginit: numpy.ndarray
+	:param logemit: emission log-probabilities of each element (T x S)
+	:type logemit: numpy.ndarray
+	:param logtrans: transition log-probabilities (S x S) from the row
+		state to the column state, or K transition matrices (K x S x S)
+		with the index of the matrix of each of the T-1 transitions
+		(the transition t if the index is None)
+	:type logtrans: numpy.ndarray
+	:param index: index of the transition matrix of each transition (T-1)
+	:type index: numpy.ndarray
+	:return: indexes of the states of the elements (T)
+	:rtype: numpy.ndarray
+	"""
+	if numpy is None:
+		raise ImportError('The NumPy module could not be imported.')
+	length, size = logemit.shape
+	path = numpy.zeros(length, dtype=numpy.intp)
+	if length == 0:
+		return path
+	columns = numpy.arange(size)
+	backpointers = numpy.empty((length - 1, size), dtype=numpy.intp)
+	P = loginit + logemit[0]
+	for t in xrange(1, length):
+		if logtrans.ndim == 2:
+			pt = logtrans
+		else:
+			pt = logtrans[t-1 if index is None else index[t-1]]
+		# log-probabilities of each previous state (rows) and state (columns)
+		scores = P[:, numpy.newaxis] + pt
+		best = scores.argmax(axis=0)
+		backpointers[t-1] = best
+		P = scores[best, columns] + logemit[t]
+	
+	# reconstruct the path from the back pointers
+	path[-1] = P.argmax()
+	for t in xrange(length - 2, -1, -1):
+		path[t] = backpointers[t, path[t+1]]
+	return path
+
+
+
+def viterbi_switch_arrays(loginit, logemit, logstay, logswitch):
+	"""Return the most probable sequence of hidden states of arrays of
+	log-probabilities when the transitions only distinguish staying in the
+	same state from switching to another state (requires NumPy).
+	
+	The best previous state of each state is either the state itself or the
+	best other state, which is the best previous state overall or the second
+	best one, so that each step is computed in a time linear in the number
+	of states. The ties are broken in favor of the first state as by
+	`viterbi_arrays`.
+	
+	:param loginit: initial log-probabilities (S)
+	:type loginit: numpy.ndarray
+	:param logemit: emission log-probabilities of each element (T x S)
+	:type logemit: numpy.ndarray
+	:param logstay: log-probability to stay in the same state at each transition (T-1)
+	:type logstay: numpy.ndarray
+	:param logswitch: log-probability to switch to each other state at each transition (T-1)
+	:type logswitch: numpy.ndarray
+	:return: indexes of the states of the elements (T)
+	:rtype: numpy.ndarray
+	"""
+	if numpy is None:
+		raise ImportError('The NumPy module could not be imported.')
+	length, size = logemit.shape
+	path = numpy.zeros(length, dtype=numpy.intp)
+	if length == 0:
+		return path
+	columns = numpy.arange(size)
+	backpointers = numpy.empty((length - 1, size), dtype=numpy.intp)
+	P = loginit + logemit[0]
+	for t in xrange(1, length):
+		# best and second best previous states
+		first = P.argmax()
+		best = P[first]
+		P[first] = _NINF
+		second = P.argmax() if size > 1 else first
+		P[first] = best
+		# the best state can only switch to the second best state
+		runner_up = P[second] + logswitch[t-1] if second != first else _NINF
+		stay = P + logstay[t-1]
+		switch = best + logswitch[t-1]
+		# the states before the best state stay in case of a tie
+		use_stay = stay > switch
+		use_stay[:first] = stay[:first] >= switch
+		backpointers[t-1] = numpy.where(use_stay, columns, first)
+		P = numpy.maximum(stay, switch)
+		if runner_up > stay[first] or (runner_up == stay[first] and second < first):
+			backpointers[t-1, first] = second
+			P[first] = runner_up
+		else:
+			backpointers[t-1, first] = first
+			P[first] = stay[first]
+		P += logemit[t]
+	
+	# reconstruct the path from the back pointers
+	path[-1] = P.argmax()
+	for t in xrange(length - 2, -1, -1):
+		path[t] = backpointers[t, path[t+1]]
+	return path
+
+
+
+def viterbi_beam_arrays(loginit, logemit, logtrans, index=None, beam=None, threshold=None):
+	"""Return an approximation of the most probable sequence of hidden states
+	of arrays of log-probabilities keeping only the best states at each step
+	(requires NumPy).
+	
+	After each transition, only the `beam` states with the highest
+	log-probabilities and the states whose log-probability is within
+	`threshold` of the best one are kept, and only the transitions from these
+	states are computed (the initial states are all kept, as the emissions
+	of the first element may not be informative).
+	The back pointers of the kept states are saved sparsely. Without beam and
+	threshold (or with a beam of at least S states), the result is the one of
+	`viterbi_arrays`; with a narrower beam, the best path may be pruned.
+	
+	:param loginit: initial log-probabilities (S)
+	:type loginit: numpy.ndarray
+	:param logemit: emission log-probabilities of each element (T x S)
+	:type logemit: numpy.ndarray
+	:param logtrans: transition log-probabilities (S x S) or K transition
+		matrices (K x S x S) as for `viterbi_arrays`
+	:type logtrans: numpy.ndarray
+	:param index: index of the transition matrix of each transition (T-1)
+	:type index: numpy.ndarray
+	:param beam: maximum number of states kept at each step (all if None)
+	:type beam: int
+	:param threshold: maximum difference of log-probability with the best
+		state of the states kept at each step (no limit if None)
+	:type threshold: float
+	:return: indexes of the states of the elements (T)
+	:rtype: numpy.ndarray
+	"""
+	if numpy is None:
+		raise ImportError('The NumPy module could not be imported.')
+	if beam is not None and beam < 1:
+		raise ValueError('The beam must be a positive integer.')
+	if threshold is not None and threshold < 0:
+		raise ValueError('The threshold must be a non-negative number.')
+	length, size = logemit.shape
+	path = numpy.zeros(length, dtype=numpy.intp)
+	if length == 0:
+		return path
+	columns = numpy.arange(size)
+	
+	def prune(P):
+		"""Return the sorted indexes of the states kept among the log-probabilities P."""
+		bound = P.max() - threshold if threshold is not None else _NINF
+		if beam is None or beam >= size:
+			return numpy.flatnonzero(P >= bound)
+		# log-probability of the state of rank `beam`
+		kth = numpy.partition(P, size - beam)[size - beam]
+		active = numpy.flatnonzero(P >= max(bound, kth))
+		if len(active) > beam:
+			# the ties with the state of rank `beam` are broken in favor of the first states
+			ties = P[active] == kth
+			extra = beam - (len(active) - ties.sum())
+			ties[numpy.flatnonzero(ties)[extra:]] = False
+			active = active[(P[active] > kth) | ties]
+		return active
+	
+	# sparse back pointers: kept states and their best previous states
+	backpointers = []
+	P = loginit + logemit[0]
+	active = columns
+	for t in xrange(1, length):
+		if logtrans.ndim == 2:
+			pt = logtrans
+		else:
+			pt = logtrans[t-1 if index is None else index[t-1]]
+		# log-probabilities of each kept previous state (rows) and state (columns)
+		scores = P[:, numpy.newaxis] + pt[active]
+		best = scores.argmax(axis=0)
+		Q = scores[best, columns] + logemit[t]
+		kept = prune(Q)
+		backpointers.append((kept, active[best[kept]]))
+		active = kept
+		P = Q[kept]
+	
+	# reconstruct the path from the back pointers
+	path[-1] = active[P.argmax()]
+	for t in xrange(length - 2, -1, -1):
+		kept, previous = backpointers[t]
+		path[t] = previous[numpy.searchsorted(kept, path[t+1])]
+	return path
+
+
+
+class _TransitionArrays(object):
+	"""Transition arrays of a list of elements converted one at a time
+	from the matrices returned by `logtrans` (when the matrices are not
+	constant), so that the arrays of all the transitions are not kept in
+	memory. The arrays must be read in the order of the transitions, as
+	by `viterbi_arrays` and `viterbi_beam_arrays` without index.
+	"""
+	
+	ndim = 3
+	
+	def __init__(self, logtrans, elements, states, matrices):
+		"""Create the transition arrays of the elements.
+		
+		:param logtrans: function returning the transition matrix of two elements
+		:param elements: list of the elements
+		:param states: list of the states (rows and columns of the arrays)
+		:param matrices: matrices of the first transitions (already returned by logtrans)
+		"""
+		self._logtrans = logtrans
+		self._elements = elements
+		self._states = states
+		self._matrices = matrices
+		# last transition arrays (by identity of the matrix)
+		self._arrays = {}
+	
+	
+	def __getitem__(self, t):
+		"""Return the array of the transition t."""
+		if t < len(self._matrices):
+			pt = self._matrices[t]
+			self._matrices[t] = None
+		else:
+			pt = self._logtrans(self._elements[t], self._elements[t+1])
+		entry = self._arrays.get(id(pt))
+		if entry is None or entry[0] is not pt:
+			if len(self._arrays) >= _MAX_MATRICES:
+				self._arrays.clear()
+			states = self._states
+			entry = (pt, numpy.array([[pt[i,j] for j in states] for i in states], dtype=numpy.float64))
+			self._arrays[id(pt)] = entry
+		return entry[1]
+
 
 
 class AbstractHMMTaggerI(TaggerI):
 	
-	def tag(self, unlabeled_sequence):
-		"""Tag the given sequence with the highest probable state sequence."""
-		labels = self.viterbi(unlabeled_sequence)
+	## Minimum number of states to use the vectorized Viterbi algorithm (if NumPy is available)
+	vectorize_min_states = 4
+	## Minimum number of states to use the stay/switch Viterbi algorithm (if the transitions allow it)
+	switch_min_states = 32
+	
+	def tag(self, unlabeled_sequence, beam=None, beam_threshold=None):
+		"""Tag the given sequence with the highest probable state sequence.
+		
+		:param beam: maximum number of states kept at each step of the
+			beam-pruned Viterbi algorithm (see `viterbi`)
+		:type beam: int
+		:param beam_threshold: maximum difference of log-probability with the
+			best state of the states kept at each step (see `viterbi`)
+		:type beam_threshold: float
+		"""
+		labels = self.viterbi(unlabeled_sequence, beam=beam, beam_threshold=beam_threshold)
 		return zip(unlabeled_sequence, labels)
 	
 	def loginit(self):
@@ -41,24 +310,166 @@ class AbstractHMMTaggerI(TaggerI):
 		"""
 		raise NotImplementedError()
 	
+	def has_switch_transitions(self):
+		"""Return True if the transitions only distinguish staying in the same
+		state from switching to another state (see `logswitch`)."""
+		return False
+	
+	def logswitch(self, featureset1, featureset2):
+		"""Return the transition log-probabilities to stay in the same state
+		and to switch to each other state (consistent with `logtrans`)
+		if `has_switch_transitions` returns True.
+		
+		:param element1: previous observable element
+		:param element2: current observable element
+		:return: tuple (log-probability to stay, log-probability to switch)
+		:rtype: tuple
+		"""
+		raise NotImplementedError()
+	
 	
-	def viterbi(self, iterable):
+	def viterbi(self, iterable, beam=None, beam_threshold=None):
 		"""Return the most probable sequence of hidden states.
 		
+		The transition matrices returned several times by `logtrans` (the
+		same dict object) are considered as constant and are converted
+		once into the columns of log-probabilities used by the algorithm.
+		With NumPy and at least `vectorize_min_states` states, the
+		dictionaries are converted into arrays decoded by `viterbi_arrays`
+		with the same result (if the matrices are not constant, each
+		transition is converted during the decoding instead of keeping an
+		array per element), or by `viterbi_switch_arrays` if the tagger
+		has stay/switch transitions (see `has_switch_transitions`) and at
+		least `switch_min_states` states (below, its constant cost per
+		element exceeds the cost of the transitions of all the pairs of states).
+		
+		If a beam or a beam threshold is given, the arrays are decoded by
+		`viterbi_beam_arrays` (which requires NumPy) and only the best states
+		are kept at each step, so that the result is an approximation of the
+		most probable sequence.
+		
 		:param iterable: iterable of observable elements to tag 
 		:type iterable: iterable
+		:param beam: maximum number of states kept at each step (all if None)
+		:type beam: int
+		:param beam_threshold: maximum difference of log-probability with the
+			best state of the states kept at each step (no limit if None)
+		:type beam_threshold: float
 		:return: sequence of tags
 		:rtype: list
 		"""
+		if beam is not None or beam_threshold is not None:
+			return self._viterbi_beam(iterable, beam, beam_threshold)
+		if numpy is not None and len(self.states) >= self.vectorize_min_states:
+			if len(self.states) >= self.switch_min_states and self.has_switch_transitions():
+				return self._viterbi_switch(iterable)
+			return self._viterbi_numpy(iterable)
+		return self._viterbi_dicts(iterable)
+	
+	
+	def _viterbi_switch(self, iterable):
+		"""Return the most probable sequence of hidden states with `viterbi_switch_arrays`."""
+		# The states are sorted in reverse order so that the ties are broken
+		# in favor of the greatest state as by `_viterbi_dicts`
+		states = sorted(self.states, reverse=True)
+		elements = list(iterable)
+		if not elements:
+			return []
+		p = self.loginit()
+		loginit = numpy.array([p[j] for j in states], dtype=numpy.float64)
+		# The emissions of the first element are not used (as by `_viterbi_dicts`)
+		logemit = numpy.zeros((len(elements), len(states)), dtype=numpy.float64)
+		logstay = numpy.empty(len(elements) - 1, dtype=numpy.float64)
+		logswitch = numpy.empty(len(elements) - 1, dtype=numpy.float64)
+		for t in xrange(1, len(elements)):
+			pe = self.logemit(elements[t])
+			logemit[t] = [pe[j] for j in states]
+			logstay[t-1], logswitch[t-1] = self.logswitch(elements[t-1], elements[t])
+		return [states[k] for k in viterbi_switch_arrays(loginit, logemit, logstay, logswitch)]
+	
+	
+	def _viterbi_beam(self, iterable, beam, threshold):
+		"""Return an approximation of the most probable sequence of hidden states with `viterbi_beam_arrays`.
+		
+		As by `_viterbi_numpy`, the transition matrices that are not constant
+		are converted one at a time during the decoding (see `_get_arrays`).
+		"""
+		if numpy is None:
+			raise ImportError('The NumPy module could not be imported.')
+		# The states are sorted in reverse order as by `_viterbi_numpy`
+		states = sorted(self.states, reverse=True)
+		elements = list(iterable)
+		if not elements:
+			return []
+		loginit, logemit, logtrans, index = self._get_arrays(elements, states)
+		return [states[k] for k in viterbi_beam_arrays(loginit, logemit, logtrans, index, beam, threshold)]
+	
+	
+	def _viterbi_numpy(self, iterable):
+		"""Return the most probable sequence of hidden states with `viterbi_arrays`."""
+		# The states are sorted in reverse order so that the ties are broken
+		# in favor of the greatest state as by `_viterbi_dicts`
+		states = sorted(self.states, reverse=True)
+		elements = list(iterable)
+		if not elements:
+			return []
+		return [states[k] for k in viterbi_arrays(*self._get_arrays(elements, states))]
+	
+	
+	def _get_arrays(self, elements, states):
+		"""Return the arrays of the initial, emission and transition
+		log-probabilities of the non-empty list of elements and the index
+		of the transition matrix of each transition.
+		
+		If there are more than `_MAX_MATRICES` distinct transition matrices,
+		the transitions are converted one at a time during the decoding
+		(see `_TransitionArrays`) and the index is None.
+		"""
+		p = self.loginit()
+		loginit = numpy.array([p[j] for j in states], dtype=numpy.float64)
+		# The emissions of the first element are not used (as by `_viterbi_dicts`)
+		logemit = numpy.zeros((len(elements), len(states)), dtype=numpy.float64)
+		index = numpy.empty(len(elements) - 1, dtype=numpy.intp)
+		# Transition matrices converted into arrays (by identity of the matrix)
+		matrices = []
+		positions = {}
+		transitions = None
+		for t in xrange(1, len(elements)):
+			pe = self.logemit(elements[t])
+			logemit[t] = [pe[j] for j in states]
+			if transitions is not None:
+				continue
+			pt = self.logtrans(elements[t-1], elements[t])
+			k = positions.get(id(pt))
+			if k is None or matrices[k][0] is not pt:
+				if len(matrices) >= _MAX_MATRICES:
+					# the matrices are not constant: the next ones are converted during the decoding
+					first = [matrices[m][0] for m in index[:t-1]] + [pt]
+					transitions = _TransitionArrays(self.logtrans, elements, states, first)
+					continue
+				k = len(matrices)
+				positions[id(pt)] = k
+				matrices.append((pt, [[pt[i,j] for j in states] for i in states]))
+			index[t-1] = k
+		if transitions is not None:
+			return loginit, logemit, transitions, None
+		logtrans = numpy.array([matrix for pt, matrix in matrices], dtype=numpy.float64).reshape((len(matrices), len(states), len(states)))
+		return loginit, logemit, logtrans, index
+	
+	
+	def _viterbi_dicts(self, iterable):
+		"""Return the most probable sequence of hidden states with the dictionaries."""
 		
 		# shortcuts
 		logemit = self.logemit
 		logtrans = self.logtrans
-		states = self.states
+		states = list(self.states)
 		
 		# set the log-probabilities of the first element
 		p = self.loginit()
-		P = dict((j, p[j]) for j in states)
+		P = [p[j] for j in states]
+		# columns of the last transition matrices (by identity of the matrix)
+		columns = {}
 		# initialize the matrix of best previous elements
 		V = []
 		# set the previous observable element to the first element
@@ -71,15 +482,22 @@ class AbstractHMMTaggerI(TaggerI):
 		
 		# search for the best path and the log-probability of the states sequence
 		for tj in iterator:
-			Q = {}
+			Q = []
 			W = {}
 			pe = logemit(tj)
 			pt = logtrans(ti,tj)
-			for j in states:
+			entry = columns.get(id(pt))
+			if entry is None or entry[0] is not pt:
+				if len(columns) >= _MAX_MATRICES:
+					# the matrices are not constant: keep only the last ones
+					columns.clear()
+				entry = (pt, [[pt[i,j] for i in states] for j in states])
+				columns[id(pt)] = entry
+			for j, column in zip(states, entry[1]):
 				# save the best previous element until state "j" (excluded) and its log-probability
-				logprob, W[j] = max( (P[i] + pt[i,j], i) for i in states)
+				logprob, W[j] = max(zip(map(add, P, column), states))
 				# save the log-probability until "j" (included)
-				Q[j] = logprob + pe[j]
+				Q.append(logprob + pe[j])
 			# update the log-probability and save the list of best previous elements
 			P = Q
 			V.append(W)
@@ -87,7 +505,7 @@ class AbstractHMMTaggerI(TaggerI):
 			ti = tj
 		
 		# reconstruct the Viterbi path from the matrix of previous elements
-		logprob, j = max((P[i],i) for i in states)
+		logprob, j = max(zip(P, states))
 		path = [j]
 		for t in xrange(len(V)-1,-1,-1):
 			j = V[t][j]
@@ -101,23 +519,44 @@ class AbstractHMMTaggerI(TaggerI):
 
 class ClassifierBasedHMMTagger(AbstractHMMTaggerI, FeaturesetTaggerI):
 	
+	## States assigned to the tagger (the labels of the classifier if None)
+	_states = None
+	
 	def __init__(self, classifier, loginit=None, logtrans=None, *args, **kwargs):
 		"""Create a hidden Markov model tagger where the emission probability
 		is calculated by a classifier.
 		
 		"""
-		# Get the classifier and the list of possible states
+		# Get the classifier
 		self._classifier = classifier
-		self.states = self._classifier.labels()
+		# Constant matrices of the current states (shared by the copies of the tagger)
+		self._matrices = {}
 		
 		# Overload the initial and transition log-probability functions if given
 		if loginit is not None:
 			self.loginit = loginit	
 		if logtrans is not None:
 			self.logtrans = logtrans
-		
-		# Calculate the log value of the uniform probability over all the states
-		self._uniform_logprob = log(1.0 / len(self.states))
+	
+	
+	@property
+	def states(self):
+		"""The list of possible states (the labels of the classifier unless
+		other states were assigned)."""
+		if self._states is not None:
+			return self._states
+		return self._classifier.labels()
+	
+	
+	@states.setter
+	def states(self, states):
+		self._states = states
+	
+	
+	@property
+	def _uniform_logprob(self):
+		"""The log value of the uniform probability over all the states."""
+		return log(1.0 / len(self.states))
 	
 	
 	def classifier(self):
@@ -125,9 +564,23 @@ class ClassifierBasedHMMTagger(AbstractHMMTaggerI, FeaturesetTaggerI):
 		return self._classifier
 	
 	
+	def _get_matrix(self, key, build):
+		"""Return the constant matrix of the key for the current states.
+		
+		The matrix is built by build(states) once for each list of states
+		(compared by value, so the lists modified in place are detected).
+		"""
+		states = self.states
+		entry = self._matrices.get(key)
+		if entry is None or entry[0] != states:
+			entry = (list(states), build(states))
+			self._matrices[key] = entry
+		return entry[1]
+	
+	
 	def loginit(self):
 		"""Return a default uniform initial probability."""
-		return dict((s, self._uniform_logprob) for s in self.states)
+		return self._get_matrix('uniform init', lambda states: dict((s, log(1.0 / len(states))) for s in states))
 	
 	
 	def logemit(self, featureset):
@@ -138,5 +591,5 @@ class ClassifierBasedHMMTagger(AbstractHMMTaggerI, FeaturesetTaggerI):
 	
 	def logtrans(self, featureset1, featureset2):
 		"""Return a default uniform transition probability."""
-		return dict(((s1, s2), self._uniform_logprob) for s1 in self.states for s2 in self.states)
+		return self._get_matrix('uniform trans', lambda states: dict(((s1, s2), log(1.0 / len(states))) for s1 in states for s2 in states))
 
@@ -4,22 +4,46 @@
 See also
   http://en.wikipedia.org/wiki/Alphabets_derived_from_the_Latin
 """
+from array import array
+from bisect import bisect_right
 import unicodedata
 import re
 
 
 ################################################################################
 
+class _CombiningMarksTable(dict):
+	"""Translation table mapping each codepoint to its NFD decomposition
+	without the combining marks.
+	
+	The table is filled lazily as the characters are looked up.
+	"""
+	
+	def __missing__(self, o):
+		stripped = u''.join(
+			c for c in unicodedata.normalize('NFD', unichr(o))
+			if not unicodedata.combining(c)
+		)
+		self[o] = stripped
+		return stripped
+
+_COMBINING_MARKS_TABLE = _CombiningMarksTable()
+_NON_ASCII_PATTERN = re.compile(ur'[^\x00-\x7f]', re.U)
+
 def remove_combining_marks(text):
 	"""Remove all combining marks from the text.
 	
 	The string characters are decomposed using the Unicode's NFD normalization
 	and all the combining marks are removed.
+	
+	As the canonical reordering of NFD only moves combining marks, the result
+	is the concatenation of the decomposition of each character without its
+	combining marks, which is cached in a translation table.
+	ASCII text is returned unchanged.
 	"""
-	return u''.join(
-		c for c in unicodedata.normalize('NFD', text)
-		if not unicodedata.combining(c)
-	)
+	if _NON_ASCII_PATTERN.search(text) is None:
+		return text
+	return text.translate(_COMBINING_MARKS_TABLE)
 
 ################################################################################
 
@@ -62,3 +86,239 @@ def normalize_eol(text):
 
 ################################################################################
 
+## Runs of spaces that are not end-of-line characters
+_NON_EOL_SPACES_PATTERN = re.compile(ur'[^\S\n\r]+', re.U)
+
+class Normalizer(object):
+	u"""Normalizer applying a selection of the normalization functions
+	in as few passes over the text as possible.
+	
+	The result is the same as applying `normalize_eol`, `collapse_spaces`,
+	`remove_ligatures` and `remove_combining_marks` in this order.
+	The single character replacements of the selected functions (including the
+	removal of the combining marks) are merged into one translation table
+	applied in one pass and the collapse of the spaces uses a constant
+	replacement string instead of a replacement function.
+	
+	>>> normalizer = Normalizer()
+	>>> normalizer.normalize(u'Œuvre   complète')
+	u'OEuvre complete'
+	"""
+	
+	def __init__(self, eol=True, spaces=True, ligatures=True, combining_marks=True):
+		"""Create a new normalizer.
+		
+		:param eol: normalize the end-of-line characters
+		:param spaces: collapse the consecutive non-end-of-line spaces
+		:param ligatures: remove the ligatures
+		:param combining_marks: remove the combining marks
+		"""
+		self.eol = eol
+		self.spaces = spaces
+		self.ligatures = ligatures
+		self.combining_marks = combining_marks
+		
+		# Merge the translation tables
+		translations = {}
+		if eol:
+			translations[ord(u'\r')] = u'\n'
+		if ligatures:
+			translations.update(_LIGATURE_TRANSLATIONS)
+		self._translations = translations
+		if combining_marks:
+			# The characters translated above have no combining marks
+			# so the removal of the combining marks can use the same table
+			self._combining_marks_table = _CombiningMarksTable(translations)
+	
+	
+	def normalize(self, text):
+		"""Return the normalized text."""
+		if self.eol:
+			# The remaining \r are translated below
+			text = text.replace(u'\r\n', u'\n')
+		if self.spaces:
+			# The \r and \n are excluded from the runs of spaces
+			# so that the runs are the same before and after the translation
+			text = _NON_EOL_SPACES_PATTERN.sub(u' ', text)
+		if self.combining_marks and _NON_ASCII_PATTERN.search(text) is not None:
+			text = text.translate(self._combining_marks_table)
+		elif self._translations:
+			text = text.translate(self._translations)
+		return text
+	
+	
+	def __call__(self, text):
+		"""Return the normalized text."""
+		return self.normalize(text)
+
+################################################################################
+
+class OffsetMap(object):
+	"""Compact map from the positions in a normalized text to the positions
+	in the original text.
+	
+	Only the positions where the offset between both texts changes are stored:
+	the positions in between are interpolated linearly.
+	The characters inserted by the normalization (e.g. the second character
+	of a removed ligature) are mapped to the position of the original character.
+	"""
+	
+	def __init__(self):
+		"""Create a new identity offset map."""
+		self._normalized = array('l', [0])
+		self._original = array('l', [0])
+	
+	
+	def add(self, normalized, original):
+		"""Map the normalized position to the original position.
+		
+		The positions must be added in increasing order.
+		"""
+		last_normalized = self._normalized[-1]
+		last_original = self._original[-1]
+		if original - last_original == normalized - last_normalized:
+			# Already interpolated
+			return
+		if normalized == last_normalized:
+			self._original[-1] = original
+		else:
+			self._normalized.append(normalized)
+			self._original.append(original)
+	
+	
+	def original(self, position):
+		"""Return the position in the original text of the normalized position."""
+		i = bisect_right(self._normalized, position) - 1
+		return self._original[i] + position - self._normalized[i]
+	
+	
+	def original_span(self, start, end):
+		"""Return the span in the original text of the normalized span."""
+		return (self.original(start), self.original(end))
+	
+	
+	def __len__(self):
+		"""Return the number of positions stored in the map."""
+		return len(self._normalized)
+
+
+
+class StreamNormalizer(Normalizer):
+	"""Normalizer of a stream of text returning normalized chunks
+	and mapping the normalized positions to the original positions.
+	
+	A trailing \\r or a trailing run of spaces is kept until the next chunk
+	so that the normalized text is the same as the one returned by
+	`Normalizer.normalize` on the whole text.
+	
+	>>> normalizer = StreamNormalizer()
+	>>> list(normalizer.normalize_stream([u'a  ', u' b\\r', u'\\nc']))
+	[u'a', u' b', u'\\nc']
+	>>> normalizer.offsets.original_span(2, 3)
+	(4, 5)
+	"""
+	
+	def __init__(self, eol=True, spaces=True, ligatures=True, combining_marks=True):
+		"""Create a new stream normalizer.
+		
+		The parameters are the same as for the `Normalizer`.
+		"""
+		super(StreamNormalizer, self).__init__(eol, spaces, ligatures, combining_marks)
+		self.offsets = OffsetMap()
+		self._characters_table = None
+		
+		# Pattern matching the parts of the text that may change
+		patterns = []
+		if eol:
+			patterns.append(ur'(?P<eol>\r\n?)')
+		if spaces:
+			# Ignore the runs of spaces that are already a single ASCII space
+			patterns.append(ur'(?P<spaces>[^\S\n\r]{2,}|[^\S\n\r ])')
+		if combining_marks:
+			self._characters_table = _CombiningMarksTable(_LIGATURE_TRANSLATIONS if ligatures else {})
+			patterns.append(ur'(?P<character>[^\x00-\x7f])')
+		elif ligatures:
+			self._characters_table = _LIGATURE_TRANSLATIONS
+			patterns.append(u'(?P<character>[%s])' % u''.join(re.escape(unichr(o)) for o in sorted(_LIGATURE_TRANSLATIONS)))
+		self._stream_pattern = re.compile(u'|'.join(patterns), re.U) if patterns else None
+	
+	
+	def normalize_stream(self, stream, chunk_size=65536):
+		"""Generate the normalized chunks of the stream.
+		
+		The stream is either a file-like object returning unicode strings
+		(e.g. opened with `codecs.open`) or an iterable of unicode strings.
+		The offset map of the stream is available in the attribute `offsets`
+		and is complete when the generator is exhausted.
+		"""
+		self.offsets = OffsetMap()
+		if hasattr(stream, 'read'):
+			read = stream.read
+			stream = iter(lambda: read(chunk_size), u'')
+		
+		pending = u''
+		original = 0
+		normalized = 0
+		for chunk in stream:
+			text = pending + chunk
+			cut = self._get_stream_cut(text)
+			pending = text[cut:]
+			part = self._normalize_stream_part(text[:cut], original, normalized)
+			original += cut
+			normalized += len(part)
+			if part:
+				yield part
+		part = self._normalize_stream_part(pending, original, normalized)
+		self.offsets.add(normalized + len(part), original + len(pending))
+		if part:
+			yield part
+	
+	
+	def _get_stream_cut(self, text):
+		"""Return the position of the end of the text that can be normalized
+		without knowing the next chunk."""
+		if self.eol and text.endswith(u'\r'):
+			return len(text) - 1
+		if self.spaces:
+			# Start of the trailing run of spaces (not including end-of-line characters)
+			end = len(text.rstrip())
+			return max(end, text.rfind(u'\n') + 1, text.rfind(u'\r') + 1)
+		return len(text)
+	
+	
+	def _normalize_stream_part(self, text, original, normalized):
+		"""Return the normalized text and update the offset map.
+		
+		:param original: original position of the text
+		:param normalized: normalized position of the text
+		"""
+		add = self.offsets.add
+		table = self._characters_table
+		# Difference between the normalized and the original positions
+		delta = [normalized - original]
+		
+		def replace(match):
+			group = match.lastgroup
+			if group == 'eol':
+				replacement = u'\n'
+			elif group == 'spaces':
+				replacement = u' '
+			else:
+				replacement = table[ord(match.group(0))]
+			start, end = match.span()
+			length = len(replacement)
+			if length != end - start:
+				n = original + start + delta[0]
+				# The inserted characters are mapped to the original character
+				for k in xrange(1, length):
+					add(n + k, original + start)
+				add(n + length, original + end)
+				delta[0] += length - end + start
+			return replacement
+		
+		if self._stream_pattern is None:
+			return text
+		return self._stream_pattern.sub(replace, text)
+
+
+################################################################################
@@ -38,3 +38,117 @@ def is_word(text):
 	) and not all(
 		ucategory(c) == 'Pd' for c in text
 	)
+
+
+################################################################################
+# Batch classification
+################################################################################
+
+## Token flags returned by `classify_token`
+TERM = 1
+WORD = 2
+EOL = 4
+HEXADECIMAL = 8
+NUMERIC = 16
+PUNCTUATION = 32
+
+## Character classes
+_LETTER = 1
+_NUMBER = 2
+_PUNCTUATION = 4
+_WORD_CHARACTER = 8 # letter or dash punctuation
+_EOL = 16
+_HEXDIGIT = 32
+_ALL_CLASSES = 63
+
+
+def _get_char_class(c):
+	"""Return the class bitmask of the character."""
+	category = ucategory(c)
+	char_class = 0
+	if category[0] == 'L':
+		char_class |= _LETTER | _WORD_CHARACTER
+	elif category[0] == 'N':
+		char_class |= _NUMBER
+	elif category[0] == 'P':
+		char_class |= _PUNCTUATION
+		if category == 'Pd':
+			char_class |= _WORD_CHARACTER
+	if c in u'\n\r':
+		char_class |= _EOL
+	if c in u'0123456789abcdefABCDEF':
+		char_class |= _HEXDIGIT
+	return char_class
+
+
+def _get_char_classes(text):
+	"""Return the bitwise AND and the bitwise OR of the classes of the characters."""
+	ascii_classes = _ASCII_CLASSES
+	cache = _CHAR_CLASSES
+	all_classes = _ALL_CLASSES
+	any_classes = 0
+	for c in text:
+		o = ord(c)
+		if o < 128:
+			char_class = ascii_classes[o]
+		else:
+			try:
+				char_class = cache[c]
+			except KeyError:
+				char_class = cache[c] = _get_char_class(c)
+		all_classes &= char_class
+		any_classes |= char_class
+	return all_classes, any_classes
+
+
+def classify_token(text):
+	"""Return the bitmask of the flags of the token in one pass over its characters.
+	
+	The flags TERM, WORD, EOL and HEXADECIMAL are set if respectively `is_term`,
+	`is_word`, `is_eol` and `is_hexadecimal` return true.
+	The flag NUMERIC is set if all characters are numbers and the flag
+	PUNCTUATION is set if all characters are punctuations.
+	
+	>>> classify_token(u'abc') == TERM | WORD
+	True
+	>>> classify_token(u'0x1F') == TERM | HEXADECIMAL
+	True
+	>>> classify_token(u'...') == PUNCTUATION
+	True
+	
+	:rtype: int
+	"""
+	if not text:
+		return 0
+	all_classes, any_classes = _get_char_classes(text)
+	flags = 0
+	if any_classes & (_LETTER | _NUMBER):
+		flags |= TERM
+	if all_classes & _NUMBER:
+		flags |= NUMERIC
+	if all_classes & _PUNCTUATION:
+		flags |= PUNCTUATION
+	if all_classes & _EOL:
+		flags |= EOL
+	# A word only contains letters and dashes and at least one letter
+	if all_classes & _WORD_CHARACTER and any_classes & _LETTER:
+		flags |= WORD
+	if len(text) > 2 and text[:2] == u'0x' and _get_char_classes(text[2:])[0] & _HEXDIGIT:
+		flags |= HEXADECIMAL
+	return flags
+
+
+def classify_tokens(tokens):
+	"""Return the list of the bitmasks of the flags of each token.
+	
+	:rtype: list
+	"""
+	return [classify_token(token) for token in tokens]
+
+
+################################################################################
+# Initializing functions
+################################################################################
+
+_ASCII_CLASSES = [_get_char_class(unichr(o)) for o in xrange(128)]
+_CHAR_CLASSES = {}
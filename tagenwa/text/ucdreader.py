@@ -4,6 +4,7 @@ Unicode character database (UCD) reader
 
 """
 import codecs
+from bisect import bisect_right
 from os.path import abspath, dirname, join as joinpath
 import re
 
@@ -66,6 +67,61 @@ def read_ucd_datafile(filename, folder=None, compact=False):
 	return data
 
 
+################################################################################
+# UCD compiled tables
+################################################################################
+
+def compile_ucd_data(data, values, default=0):
+	"""Compile the UCD data into a table of property ids for a fast look up.
+	
+	The data must be a sorted list of tuples (start, end, value) as returned by
+	`read_ucd_datafile`, for example from the files Scripts.txt,
+	WordBreakProperty.txt or LineBreak.txt.
+	Each value is replaced by its id: its index if `values` is a sequence
+	or its mapped integer if `values` is a dictionary.
+	Codepoints that are not in the data or whose value is not in `values`
+	get the `default` id.
+	
+	>>> table = compile_ucd_data([(0x30, 0x39, u'NU'), (0x41, 0x5A, u'AL')], [u'XX', u'NU', u'AL'])
+	>>> get_ucd_id(ord(u'5'), table), get_ucd_id(ord(u'B'), table), get_ucd_id(ord(u'b'), table)
+	(1, 2, 0)
+	
+	:return: compiled table to be used with `get_ucd_id`
+	:rtype: tuple
+	"""
+	if not isinstance(values, dict):
+		values = dict((value, i) for i, value in enumerate(values))
+	
+	# The table is a list of range starts and a list of ids of the same length,
+	# each range going until the start of the next one
+	starts = [0]
+	ids = [default]
+	end = -1
+	for a, b, value in data:
+		# Fill the gap between two entries with the default id
+		if a > end + 1 and ids[-1] != default:
+			starts.append(end + 1)
+			ids.append(default)
+		i = values.get(value, default)
+		if ids[-1] != i:
+			if starts[-1] == a:
+				ids[-1] = i
+			else:
+				starts.append(a)
+				ids.append(i)
+		end = b
+	if ids[-1] != default:
+		starts.append(end + 1)
+		ids.append(default)
+	return (starts, ids)
+
+
+def get_ucd_id(o, table):
+	"""Get the property id of the Unicode codepoint in a table compiled with `compile_ucd_data`."""
+	starts, ids = table
+	return ids[bisect_right(starts, o) - 1]
+
+
 ################################################################################
 # UCD Property value aliases
 ################################################################################
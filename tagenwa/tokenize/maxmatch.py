@@ -0,0 +1,220 @@
+# -*- coding: UTF-8 -*-
+"""
+Dictionary-based maximum matching segmenter for scripts written without spaces
+
+"""
+__license__ = "MIT"
+
+import unicodedata
+
+from tagenwa.text.ucdreader import read_ucd_datafile, compile_ucd_data, get_ucd_id
+from tagenwa.utils.trie import Trie
+
+
+## Script ids used to find the runs of characters to segment
+(_OUTSIDE, _INSIDE, _INHERITED, _COMMON) = range(4)
+
+
+class MaximumMatchingSegmenter(object):
+	u"""Dictionary-based segmenter for the runs of characters written in
+	scripts without spaces (by default Han, Hiragana, Katakana and Thai).
+	
+	The characters outside of these runs are left untouched
+	so that the segmenter can be used to retokenize the tokens returned by the
+	`GenericTreebankWordTokenizer`.
+	Inside a run, the words are searched in a trie of characters with one
+	of the following methods:
+	
+	- u'longest': greedy longest match from left to right,
+	- u'minimum': segmentation with the minimum number of words.
+	
+	The characters that do not start any word of the dictionary are returned
+	as single character segments.
+	
+	>>> segmenter = MaximumMatchingSegmenter([u'東京', u'東京都', u'京都', u'都庁'])
+	>>> segmenter.segment(u'東京都庁') == [u'東京都', u'庁']
+	True
+	>>> segmenter = MaximumMatchingSegmenter([u'東京', u'東京都', u'京都', u'都庁'], method=u'minimum')
+	>>> segmenter.segment(u'東京都庁') == [u'東京', u'都庁']
+	True
+	"""
+	
+	_SCRIPTS = frozenset([u'Han', u'Hiragana', u'Katakana', u'Thai'])
+	
+	
+	def __init__(self, words=None, method=u'longest', scripts=None):
+		"""Create a new maximum matching segmenter.
+		
+		:param words: iterable of words of the dictionary
+		:param method: u'longest' or u'minimum'
+		:type method: unicode
+		:param scripts: names of the scripts to segment
+		:type scripts: iterable
+		"""
+		if method not in (u'longest', u'minimum'):
+			raise ValueError('Unknown segmentation method %s' % repr(method))
+		self.method = method
+		self.trie = Trie()
+		
+		# Compile the script table of the scripts to segment
+		scripts = frozenset(scripts) if scripts is not None else self._SCRIPTS
+		values = dict((s, _INSIDE) for s in scripts)
+		values[u'Inherited'] = _INHERITED
+		values[u'Common'] = _COMMON
+		self._script_table = compile_ucd_data(_UCD_SCRIPTS, values, _OUTSIDE)
+		self._script_cache = {}
+		
+		if words is not None:
+			for word in words:
+				self.add(word)
+	
+	
+	def add(self, word):
+		"""Add a word to the dictionary."""
+		if word:
+			self.trie.add(word, True)
+	
+	
+	def __contains__(self, word):
+		"""Return True if the word is in the dictionary."""
+		return word in self.trie
+	
+	
+	def __len__(self):
+		"""Return the number of words in the dictionary."""
+		return len(self.trie)
+	
+	
+	def span_segment(self, text):
+		"""Return the spans of the segments of the text.
+		
+		The spans cover the whole text: the parts outside of the runs of
+		characters to segment are returned as one span each.
+		"""
+		spans = []
+		start = 0
+		for run_start, run_end in self._span_runs(text):
+			if start != run_start:
+				spans.append((start, run_start))
+			if self.method == u'longest':
+				spans.extend(self._span_longest(text, run_start, run_end))
+			else:
+				spans.extend(self._span_minimum(text, run_start, run_end))
+			start = run_end
+		if start != len(text):
+			spans.append((start, len(text)))
+		return spans
+	
+	
+	def segment(self, text):
+		"""Return the list of segments of the text."""
+		return [text[s:e] for s,e in self.span_segment(text)]
+	
+	
+	def retokenize(self, tokens):
+		"""Retokenize the iterable of tokens by segmenting each token."""
+		for token in tokens:
+			spans = self.span_segment(token)
+			if len(spans) <= 1:
+				yield token
+			else:
+				for s,e in spans:
+					yield token[s:e]
+	
+	
+	def _span_runs(self, text):
+		"""Return the spans of the runs of characters to segment.
+		
+		Characters of the inherited script (such as combining marks) and
+		modifier letters of the common script (such as the prolonged sound mark)
+		continue the current run.
+		"""
+		cache = self._script_cache
+		table = self._script_table
+		runs = []
+		start = None
+		for i, c in enumerate(text):
+			try:
+				s = cache[c]
+			except KeyError:
+				s = get_ucd_id(ord(c), table)
+				if s == _COMMON and unicodedata.category(c) != 'Lm':
+					s = _OUTSIDE
+				cache[c] = s
+			if s == _INSIDE:
+				if start is None:
+					start = i
+			elif s == _OUTSIDE or start is None:
+				if start is not None:
+					runs.append((start, i))
+					start = None
+		if start is not None:
+			runs.append((start, len(text)))
+		return runs
+	
+	
+	def _match_lengths(self, text, i, end):
+		"""Return the list of lengths of the words of the dictionary starting
+		at the position i of the text (shortest first)."""
+		lengths = []
+		node = self.trie.root
+		for j in xrange(i, end):
+			node = node[2].get(text[j])
+			if node is None:
+				break
+			if node[1]:
+				lengths.append(j + 1 - i)
+		return lengths
+	
+	
+	def _span_longest(self, text, start, end):
+		"""Segment the run with the greedy longest match."""
+		spans = []
+		i = start
+		while i < end:
+			lengths = self._match_lengths(text, i, end)
+			length = lengths[-1] if lengths else 1
+			spans.append((i, i + length))
+			i += length
+		return spans
+	
+	
+	def _span_minimum(self, text, start, end):
+		"""Segment the run with the minimum number of segments."""
+		size = end - start
+		# best[k] is the tuple (number of segments, number of unknown characters)
+		# of the best segmentation of the k first characters
+		# and previous[k] is the start of its last segment
+		infinity = (size + 1, size + 1)
+		best = [(0, 0)] + [infinity] * size
+		previous = [0] * (size + 1)
+		for k in xrange(size):
+			if best[k] == infinity:
+				# Position inside a word of the dictionary
+				continue
+			count, unknown = best[k]
+			lengths = self._match_lengths(text, start + k, end)
+			if not lengths:
+				candidates = [(1, (count + 1, unknown + 1))]
+			else:
+				candidates = [(length, (count + 1, unknown)) for length in lengths]
+			for length, cost in candidates:
+				if cost < best[k + length]:
+					best[k + length] = cost
+					previous[k + length] = k
+		# Reconstruct the segmentation
+		spans = []
+		k = size
+		while k > 0:
+			spans.append((start + previous[k], start + k))
+			k = previous[k]
+		spans.reverse()
+		return spans
+
+
+
+################################################################################
+# Initializing functions
+################################################################################
+
+_UCD_SCRIPTS = read_ucd_datafile('Scripts.txt')
@@ -3,6 +3,7 @@ import re
 from nltk.tokenize.treebank import TreebankWordTokenizer
 
 from tagenwa.text.script import tag_script
+from tagenwa.tokenize.uax29 import UAX29WordTokenizer
 
 
 class GenericTreebankWordTokenizer(TreebankWordTokenizer):
@@ -120,13 +121,20 @@ class EnglishTreebankWordTokenizer(GenericTreebankWordTokenizer, TreebankWordTok
 
 
 
-def get_tokenizer(language):
+def get_tokenizer(language, engine=u'treebank'):
 	"""Create the tokenizer specific to the language if there is one
 	or create a generic tokenizer.
 	
 	:param language: language code (ISO 631-1)
 	:rtype language: unicode
+	:param engine: u'treebank' for the regex-based treebank tokenizers
+	               or u'uax29' for the Unicode word boundaries tokenizer
+	:type engine: unicode
 	"""
+	if engine == u'uax29':
+		return UAX29WordTokenizer()
+	elif engine != u'treebank':
+		raise ValueError('Unknown tokenizer engine %s' % repr(engine))
 	if language == u'en':
 		return EnglishTreebankWordTokenizer()
 	else:
@@ -0,0 +1,259 @@
+# -*- coding: UTF-8 -*-
+"""
+Word tokenizer based on the Unicode word boundaries (UAX #29)
+
+See also
+  http://www.unicode.org/reports/tr29/
+"""
+__license__ = "MIT"
+
+import unicodedata
+
+from nltk.tokenize.api import TokenizerI
+
+from tagenwa.text.ucdreader import read_ucd_datafile, compile_ucd_data, get_ucd_id
+
+
+
+################################################################################
+# Word_Break property
+################################################################################
+
+## Values of the Word_Break property (the index of the value is its property id)
+WORD_BREAK_VALUES = (
+	u'Other', u'CR', u'LF', u'Newline', u'Extend', u'Format', u'Katakana',
+	u'ALetter', u'MidLetter', u'MidNum', u'MidNumLet', u'Numeric', u'ExtendNumLet',
+)
+
+(_OTHER, _CR, _LF, _NEWLINE, _EXTEND, _FORMAT, _KATAKANA,
+	_ALETTER, _MIDLETTER, _MIDNUM, _MIDNUMLET, _NUMERIC, _EXTENDNUMLET) = range(len(WORD_BREAK_VALUES))
+
+
+def word_break(c):
+	u"""Return the Word_Break property value of the character.
+	
+	>>> word_break(u'a')
+	u'ALetter'
+	>>> word_break(u'.')
+	u'MidNumLet'
+	>>> word_break(u'ア')
+	u'Katakana'
+	>>> word_break(u'気')
+	u'Other'
+	
+	:param c: a single character
+	:type c: unicode
+	:rtype: unicode
+	"""
+	return WORD_BREAK_VALUES[_word_break_id(c)]
+
+
+def _word_break_id(c):
+	"""Return the Word_Break property id of the character (cached)."""
+	try:
+		return _WORD_BREAK_CACHE[c]
+	except KeyError:
+		if _WORD_BREAK_TABLE is not None:
+			i = get_ucd_id(ord(c), _WORD_BREAK_TABLE)
+		else:
+			i = _derive_word_break_id(c)
+		_WORD_BREAK_CACHE[c] = i
+		return i
+
+
+## Codepoints listed explicitly in the derivation of the Word_Break property
+_WORD_BREAK_CODEPOINTS = {
+	0x000D: _CR,
+	0x000A: _LF,
+	0x000B: _NEWLINE, 0x000C: _NEWLINE, 0x0085: _NEWLINE, 0x2028: _NEWLINE, 0x2029: _NEWLINE,
+	0x200B: _OTHER,
+	0x200C: _EXTEND, 0x200D: _EXTEND, 0xFF9E: _EXTEND, 0xFF9F: _EXTEND,
+	0x3031: _KATAKANA, 0x3032: _KATAKANA, 0x3033: _KATAKANA, 0x3034: _KATAKANA, 0x3035: _KATAKANA,
+	0x309B: _KATAKANA, 0x309C: _KATAKANA, 0x30A0: _KATAKANA, 0x30FC: _KATAKANA, 0xFF70: _KATAKANA,
+	0x05F3: _ALETTER,
+	0x003A: _MIDLETTER, 0x00B7: _MIDLETTER, 0x0387: _MIDLETTER, 0x05F4: _MIDLETTER,
+	0x2027: _MIDLETTER, 0xFE13: _MIDLETTER, 0xFE55: _MIDLETTER, 0xFF1A: _MIDLETTER,
+	0x002C: _MIDNUM, 0x003B: _MIDNUM, 0x037E: _MIDNUM, 0x0589: _MIDNUM, 0x060C: _MIDNUM,
+	0x060D: _MIDNUM, 0x066C: _MIDNUM, 0x07F8: _MIDNUM, 0x2044: _MIDNUM, 0xFE10: _MIDNUM,
+	0xFE14: _MIDNUM, 0xFE50: _MIDNUM, 0xFE54: _MIDNUM, 0xFF0C: _MIDNUM, 0xFF1B: _MIDNUM,
+	0x0027: _MIDNUMLET, 0x002E: _MIDNUMLET, 0x2018: _MIDNUMLET, 0x2019: _MIDNUMLET,
+	0x2024: _MIDNUMLET, 0xFE52: _MIDNUMLET, 0xFF07: _MIDNUMLET, 0xFF0E: _MIDNUMLET,
+	0x066B: _NUMERIC,
+}
+
+## Script ids used by the derivation of the Word_Break property
+(_SCRIPT_OTHER, _SCRIPT_KATAKANA, _SCRIPT_HIRAGANA, _SCRIPT_HAN, _SCRIPT_COMPLEX) = range(5)
+_SCRIPT_IDS = {
+	u'Katakana': _SCRIPT_KATAKANA,
+	u'Hiragana': _SCRIPT_HIRAGANA,
+	u'Han': _SCRIPT_HAN,
+	# Scripts whose letters have the line break class Complex_Context (SA)
+	u'Thai': _SCRIPT_COMPLEX,
+	u'Lao': _SCRIPT_COMPLEX,
+	u'Myanmar': _SCRIPT_COMPLEX,
+	u'Khmer': _SCRIPT_COMPLEX,
+	u'Tai_Le': _SCRIPT_COMPLEX,
+	u'New_Tai_Lue': _SCRIPT_COMPLEX,
+	u'Tai_Tham': _SCRIPT_COMPLEX,
+	u'Tai_Viet': _SCRIPT_COMPLEX,
+}
+
+
+def _derive_word_break_id(c):
+	"""Derive the Word_Break property id of the character from its general category
+	and its script as described in the table 3 of UAX #29.
+	
+	This derivation is used when the file WordBreakProperty.txt is not available
+	in the data folder.
+	"""
+	o = ord(c)
+	if o in _WORD_BREAK_CODEPOINTS:
+		return _WORD_BREAK_CODEPOINTS[o]
+	category = unicodedata.category(c)
+	if category in ('Mn', 'Me', 'Mc'):
+		return _EXTEND
+	elif category == 'Cf':
+		return _FORMAT
+	elif category == 'Pc':
+		return _EXTENDNUMLET
+	script = get_ucd_id(o, _SCRIPT_TABLE)
+	if script == _SCRIPT_KATAKANA:
+		return _KATAKANA
+	elif category == 'Nd':
+		# Fullwidth digits have the line break class Ideographic, not Numeric
+		return _NUMERIC if not 0xFF10 <= o <= 0xFF19 else _OTHER
+	elif category[0] == 'L' or category == 'Nl' or 0x24B6 <= o <= 0x24E9:
+		# Alphabetic characters except ideographs, hiragana and complex context letters
+		if script == _SCRIPT_OTHER or (script == _SCRIPT_HAN and category not in ('Lo', 'Nl')):
+			return _ALETTER
+	return _OTHER
+
+
+################################################################################
+# Word boundary rules
+################################################################################
+
+## Actions between two characters (ignoring Extend and Format characters)
+(_BREAK, _KEEP, _KEEP_IF_NEXT, _KEEP_IF_PREV) = range(4)
+
+
+def _build_actions():
+	"""Return the matrix of actions indexed by pairs of Word_Break property ids.
+	
+	The action _KEEP_IF_NEXT means that there is no break if the next character
+	has the same property as the first one of the pair (WB6 and WB12) and
+	the action _KEEP_IF_PREV means that there is no break if the previous character
+	has the same property as the second one of the pair (WB7 and WB11).
+	"""
+	size = len(WORD_BREAK_VALUES)
+	# WB14: Any ÷ Any
+	actions = [[_BREAK] * size for i in xrange(size)]
+	# WB5, WB8, WB9, WB10: ALetter and Numeric
+	for a in (_ALETTER, _NUMERIC):
+		for b in (_ALETTER, _NUMERIC):
+			actions[a][b] = _KEEP
+	# WB13: Katakana × Katakana
+	actions[_KATAKANA][_KATAKANA] = _KEEP
+	# WB13a, WB13b: ExtendNumLet
+	for a in (_ALETTER, _NUMERIC, _KATAKANA, _EXTENDNUMLET):
+		actions[a][_EXTENDNUMLET] = _KEEP
+		actions[_EXTENDNUMLET][a] = _KEEP
+	# WB6, WB7: ALetter (MidLetter | MidNumLet) ALetter
+	for m in (_MIDLETTER, _MIDNUMLET):
+		actions[_ALETTER][m] = _KEEP_IF_NEXT
+		actions[m][_ALETTER] = _KEEP_IF_PREV
+	# WB11, WB12: Numeric (MidNum | MidNumLet) Numeric
+	for m in (_MIDNUM, _MIDNUMLET):
+		actions[_NUMERIC][m] = _KEEP_IF_NEXT
+		actions[m][_NUMERIC] = _KEEP_IF_PREV
+	# WB3a, WB3b: break after and before newlines
+	for a in (_CR, _LF, _NEWLINE):
+		for b in xrange(size):
+			actions[a][b] = _BREAK
+			actions[b][a] = _BREAK
+	# WB3: CR × LF
+	actions[_CR][_LF] = _KEEP
+	return actions
+
+
+
+class UAX29WordTokenizer(TokenizerI):
+	"""A word tokenizer following the default word boundaries of the Unicode
+	Standard Annex #29 (http://www.unicode.org/reports/tr29/).
+	
+	The text is segmented in a single pass over the Word_Break property ids
+	of its characters using a precompiled matrix of actions.
+	This tokenizer can be used instead of the `GenericTreebankWordTokenizer`.
+	
+	Note that UAX #29 does not segment the words written in scripts without spaces
+	(Han, Hiragana, Thai, etc.): each character is returned as a separate token.
+	"""
+	
+	_ACTIONS = _build_actions()
+	
+	
+	def span_tokenize(self, text, no_space=True, **kwargs):
+		"""Return the spans for each token"""
+		if not text:
+			return []
+		
+		# Get the property id of each character
+		cache = _WORD_BREAK_CACHE
+		props = [cache[c] if c in cache else _word_break_id(c) for c in text]
+		
+		# WB4: ignore the Extend and Format characters except after a newline
+		# by keeping only the positions of the other characters
+		positions = [0]
+		last = props[0]
+		for i in xrange(1, len(props)):
+			p = props[i]
+			if (p == _EXTEND or p == _FORMAT) and last != _CR and last != _LF and last != _NEWLINE:
+				continue
+			positions.append(i)
+			last = p
+		bases = [props[i] for i in positions]
+		
+		# Apply the boundary rules on each pair of consecutive characters
+		actions = self._ACTIONS
+		spans = []
+		start = 0
+		length = len(bases)
+		for k in xrange(1, length):
+			a = bases[k-1]
+			b = bases[k]
+			action = actions[a][b]
+			if action == _KEEP:
+				continue
+			elif action == _KEEP_IF_NEXT:
+				if k+1 < length and bases[k+1] == a:
+					continue
+			elif action == _KEEP_IF_PREV:
+				if k >= 2 and bases[k-2] == b:
+					continue
+			end = positions[k]
+			spans.append((start, end))
+			start = end
+		spans.append((start, len(text)))
+		
+		if no_space:
+			spans = [(s,e) for s,e in spans if not text[s:e].isspace()]
+		return spans
+	
+	
+	def tokenize(self, text, **kwargs):
+		"""Tokenize the text"""
+		return [text[s:e] for s,e in self.span_tokenize(text, **kwargs)]
+
+
+
+################################################################################
+# Initializing functions
+################################################################################
+
+_WORD_BREAK_CACHE = {}
+try:
+	_WORD_BREAK_TABLE = compile_ucd_data(read_ucd_datafile('WordBreakProperty.txt'), WORD_BREAK_VALUES)
+except IOError:
+	# Derive the property from the general category and the script
+	_WORD_BREAK_TABLE = None
+_SCRIPT_TABLE = compile_ucd_data(read_ucd_datafile('Scripts.txt'), _SCRIPT_IDS, _SCRIPT_OTHER)
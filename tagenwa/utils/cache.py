@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+"""
+Bounded caches
+
+"""
+__license__ = "MIT"
+
+from threading import Lock
+
+# Fields of the nodes of the linked list of the LRU cache
+_PREV, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+
+class LRUCache(object):
+	"""Mapping of a bounded size which discards the least recently used keys.
+	
+	The keys are kept in a circular doubly linked list from the least to
+	the most recently used, so that each lookup and insertion is done in
+	constant time. The numbers of hits and misses of `get` are counted.
+	The updates of the list are guarded by a lock, so that a cache can be
+	shared by several threads.
+	
+	>>> cache = LRUCache(2)
+	>>> cache[u'a'] = 1
+	>>> cache[u'b'] = 2
+	>>> cache.get(u'a')
+	1
+	>>> cache[u'c'] = 3
+	>>> sorted(cache.keys())
+	[u'a', u'c']
+	>>> cache.get(u'b') is None
+	True
+	>>> cache.hits, cache.misses
+	(1, 1)
+	"""
+	
+	def __init__(self, maxsize):
+		"""Create a new empty cache.
+		
+		:param maxsize: maximum number of keys
+		:type maxsize: int
+		"""
+		if maxsize < 1:
+			raise ValueError('The maximum size must be a positive integer.')
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._nodes = {}
+		self._root = []
+		self._root[:] = [self._root, self._root, None, None]
+		self._lock = Lock()
+	
+	
+	def get(self, key, default=None):
+		"""Return the value of the key and mark it as the most recently used."""
+		with self._lock:
+			node = self._nodes.get(key)
+			if node is None:
+				self.misses += 1
+				return default
+			self.hits += 1
+			# Move the node to the end of the list
+			prev, next = node[_PREV], node[_NEXT]
+			prev[_NEXT] = next
+			next[_PREV] = prev
+			root = self._root
+			last = root[_PREV]
+			last[_NEXT] = root[_PREV] = node
+			node[_PREV], node[_NEXT] = last, root
+			return node[_VALUE]
+	
+	
+	def __setitem__(self, key, value):
+		"""Set the value of the key, discarding the least recently used key if the cache is full."""
+		with self._lock:
+			root = self._root
+			node = self._nodes.get(key)
+			if node is not None:
+				# Unlink the previous node of the key
+				node[_PREV][_NEXT] = node[_NEXT]
+				node[_NEXT][_PREV] = node[_PREV]
+			elif len(self._nodes) >= self.maxsize:
+				# Discard the first node of the list
+				oldest = root[_NEXT]
+				oldest[_NEXT][_PREV] = root
+				root[_NEXT] = oldest[_NEXT]
+				del self._nodes[oldest[_KEY]]
+			last = root[_PREV]
+			node = [last, root, key, value]
+			last[_NEXT] = root[_PREV] = self._nodes[key] = node
+	
+	
+	def __contains__(self, key):
+		return key in self._nodes
+	
+	
+	def __len__(self):
+		return len(self._nodes)
+	
+	
+	def keys(self):
+		"""Return the list of the keys from the least to the most recently used."""
+		keys = []
+		with self._lock:
+			node = self._root[_NEXT]
+			while node is not self._root:
+				keys.append(node[_KEY])
+				node = node[_NEXT]
+		return keys
+	
+	
+	def clear(self):
+		"""Remove all the keys (the statistics are kept)."""
+		with self._lock:
+			self._nodes.clear()
+			self._root[:] = [self._root, self._root, None, None]
+	
+	
+	def info(self):
+		"""Return the statistics of the cache.
+		
+		:return: hits, misses, maxsize and size of the cache
+		:rtype: dict
+		"""
+		with self._lock:
+			return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.maxsize, 'size': len(self._nodes)}
@@ -3,9 +3,10 @@
 Useful functions for handling iterables
 
 """
-from itertools import tee, chain, izip, izip_longest
-# INFO: izip_longest is new in Python 2.6
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import groupby
+from operator import itemgetter
+# INFO: the maxlen argument of deque is new in Python 2.6
 
 
 def sliding_tuples(iterable, length, fill_value=None, fill_lead=True, fill_tail=True):
@@ -31,31 +32,35 @@ def sliding_tuples(iterable, length, fill_value=None, fill_lead=True, fill_tail=
 	:rtype: iterator
 	"""
 	
-	# fill lead if needed
-	if fill_lead:
-		iterable = chain([fill_value]*(length-1), iterable)
+	return sliding_window(iterable, length, fill_value, fill_lead, fill_tail)
+
+
+def sliding_window(iterable, length, fill_value=None, fill_lead=True, fill_tail=True):
+	"""Generate an iterable of tuples of consecutive items from the iterable
+	using a window of fixed length.
+	
+	The arguments and the tuples are the same as for `sliding_tuples`.
+	
+	>>> list(sliding_window(xrange(4), 3))
+	[(None, None, 0), (None, 0, 1), (0, 1, 2), (1, 2, 3), (2, 3, None), (3, None, None)]
 	
-	# make a list of n iterables
-	# and initialize each iterable by shifting it according to his index
-	iterables = tee(iterable, length)
-	for i in xrange(1,length):
-		for j in xrange(i):
-			try:
-				iterables[i].next()
-			except StopIteration as e:
-				# leave iterable closed if shorter than 'length'
-				# (izip_longuest will take care of it)
-				pass
+	:rtype: iterator
+	"""
+	window = deque([fill_value] * (length - 1) if fill_lead else [], maxlen=length)
+	append = window.append
+	for item in iterable:
+		append(item)
+		if len(window) == length:
+			yield tuple(window)
 	
 	# fill tail if needed
 	if fill_tail:
-		zipped = izip_longest(*iterables, fillvalue=fill_value)
-	else:
-		zipped = izip(*iterables)
-	
-	# yield the tuples
-	for tu in zipped:
-		yield tu
+		# items that did not start a tuple yet
+		items = list(window)
+		if len(items) == length:
+			items = items[1:]
+		for i in xrange(len(items)):
+			yield tuple(items[i:]) + (fill_value,) * (length - len(items) + i)
 
 
 def counts(iterable):
@@ -68,26 +73,38 @@ def counts(iterable):
 
 def merge_tagged(iterable, merge_tokens=None):
 	"""Return an iterable of tagged tokens where the consecutive tokens having the same tag
-	in the given iterable have been merged."""
+	in the given iterable have been merged.
+	
+	The iterable is read lazily and only the tokens of the current run are buffered.
+	"""
+	if merge_tokens is None:
+		merge_tokens = lambda x:x
+	for tag, run in groupby(iterable, itemgetter(1)):
+		yield (merge_tokens([token for token, t in run]), tag)
+
+
+def merge_tagged_spans(iterable):
+	"""Return an iterable of tuples (start, end, tag) where start and end are
+	the indexes of the first and after the last tokens of each run of
+	consecutive tokens having the same tag.
+	
+	>>> list(merge_tagged_spans([(u'a', 1), (u'b', 1), (u'c', 2), (u'd', 1)]))
+	[(0, 2, 1), (2, 3, 2), (3, 4, 1)]
+	"""
 	# Initialize the iteration
 	iterator = iter(iterable)
 	try:
 		token, tag0 = iterator.next()
-		buffer = [token]
 	except StopIteration:
-		# Re-raise the StopIteration in case of empty iterator
-		raise
-	
-	if merge_tokens is None:
-		merge_tokens = lambda x:x
+		return
 	
-	# Merge consecutive tokens having the same tag
-	merged_tagged = []
+	# Yield the span of consecutive tokens having the same tag
+	start = 0
+	i = 1
 	for token, tag in iterator:
 		if tag != tag0:
-			yield (merge_tokens(buffer), tag0)
-			buffer = [token]
+			yield (start, i, tag0)
+			start = i
 			tag0 = tag
-		else:
-			buffer.append(token)
-	yield (merge_tokens(buffer), tag0)
+		i += 1
+	yield (start, i, tag0)
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+"""
+Approximate counting in a bounded memory
+
+"""
+__license__ = "MIT"
+
+import heapq
+
+
+class MisraGries(object):
+	"""Misra-Gries summary of the most frequent items of a stream.
+	
+	The summary keeps at most 2 * capacity counters.  When it is full, the
+	counters are decreased by the (capacity + 1)-th largest count and the
+	counters dropping to zero are removed, so that only the capacity largest
+	counters remain.  Each count is therefore underestimated by at most
+	`error`, which is lower than n / (capacity + 1) where n is the total
+	count of the stream, and every item more frequent than `error` is kept.
+	
+	>>> summary = MisraGries(2)
+	>>> summary.update(u'abracadabra')
+	>>> sorted(summary.items())
+	[(u'a', 4), (u'b', 1), (u'r', 1)]
+	>>> summary.n, summary.error
+	(11, 1)
+	"""
+	
+	def __init__(self, capacity):
+		"""Create a new empty summary.
+		
+		:param capacity: number of counters kept after each reduction
+		:type capacity: int
+		"""
+		if capacity < 1:
+			raise ValueError('The capacity must be a positive integer.')
+		self.capacity = capacity
+		self.counts = {}
+		self.n = 0
+		self.error = 0
+	
+	
+	def update(self, items):
+		"""Count each item of the iterable once."""
+		counts = self.counts
+		get = counts.get
+		limit = 2 * self.capacity
+		for item in items:
+			counts[item] = get(item, 0) + 1
+			self.n += 1
+			if len(counts) > limit:
+				self._reduce()
+	
+	
+	def update_counts(self, mapping):
+		"""Add the counts of the mapping (item to count) to the summary."""
+		counts = self.counts
+		get = counts.get
+		limit = 2 * self.capacity
+		for item, c in mapping.iteritems():
+			counts[item] = get(item, 0) + c
+			self.n += c
+			if len(counts) > limit:
+				self._reduce()
+	
+	
+	def merge(self, other):
+		"""Merge another summary into this summary."""
+		self.update_counts(other.counts)
+		self.n += other.n - sum(other.counts.itervalues())
+		self.error += other.error
+	
+	
+	def _reduce(self):
+		"""Keep only the capacity largest counters."""
+		counts = self.counts
+		if len(counts) <= self.capacity:
+			return
+		threshold = heapq.nlargest(self.capacity + 1, counts.itervalues())[-1]
+		for item, c in counts.items():
+			if c > threshold:
+				counts[item] = c - threshold
+			else:
+				del counts[item]
+		self.error += threshold
+	
+	
+	def items(self):
+		"""Return the list of the items and their (underestimated) counts."""
+		return self.counts.items()
+	
+	
+	def __getitem__(self, item):
+		"""Return the lower bound of the count of the item."""
+		return self.counts.get(item, 0)
+	
+	
+	def __contains__(self, item):
+		return item in self.counts
+	
+	
+	def __len__(self):
+		return len(self.counts)
@@ -2,22 +2,32 @@
 import unittest
 
 import test_langid_ngram
+import test_tag_hmm
 import test_text_normalize
 import test_text_script
 import test_text_token
 import test_tokenize_dictionary
+import test_tokenize_maxmatch
 import test_tokenize_treebank
+import test_tokenize_uax29
+import test_utils_cache
 import test_utils_iterators
+import test_utils_sketch
 import test_utils_trie
 
 all_tests = unittest.TestSuite([
 	test_langid_ngram.suite(),
+	test_tag_hmm.suite(),
 	test_text_normalize.suite(),
 	test_text_script.suite(),
 	test_text_token.suite(),
 	test_tokenize_dictionary.suite(),
+	test_tokenize_maxmatch.suite(),
 	test_tokenize_treebank.suite(),
+	test_tokenize_uax29.suite(),
+	test_utils_cache.suite(),
 	test_utils_iterators.suite(),
+	test_utils_sketch.suite(),
 	test_utils_trie.suite(),
 ])
 
@@ -1,9 +1,49 @@
 # -*- coding: UTF-8 -*-
 import tagenwa.langid.ngram as ngram
+from tagenwa.langid.model import _MAGIC
+from tagenwa.utils.iterators import sliding_tuples
+
+from zlib import crc32
+from math import exp, log
+try:
+	import numpy
+except ImportError:
+	numpy = None
+from array import array
+import itertools
+import struct
+import copy
+import codecs
+import os
+import shutil
+import tempfile
 
 import unittest, doctest
 
 
+## Small training corpus
+TRAINING_TEXTS = [
+	(u'en', u'The quick brown fox jumps over the lazy dog. When he saw him, he said that the weather was nice and that they should go for a walk in the park.'),
+	(u'en', u'Language identification is the problem of determining which natural language a given content is written in.'),
+	(u'fr', u'Le vif renard brun saute par-dessus le chien paresseux. Quand il le vit, il lui dit que le temps était beau et qu\'ils devraient aller se promener dans le parc.'),
+	(u'fr', u'L\'identification de la langue consiste à déterminer dans quelle langue naturelle est écrit un contenu donné.'),
+	(u'de', u'Der schnelle braune Fuchs springt über den faulen Hund. Als er ihn sah, sagte er, dass das Wetter schön sei und dass sie im Park spazieren gehen sollten.'),
+	(u'de', u'Die Spracherkennung ist das Problem festzustellen, in welcher natürlichen Sprache ein gegebener Inhalt geschrieben ist.'),
+]
+
+def get_training(n=3):
+	training = ngram.NgramLanguageTraining(n=n)
+	for lang, text in TRAINING_TEXTS:
+		training.add(text, lang)
+	return training
+
+def get_hashed_training():
+	training = ngram.HashedNgramLanguageTraining(orders=(1, 2, 3), buckets=4096)
+	for lang, text in TRAINING_TEXTS:
+		training.add(text, lang)
+	return training
+
+
 class TestTokenize(unittest.TestCase):
 	
 	def test_space(self):
@@ -47,6 +87,628 @@ class TestNgram(unittest.TestCase):
 	def test_ngram_doctest(self):
 		failure_count, test_count = doctest.testmod(ngram)
 		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.langid.ngram: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_extractor(self):
+		def sliding_ngrams(token, n):
+			# Reference implementation based on sliding tuples
+			if n <= 2:
+				check_not_none = []
+			else:
+				check_not_none = [(n - 1) / 2] if n % 2 else [n / 2 -1, n / 2]
+			if ngram._SPACEPUNCT.match(token) is not None or ngram._DECIMALS.match(token) is not None:
+				return []
+			return [u''.join(tu) for tu in sliding_tuples(token.lower(), n, fill_value=u' ') if all(tu[i] != u' ' for i in check_not_none)]
+		
+		text = u'Hello World, a ab abc 123 x1 1x -- É Ça 今日John Smith氏は会議に出ました。Ὀδυσσεύς'
+		tokens = ngram.tokenize(text)
+		for n in xrange(1, 6):
+			extractor = ngram.NgramExtractor(n)
+			expected = [sliding_ngrams(token, n) for token in tokens]
+			self.assertEqual(expected, [extractor(token) for token in tokens])
+			expected = list(itertools.chain.from_iterable(expected))
+			self.assertEqual(expected, extractor.batch(tokens))
+			self.assertEqual([], extractor.batch([]))
+			self.assertEqual([], extractor.batch([u' ', u'123']))
+			hashed = ngram.NgramExtractor(n, hashed=True)
+			self.assertEqual([crc32(g.encode('utf-8')) & 0xffffffff for g in expected], hashed.batch(tokens))
+			hashed = ngram.NgramExtractor(n, hashed=True, buckets=64)
+			self.assertTrue(all(0 <= i < 64 for i in hashed.batch(tokens)))
+	
+	
+	def test_model_doctest(self):
+		import tagenwa.langid.model
+		failure_count, test_count = doctest.testmod(tagenwa.langid.model)
+		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.langid.model: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_parallel_training(self):
+		# Write the training texts in one directory per language
+		path = tempfile.mkdtemp()
+		try:
+			paths = {}
+			for i, (lang, text) in enumerate(TRAINING_TEXTS):
+				directory = os.path.join(path, lang)
+				if not os.path.isdir(directory):
+					os.mkdir(directory)
+				filename = os.path.join(directory, '%i.txt' % i)
+				with codecs.open(filename, 'w', encoding='utf-8') as f:
+					f.write(text.replace(u'. ', u'.\n'))
+				paths.setdefault(lang, []).append(filename)
+			with open(os.path.join(path, 'en', 'ignored.dat'), 'w') as f:
+				f.write('ignored')
+			
+			expected = get_training().get_freqdists()
+			for processes in (1, 2):
+				training = ngram.NgramLanguageTraining(n=3)
+				training.add_directory(path, processes=processes)
+				self.assertEqual(expected, training.get_freqdists())
+				training = ngram.NgramLanguageTraining(n=3)
+				for lang in paths:
+					training.add_files(paths[lang], lang, processes=processes)
+				self.assertEqual(expected, training.get_freqdists())
+			training = ngram.NgramLanguageTraining(n=3)
+			training.add_directory(os.path.join(path, 'fr'), language=u'fr', processes=1)
+			self.assertEqual([u'fr'], training.get_freqdists().keys())
+			self.assertEqual(expected[u'fr'], training.get_freqdists()[u'fr'])
+			
+			hashed = ngram.HashedNgramLanguageTraining(buckets=1024)
+			for lang, text in TRAINING_TEXTS:
+				hashed.add(text, lang)
+			training = ngram.HashedNgramLanguageTraining(buckets=1024)
+			training.add_directory(path, processes=2)
+			self.assertEqual(hashed._counts, training._counts)
+		finally:
+			shutil.rmtree(path)
+	
+	
+	def test_save_load(self):
+		training = get_training()
+		classifier = ngram.NgramLanguageClassifier(training)
+		fd, path = tempfile.mkstemp()
+		os.close(fd)
+		try:
+			classifier.save(path)
+			loaded = ngram.NgramLanguageTraining.load(path)
+			self.assertEqual(training.get_freqdists(), loaded.get_freqdists())
+			self.assertEqual(3, loaded._ngrams.n)
+			
+			loaded = ngram.NgramLanguageClassifier.load(path)
+			self.assertEqual(sorted(classifier.labels()), sorted(loaded.labels()))
+			self.assertEqual(len(classifier._model), len(loaded._model))
+			model = classifier._model
+			for text in (u'the weather', u'le temps', u'das Wetter', u'xyzzy', u'Ὀδυσσεύς', u''):
+				ngrams = training.get_ngrams(ngram.tokenize(text))
+				expected = dict(zip(model.languages, model.logscores(ngrams)))
+				logscores = dict(zip(loaded._model.languages, loaded._model.logscores(ngrams)))
+				for lang in expected:
+					self.assertAlmostEqual(expected[lang], logscores[lang], places=9)
+				self.assertEqual(classifier.classify_text(text), loaded.classify_text(text))
+				for g in ngrams:
+					self.assertEqual(g in model, g in loaded._model)
+			if numpy is not None:
+				probs = loaded.batch_prob_classify_texts([u'the weather', u'le temps'])
+				self.assertTrue(numpy.allclose(classifier.batch_prob_classify_texts([u'the weather', u'le temps']), probs[:, [loaded.labels().index(l) for l in classifier.labels()]]))
+			loaded._model.close()
+			
+			# Only the vectors of the seen n-grams are cached, in a bounded cache
+			loaded = ngram.MappedNgramLanguageModel(path, cache_size=10)
+			self.assertEqual(loaded.unseen_logprob(), loaded.logprob(u'\u2603\u2603\u2603'))
+			self.assertEqual(0, len(loaded._cache))
+			ngrams = training.get_ngrams(ngram.tokenize(u'the weather le temps das Wetter'))
+			self.assertEqual(model.logscores(ngrams), loaded.logscores(ngrams))
+			self.assertEqual(10, len(loaded._cache))
+			self.assertEqual(model.logscores(ngrams), loaded.logscores(ngrams))
+			loaded.close()
+			
+			# The first section starts right after the header, whatever its size
+			for comment in (u'', u'x' * 1000):
+				ngram.write_model(path, training.get_freqdists(), comment=comment)
+				loaded = ngram.MappedNgramLanguageModel(path)
+				self.assertEqual(comment, loaded.metadata[u'comment'])
+				self.assertEqual(len(model), len(loaded))
+				with open(path, 'rb') as f:
+					f.seek(len(_MAGIC))
+					length, = struct.unpack('<I', f.read(4))
+				self.assertTrue(0 <= loaded._offsets - (len(_MAGIC) + 4 + length) < 8)
+				loaded.close()
+			
+			self.assertRaises(ValueError, ngram.NgramLanguageTraining(ngram_function=lambda t: [t]).save, path)
+			
+			# The counts that do not fit in 32 bits are rejected before the file is written
+			freqdists = training.get_freqdists()
+			freqdists[u'en'] = freqdists[u'en'].copy()
+			freqdists[u'en'][u' th'] = 2 ** 32
+			self.assertRaises(ValueError, ngram.write_model, path + '.big', freqdists)
+			self.assertFalse(os.path.exists(path + '.big'))
+		finally:
+			os.remove(path)
+		self.assertRaises(ValueError, ngram.NgramLanguageClassifier.load, __file__)
+	
+	
+	def test_pruning(self):
+		training = get_training()
+		freqdists = training.get_freqdists()
+		self.assertTrue(freqdists is training.get_freqdists())
+		
+		pruned = training.get_freqdists(min_count=2)
+		for lang in freqdists:
+			expected = dict((g, c) for g, c in freqdists[lang].items() if c >= 2)
+			self.assertEqual(expected, dict(pruned[lang]))
+		
+		pruned = training.get_freqdists(top_k=10)
+		for lang in freqdists:
+			self.assertEqual(10, len(pruned[lang]))
+			self.assertTrue(min(pruned[lang].values()) >= sorted(freqdists[lang].values())[-10])
+		
+		pruned = training.get_freqdists(max_vocabulary=50)
+		vocabulary = set().union(*pruned.values())
+		self.assertEqual(50, len(vocabulary))
+		for lang in freqdists:
+			self.assertTrue(all(freqdists[lang][g] == c for g, c in pruned[lang].items()))
+		
+		pruned = training.get_freqdists(min_count=2, top_k=20, max_vocabulary=30)
+		self.assertTrue(len(set().union(*pruned.values())) <= 30)
+		self.assertTrue(all(1 < c for fd in pruned.values() for c in fd.values()))
+		
+		classifier = ngram.NgramLanguageClassifier(training, top_k=100)
+		self.assertTrue(len(classifier._model) < len(training.get_model()))
+		self.assertEqual(u'fr', classifier.classify_text(u'le temps'))
+	
+	
+	def test_compiled_model(self):
+		training = get_training()
+		probdists = training.get_probdists()
+		model = training.get_model()
+		self.assertEqual(sorted(probdists), sorted(model.languages))
+		texts = [u'', u'the', u'xyzzy', u'le renard et le chien', u'der Hund im Park', u'the quick brown fox']
+		for text in texts:
+			ngrams = training.get_ngrams(ngram.tokenize(text))
+			logscores = dict(zip(model.languages, model.logscores(ngrams)))
+			for lang in probdists:
+				expected = sum(probdists[lang].logprob(g) for g in ngrams)
+				self.assertAlmostEqual(expected, logscores[lang], places=9)
+			for g in ngrams:
+				logprobs = dict(zip(model.languages, model.logprob(g)))
+				for lang in probdists:
+					self.assertAlmostEqual(probdists[lang].logprob(g), logprobs[lang], places=12)
+	
+	
+	def test_classifier(self):
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		self.assertEqual(set([u'en', u'fr', u'de', u'und']), set(classifier.labels()))
+		testcases = [
+			(u'the weather', u'en'),
+			(u'le temps', u'fr'),
+			(u'das Wetter', u'de'),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, classifier.classify_text(i))
+		featureset = classifier.get_token_featureset(u'renard')
+		scores = classifier.score_classify(featureset)
+		probdists = classifier._training.get_probdists()
+		for lang in probdists:
+			expected = sum(probdists[lang].logprob(g) for g in featureset[u'ngrams'])
+			self.assertAlmostEqual(exp(expected), scores[lang], places=12)
+	
+	
+	def test_log_score_classify(self):
+		for cutoff in (None, 0.01):
+			classifier = ngram.NgramLanguageClassifier(get_training(), cutoff=cutoff)
+			for text in (u'renard', u'the weather', u'xyzzy', u''):
+				featureset = classifier.get_token_featureset(text, logpriors={u'fr': -2.0})
+				logscores = classifier.log_score_classify(featureset)
+				scores = classifier.score_classify(featureset)
+				self.assertEqual(sorted(scores), sorted(logscores))
+				total = sum(scores.values())
+				probs = classifier.prob_classify(featureset)
+				for label in scores:
+					self.assertAlmostEqual(exp(logscores[label]), scores[label], places=12)
+					self.assertAlmostEqual(scores[label] / total, probs.prob(label), places=9)
+	
+	
+	def test_long_text(self):
+		# The scores of a long text underflow but not the log scores
+		classifier = ngram.NgramLanguageClassifier(get_training(), cutoff=1E-4)
+		for lang, text in TRAINING_TEXTS:
+			text = u' '.join([text] * 20)
+			featureset = {u'ngrams': classifier._training.get_ngrams(ngram.tokenize(text))}
+			self.assertTrue(all(score == 0.0 for score in classifier.score_classify(featureset).values()))
+			self.assertEqual(lang, classifier.classify_text(text))
+			self.assertAlmostEqual(1.0, classifier.prob_classify_text(text).prob(lang))
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		self.assertEqual(u'fr', classifier.classify_text(u'the', logpriors={u'fr': 0.0, u'en': -100.0, u'de': -100.0}))
+	
+	
+	def test_early_classify_text(self):
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		for lang, text in TRAINING_TEXTS:
+			text = u' '.join([text] * 20)
+			self.assertEqual((lang, len(text)), classifier.early_classify_text(text))
+			label, used = classifier.early_classify_text(text, margin=50.0)
+			self.assertEqual(lang, label)
+			self.assertTrue(0 < used < len(text))
+			self.assertTrue(text[used-1].isspace() or not text[used-1].isalnum())
+			label, used = classifier.early_classify_text(text, budget=100)
+			self.assertEqual(lang, label)
+			self.assertTrue(0 < used < len(text))
+			self.assertEqual(lang, classifier.classify_text(text, margin=50.0, budget=1000))
+		self.assertEqual((u'fr', 8), classifier.early_classify_text(u'le temps', margin=1000.0))
+		self.assertEqual((u'und', 0), classifier.early_classify_text(u''))
+		self.assertEqual(u'fr', classifier.classify_text(u'the', logpriors={u'fr': 0.0, u'en': -100.0, u'de': -100.0}, budget=10))
+		# The text used ends with the last token scored
+		get_ngrams = classifier._training.get_ngrams
+		text = u'the weather is nice today, and the sun is shining'
+		for budget in (1, 5, 17, 30, 100):
+			for chunk_size in (1, 1000):
+				label, used = classifier.early_classify_text(text, budget=budget, chunk_size=chunk_size)
+				tokens = ngram.tokenize(text[:used])
+				self.assertTrue(get_ngrams(tokens[-1:]))
+				self.assertTrue(len(get_ngrams(tokens)) >= budget or used == len(text))
+				self.assertTrue(len(get_ngrams(tokens[:-1])) < budget)
+				self.assertTrue(used == len(text) or not text[used].isalnum())
+		# Same log scores as the classification of the whole text
+		text = TRAINING_TEXTS[0][1]
+		featureset = {u'ngrams': classifier._training.get_ngrams(ngram.tokenize(text))}
+		logscores = classifier.log_score_classify(featureset)
+		for chunk_size in (1, 10, 1000):
+			self.assertEqual((max(logscores, key=logscores.get), len(text)), classifier.early_classify_text(text, chunk_size=chunk_size))
+	
+	
+	def test_prefilter(self):
+		training = get_training()
+		training.add(u'Съешь же ещё этих мягких французских булок, да выпей чаю. Москва (Moscow) - столица России.', u'ru')
+		script_languages = training.get_script_languages(min_share=0.1)
+		self.assertEqual([u'de', u'en', u'fr'], script_languages[u'Latin'])
+		self.assertEqual([u'ru'], script_languages[u'Cyrillic'])
+		self.assertEqual([u'de', u'en', u'fr', u'ru'], training.get_script_languages(min_share=0.0)[u'Latin'])
+		training = get_training()
+		training.add(u'Съешь же ещё этих мягких французских булок, да выпей чаю. Москва - столица России.', u'ru')
+		script_languages = training.get_script_languages()
+		self.assertEqual([u'de', u'en', u'fr'], script_languages[u'Latin'])
+		
+		classifier = ngram.NgramLanguageClassifier(training)
+		prefiltered = ngram.NgramLanguageClassifier(training, prefilter=True)
+		self.assertEqual(classifier.labels(), prefiltered.labels())
+		for text in (u'the weather', u'le temps', u'das Wetter', u'столица', u'Москва Moscow', u'12', u'Ὀδυσσεύς'):
+			featureset = {u'ngrams': training.get_ngrams(ngram.tokenize(text))}
+			logscores = classifier.log_score_classify(featureset)
+			prefiltered_logscores = prefiltered.log_score_classify(featureset)
+			self.assertEqual(sorted(logscores), sorted(prefiltered_logscores))
+			for label in logscores:
+				if label == u'und':
+					# The undetermined language is not above the candidate languages
+					candidates = [logscore for lang, logscore in prefiltered_logscores.iteritems() if lang != u'und' and logscore != float('-inf')]
+					self.assertTrue(float('-inf') < prefiltered_logscores[u'und'] <= min(candidates))
+					if len(candidates) == len(prefiltered.labels()) - 1:
+						self.assertAlmostEqual(logscores[u'und'], prefiltered_logscores[u'und'])
+				elif prefiltered_logscores[label] != float('-inf'):
+					self.assertAlmostEqual(logscores[label], prefiltered_logscores[label])
+			self.assertEqual(classifier.classify_text(text), prefiltered.classify_text(text))
+			probs = prefiltered.prob_classify(featureset)
+			self.assertAlmostEqual(1.0, sum(probs.prob(label) for label in prefiltered.labels()))
+		
+		# Same results with the early and the batch classifications
+		texts = [u'the weather', u'столица', u'Москва Moscow', u'12', u'Ὀδυσσεύς', u'']
+		for text in texts:
+			self.assertEqual(prefiltered.classify_text(text), prefiltered.early_classify_text(text)[0])
+			self.assertEqual(prefiltered.classify_text(text), prefiltered.early_classify_text(text, chunk_size=1)[0])
+		self.assertEqual(u'ru', prefiltered.classify_text(u'столица', margin=1.0))
+		if numpy is not None:
+			for probs, text in zip(prefiltered.batch_prob_classify_texts(texts), texts):
+				expected = prefiltered.prob_classify_text(text)
+				for label, p in zip(prefiltered.labels(), probs):
+					self.assertAlmostEqual(expected.prob(label), p, places=9)
+		
+		featureset = {u'ngrams': training.get_ngrams(ngram.tokenize(u'столица'))}
+		probs = prefiltered.prob_classify(featureset)
+		self.assertEqual(0.0, probs.prob(u'en'))
+		self.assertTrue(probs.prob(u'und') > 0.0)
+		self.assertEqual(u'ru', probs.max())
+		featureset = {u'ngrams': training.get_ngrams(ngram.tokenize(u'Ὀδυσσεύς'))}
+		self.assertTrue(prefiltered.prob_classify(featureset).prob(u'en') > 0.0)
+		
+		tagger = ngram.NgramHMMLanguageTagger(prefiltered)
+		tagged = tagger.tag_text(u'The weather is nice в Москве')
+		self.assertEqual(u'en', tagged[0][1])
+		self.assertEqual(u'ru', tagged[-1][1])
+		
+		# The script languages are saved in the model file
+		fd, path = tempfile.mkstemp()
+		os.close(fd)
+		try:
+			training.save(path)
+			loaded = ngram.NgramLanguageClassifier.load(path, prefilter=True)
+			self.assertEqual(script_languages, loaded._model.metadata[u'scripts'])
+			self.assertEqual(u'ru', loaded.classify_text(u'столица'))
+			loaded._model.close()
+		finally:
+			os.remove(path)
+	
+	
+	def test_hashed_training(self):
+		training = get_hashed_training()
+		model = training.get_model()
+		self.assertEqual(4096, len(model))
+		self.assertEqual(4096, len(training._counts[u'en']))
+		
+		# Same log-probabilities as the probability distributions of the buckets (in single precision)
+		probdists = training.get_probdists()
+		extractor = ngram.HashedNgramExtractor(orders=(1, 2, 3), buckets=4096)
+		ids = training.get_ngrams(ngram.tokenize(u'the weather xyzzy'))
+		self.assertEqual(extractor.batch(ngram.tokenize(u'the weather xyzzy')), ids)
+		self.assertEqual(sorted(extractor(u'the') + extractor(u'weather') + extractor(u'xyzzy')), sorted(ids))
+		logscores = dict(zip(model.languages, model.logscores(ids)))
+		for lang in probdists:
+			self.assertAlmostEqual(sum(probdists[lang].logprob(i) for i in ids), logscores[lang], places=4)
+		
+		# The log-probability of an unseen n-gram is the one of an empty bucket
+		for lang, logprob in zip(model.languages, model.unseen_logprob()):
+			self.assertAlmostEqual(probdists[lang].logprob(training._counts[lang].index(0)), logprob, places=4)
+		updated = model.update(u'ru', array('L', [1, 3] + [0] * 4094))
+		self.assertEqual(model.unseen_logprob(), updated.unseen_logprob()[:3])
+		self.assertAlmostEqual(log(0.5 / 5.0, 2), updated.unseen_logprob()[3])
+		
+		classifier = ngram.NgramLanguageClassifier(training)
+		for text, lang in ((u'the weather', u'en'), (u'le temps', u'fr'), (u'das Wetter', u'de')):
+			self.assertEqual(lang, classifier.classify_text(text))
+		if numpy is not None:
+			probs = classifier.batch_prob_classify_texts([u'the weather', u'le temps'])
+			for row, text in zip(probs, [u'the weather', u'le temps']):
+				expected = classifier.prob_classify_text(text)
+				for label, p in zip(classifier.labels(), row):
+					self.assertAlmostEqual(expected.prob(label), p, places=5)
+		
+		pruned = training.get_model(top_k=50)
+		self.assertEqual(4096, len(pruned))
+		self.assertEqual(50, len(training.get_freqdists(top_k=50)[u'fr']))
+		self.assertRaises(ValueError, training.get_script_languages)
+		self.assertRaises(ValueError, ngram.NgramLanguageClassifier, training, prefilter=True)
+	
+	
+	def test_streaming_training(self):
+		exact = get_training()
+		
+		# With a capacity larger than the vocabulary, the counts are exact
+		training = ngram.StreamingNgramLanguageTraining(n=3, capacity=10000)
+		self.assertEqual(len(TRAINING_TEXTS), training.add_stream((text, lang) for lang, text in TRAINING_TEXTS))
+		self.assertEqual(exact.get_freqdists(), training.get_freqdists())
+		self.assertEqual({u'en': 0, u'fr': 0, u'de': 0}, training.get_errors())
+		
+		# With a small capacity, the frequent n-grams are kept with bounded errors
+		training = ngram.StreamingNgramLanguageTraining(n=3, capacity=50)
+		training.add_stream(((text, lang) for lang, text in TRAINING_TEXTS * 3), compact_every=2)
+		freqdists = training.get_freqdists()
+		errors = training.get_errors()
+		for lang, freqdist in exact.get_freqdists().iteritems():
+			self.assertTrue(0 < errors[lang] <= 3 * freqdist.N() // 51)
+			self.assertTrue(len(freqdists[lang]) <= 100)
+			for g, c in freqdists[lang].iteritems():
+				self.assertTrue(3 * freqdist[g] - errors[lang] <= c <= 3 * freqdist[g])
+			for g, c in freqdist.iteritems():
+				if 3 * c > errors[lang]:
+					self.assertTrue(g in freqdists[lang])
+		classifier = ngram.NgramLanguageClassifier(training)
+		for text, lang in ((u'the weather', u'en'), (u'le temps', u'fr'), (u'das Wetter', u'de')):
+			self.assertEqual(lang, classifier.classify_text(text))
+		
+		# The summaries continue from the compacted frequency distributions
+		training.add(u'the weather the weather', u'en')
+		self.assertEqual(freqdists[u'en'][u' th'] + 2, training.get_freqdists()[u'en'][u' th'])
+	
+	
+	def test_update(self):
+		texts = [
+			(u'en', u'The weather is nice today.'),
+			(u'fr', u'Le temps est beau aujourd\'hui.'),
+			(u'ru', u'Москва является столицей России.'),
+		]
+		probes = [u'the weather', u'le temps', u'столица', u'xyzzy', u'das Wetter']
+		trainings = [
+			(get_training, {}),
+			(get_training, {'top_k': 40}),
+			(lambda: get_hashed_training(), {}),
+		]
+		for make_training, pruning in trainings:
+			for prefilter in (False, True):
+				if prefilter and make_training is not get_training:
+					continue
+				classifier = ngram.NgramLanguageClassifier(make_training(), prefilter=prefilter, **pruning)
+				tagger = ngram.NgramHMMLanguageTagger(classifier)
+				snapshot = classifier.snapshot()
+				classifier.update((text, lang) for lang, text in texts)
+				
+				# Same results as a classifier compiled again from the updated training
+				expected = ngram.NgramLanguageClassifier(classifier._training, prefilter=prefilter, **pruning)
+				self.assertEqual(sorted(expected.labels()), sorted(classifier.labels()))
+				self.assertEqual(classifier.labels(), tagger.states)
+				for probe in probes:
+					featureset = {u'ngrams': classifier._training.get_ngrams(ngram.tokenize(probe))}
+					scores = classifier.log_score_classify(featureset)
+					for label, logscore in expected.log_score_classify(featureset).iteritems():
+						self.assertAlmostEqual(logscore, scores[label], places=6)
+				self.assertEqual(u'ru', classifier.classify_text(u'столица'))
+				self.assertEqual(u'ru', tagger.tag_text(u'the weather is nice in Москва')[-1][1])
+				
+				# The snapshot is not affected by the update
+				self.assertFalse(u'ru' in snapshot.labels())
+				self.assertNotEqual(u'ru', snapshot.classify_text(u'столица'))
+		
+		# The models pruned with max_vocabulary cannot be updated
+		classifier = ngram.NgramLanguageClassifier(get_training(), max_vocabulary=100)
+		self.assertRaises(ValueError, classifier.add, u'the weather', u'en')
+	
+	
+	def test_model_versions(self):
+		# The previous versions of an updated model are not modified
+		training = get_training()
+		texts = [(u'en', u'the weather is nice'), (u'fr', u'le temps est beau'), (u'ru', u'погода хорошая'), (u'en', u'the weather again')]
+		probes = [training.get_ngrams(ngram.tokenize(text)) for text in (u'the weather', u'le temps', u'погода', u'xyzzy')]
+		models = [training.get_model()]
+		compiled = [training.get_model()]
+		for lang, text in texts:
+			ngrams = training.get_ngrams(ngram.tokenize(text))
+			training.add_ngrams(ngrams, lang)
+			models.append(training.update_model(models[-1], lang, ngrams))
+			compiled.append(training.get_model())
+		# The first model is updated again (with a copy of its n-grams)
+		freqdists = get_training().get_freqdists()
+		freqdists[u'de'].update(training.get_ngrams(ngram.tokenize(u'das Wetter ist schön')))
+		models.append(models[0].update(u'de', freqdists[u'de']))
+		compiled.append(ngram.NgramLanguageModel.from_freqdists(freqdists))
+		for model, expected in zip(models, compiled):
+			self.assertEqual(len(expected), len(model))
+			self.assertEqual(sorted(expected.languages), sorted(model.languages))
+			self.assertEqual(sorted(expected._vectors.copy()), sorted(model._vectors.copy()))
+			for ngrams in probes:
+				logscores = dict(zip(model.languages, model.logscores(ngrams)))
+				for lang, logscore in zip(expected.languages, expected.logscores(ngrams)):
+					self.assertAlmostEqual(logscore, logscores[lang], places=9)
+				for g in ngrams:
+					self.assertEqual(g in expected, g in model)
+	
+	
+	def test_language_profile(self):
+		training = get_training()
+		training.add(u'Москва является столицей России. Погода сегодня хорошая, и мы пойдём гулять в парк.', u'ru')
+		text = u'The weather was nice, il lui dit que le temps était beau. Москва is the capital.'
+		tokens = ngram.tokenize(text)
+		logpriors = {u'en': -1.0, u'fr': -0.5}
+		for cutoff, prefilter in ((None, False), (1E-4, False), (None, True)):
+			classifier = ngram.NgramLanguageClassifier(training, cutoff=cutoff, prefilter=prefilter)
+			for window, step in ((5, 1), (8, 3), (100, 10)):
+				for priors in (None, logpriors):
+					profile = classifier.language_profile(text, window, step, logpriors=priors)
+					self.assertEqual(0, profile[0][0])
+					self.assertEqual(len(tokens), profile[-1][1])
+					for start, end, probdist in profile:
+						self.assertEqual(min(window, len(tokens)), end - start)
+						featureset = {u'ngrams': training.get_ngrams(tokens[start:end])}
+						if priors is not None:
+							featureset[u'logpriors'] = priors
+						expected = classifier.prob_classify(featureset)
+						for label in classifier.labels():
+							self.assertAlmostEqual(expected.prob(label), probdist.prob(label), places=6)
+			profile = classifier.language_profile(text, 5)
+			self.assertEqual(len(tokens) - 4, len(profile))
+			self.assertEqual(u'en', profile[0][2].max())
+			self.assertEqual(u'ru', profile[-4][2].max())
+		self.assertEqual([], classifier.language_profile(u'', 5))
+		self.assertRaises(ValueError, classifier.language_profile, text, 0)
+	
+	
+	def test_emission_cache(self):
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		text = u'When he saw him, he said: "Quand il le vit, il lui dit que le temps était beau."'
+		uncached = ngram.NgramHMMLanguageTagger(classifier, cache_size=None)
+		tagger = ngram.NgramHMMLanguageTagger(classifier, cache_size=10)
+		self.assertEqual(None, uncached.cache_info())
+		expected = uncached.tag_text(text)
+		self.assertEqual(expected, tagger.tag_text(text))
+		info = tagger.cache_info()
+		self.assertEqual(10, info['size'])
+		self.assertTrue(info['hits'] > 0)
+		# The emissions of the first token are not used by the Viterbi algorithm
+		self.assertEqual(len(ngram.tokenize(text)) - 1, info['hits'] + info['misses'])
+		
+		# The cache is shared by the sequences and keyed by the log priors
+		self.assertEqual(expected, tagger.tag_text(text))
+		self.assertTrue(tagger.cache_info()['hits'] > 2 * info['hits'])
+		logpriors = {u'fr': -100.0}
+		self.assertEqual(uncached.tag_text(text, logpriors=logpriors), tagger.tag_text(text, logpriors=logpriors))
+		
+		# The cache is cleared when the model changes
+		classifier.add(u'Москва является столицей России.', u'ru')
+		self.assertEqual(uncached.tag_text(u'he said Москва'), tagger.tag_text(u'he said Москва'))
+		self.assertEqual(u'ru', tagger.tag_text(u'he said Москва')[-1][1])
+		self.assertEqual(len(set(ngram.tokenize(u'he said Москва')[1:])), tagger.cache_info()['size'])
+		
+		# The feature sets may only contain the n-grams
+		featuresets = [{u'ngrams': classifier.get_token_featureset(token)[u'ngrams']} for token in ngram.tokenize(text)]
+		self.assertEqual(uncached.tag(featuresets), tagger.tag(featuresets))
+		self.assertEqual([tag for token, tag in tagger.tag_text(text)], [tag for featureset, tag in tagger.tag(featuresets)])
+		
+		# A sequence still tagged with the previous model only fills the cache of the previous model
+		previous = copy.copy(tagger)
+		previous._classifier = classifier.snapshot()
+		previous._emission = (previous._classifier._model, tagger._get_cache(previous._classifier._model))
+		classifier.add(u'Il tempo è bello.', u'it')
+		self.assertEqual(uncached.tag_text(u'he said'), tagger.tag_text(u'he said'))
+		featureset = classifier.get_token_featureset(u'tempo')
+		self.assertFalse(u'it' in previous.logemit(featureset))
+		self.assertTrue(u'it' in tagger.logemit(featureset))
+		self.assertEqual(3, tagger.cache_info()['size'])
+	
+	
+	def test_transition_matrices(self):
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		tagger = ngram.NgramHMMLanguageTagger(classifier, pswitch_words=1E-3)
+		word, space = {u'ngrams': [u' a ']}, {u'ngrams': []}
+		matrix = tagger.logtrans(word, word)
+		self.assertTrue(matrix is tagger.logtrans(word, space))
+		self.assertTrue(tagger.logtrans(space, word) is not matrix)
+		self.assertAlmostEqual(log(1E-3), matrix[u'en', u'fr'])
+		self.assertAlmostEqual(log(1 - 3E-3), matrix[u'en', u'en'])
+		self.assertAlmostEqual(log(1E-10), tagger.logtrans(space, space)[u'en', u'fr'])
+		self.assertAlmostEqual(log(1E-15), tagger.logtrans(space, word)[u'fr', u'und'])
+		
+		# The stay/switch Viterbi algorithm gives the same tags
+		self.assertTrue(tagger.has_switch_transitions())
+		self.assertEqual((matrix[u'en', u'en'], matrix[u'en', u'fr']), tagger.logswitch(word, word))
+		text = u'When he saw him, he said: "Quand il le vit, il lui dit que le temps était beau." Und er sagte'
+		featuresets = [classifier.get_token_featureset(token) for token in ngram.tokenize(text)]
+		if numpy is not None:
+			self.assertEqual(tagger._viterbi_dicts(featuresets), tagger._viterbi_switch(featuresets))
+		custom = ngram.NgramHMMLanguageTagger(classifier, logtrans=tagger.logtrans)
+		self.assertFalse(custom.has_switch_transitions())
+		self.assertEqual(tagger.tag_text(text), custom.tag_text(text))
+		
+		# The matrices follow the languages of the classifier
+		classifier.add(u'Москва является столицей России.', u'ru')
+		self.assertEqual(25, len(tagger.logtrans(word, word)))
+		
+		# The probabilities to switch must be valid with the number of languages
+		self.assertRaises(ValueError, ngram.NgramHMMLanguageTagger, classifier, pswitch_nonwords=0.3)
+		self.assertRaises(ValueError, ngram.NgramHMMLanguageTagger, classifier, pswitch_words=0.0)
+		tagger = ngram.NgramHMMLanguageTagger(classifier, pswitch_after_nonword=0.2)
+		self.assertEqual(7, len(tagger.tag_text(u'the weather is nice')))
+		classifier.add(u'Das Wetter ist schön.', u'de')
+		classifier.add(u'Il tempo è bello.', u'it')
+		self.assertRaises(ValueError, tagger.tag_text, u'the weather is nice')
+		try:
+			tagger.tag_text(u'the weather is nice')
+		except ValueError as e:
+			self.assertTrue('pswitch_after_nonword' in str(e))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_beam(self):
+		classifier = ngram.NgramLanguageClassifier(get_training())
+		tagger = ngram.NgramHMMLanguageTagger(classifier)
+		text = u'When he saw him, he said: "Quand il le vit, il lui dit que le temps était beau."'
+		expected = tagger.tag_text(text)
+		self.assertEqual(expected, tagger.tag_text(text, beam=len(classifier.labels())))
+		# The threshold must exceed the log-probability to switch to another language
+		self.assertEqual(expected, tagger.tag_text(text, beam_threshold=-log(1E-20)))
+		self.assertEqual(tagger.split_text(text), tagger.split_text(text, beam=3, beam_threshold=-log(1E-20)))
+		self.assertEqual([token for token, tag in expected], [token for token, tag in tagger.tag_text(text, beam=1)])
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_batch_prob_classify_texts(self):
+		texts = [u'the weather', u'le temps', u'', u'123', u'das Wetter im Park', u'xyzzy']
+		logpriors = {u'en': -1.0, u'de': -0.5}
+		for cutoff in (None, 0.01):
+			classifier = ngram.NgramLanguageClassifier(get_training(), cutoff=cutoff)
+			labels = classifier.labels()
+			for priors in (None, logpriors):
+				probs = classifier.batch_prob_classify_texts(texts, logpriors=priors)
+				self.assertEqual((len(texts), len(labels)), probs.shape)
+				for text, row in zip(texts, probs):
+					expected = classifier.prob_classify_text(text, logpriors=priors)
+					for label, p in zip(labels, row):
+						self.assertAlmostEqual(expected.prob(label), p, places=9)
+		self.assertEqual((0, len(labels)), classifier.batch_prob_classify_texts([]).shape)
 
 
 def suite():
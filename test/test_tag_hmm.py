@@ -0,0 +1,318 @@
+# -*- coding: UTF-8 -*-
+import unittest
+import random
+from math import log
+import itertools
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from nltk.classify.api import ClassifierI
+from nltk.probability import DictionaryProbDist
+
+from tagenwa.tag.hmm import ClassifierBasedHMMTagger, viterbi_arrays, viterbi_switch_arrays, viterbi_beam_arrays
+
+
+class RandomClassifier(ClassifierI):
+	"""Classifier returning the random probabilities given in the featuresets."""
+	
+	def __init__(self, labels):
+		self._labels = labels
+	
+	def labels(self):
+		return self._labels
+	
+	def prob_classify(self, featureset):
+		return DictionaryProbDist(featureset[u'probs'], normalize=True)
+
+
+def reference_viterbi(tagger, sequence):
+	"""Viterbi algorithm on the dictionaries of the tagger."""
+	states = tagger.states
+	p = tagger.loginit()
+	P = dict((j, p[j]) for j in states)
+	V = []
+	for ti, tj in zip(sequence, sequence[1:]):
+		pe = tagger.logemit(tj)
+		pt = tagger.logtrans(ti, tj)
+		W = {}
+		Q = {}
+		for j in states:
+			logprob, W[j] = max((P[i] + pt[i,j], i) for i in states)
+			Q[j] = logprob + pe[j]
+		P = Q
+		V.append(W)
+	logprob, j = max((P[i], i) for i in states)
+	path = [j]
+	for W in reversed(V):
+		j = W[j]
+		path.append(j)
+	path.reverse()
+	return path
+
+
+def random_sequence(rng, labels, length):
+	return [{u'probs': dict((label, rng.random() ** 4) for label in labels), u'switch': rng.random() < 0.3} for i in xrange(length)]
+
+
+class SwitchHMMTagger(ClassifierBasedHMMTagger):
+	"""Tagger with two constant transition matrices (with the stay/switch
+	decoder if switch is True)."""
+	
+	switch = False
+	
+	def logtrans(self, featureset1, featureset2):
+		pdiff = 0.05 if featureset2[u'switch'] else 0.005
+		return self._get_matrix(pdiff, lambda states: dict(((s1, s2), log(1 - pdiff * (len(states) - 1)) if s1 == s2 else log(pdiff))
+			for s1 in states for s2 in states))
+	
+	def has_switch_transitions(self):
+		return self.switch
+	
+	def logswitch(self, featureset1, featureset2):
+		pdiff = 0.05 if featureset2[u'switch'] else 0.005
+		return log(1 - pdiff * (len(self.states) - 1)), log(pdiff)
+
+
+class RandomHMMTagger(ClassifierBasedHMMTagger):
+	"""Tagger with a new random transition matrix at each step."""
+	
+	def __init__(self, classifier, seed):
+		super(RandomHMMTagger, self).__init__(classifier)
+		self._rng = random.Random(seed)
+	
+	def logtrans(self, featureset1, featureset2):
+		return dict(((s1, s2), log(self._rng.random())) for s1 in self.states for s2 in self.states)
+
+
+class MixedHMMTagger(RandomHMMTagger):
+	"""Tagger with two constant transition matrices and a new random
+	transition matrix at each step of the elements marked as random."""
+	
+	def logtrans(self, featureset1, featureset2):
+		if featureset2.get(u'random'):
+			return super(MixedHMMTagger, self).logtrans(featureset1, featureset2)
+		pdiff = 0.05 if featureset2[u'switch'] else 0.005
+		return self._get_matrix(pdiff, lambda states: dict(((s1, s2), log(1 - pdiff * (len(states) - 1)) if s1 == s2 else log(pdiff))
+			for s1 in states for s2 in states))
+
+
+class TestViterbi(unittest.TestCase):
+
+	def test_constant_matrices(self):
+		rng = random.Random(0)
+		labels = [u'en', u'fr', u'de', u'und']
+		for tagger in (ClassifierBasedHMMTagger(RandomClassifier(labels)), SwitchHMMTagger(RandomClassifier(labels))):
+			self.assertTrue(tagger.logtrans(None, {u'switch': True}) is tagger.logtrans(None, {u'switch': True}))
+			self.assertTrue(tagger.loginit() is tagger.loginit())
+			for length in (0, 1, 2, 10, 100):
+				sequence = random_sequence(rng, labels, length)
+				self.assertEqual(reference_viterbi(tagger, sequence) if sequence else [], tagger.viterbi(sequence))
+		
+		# The matrices are computed again when the states change
+		tagger = SwitchHMMTagger(RandomClassifier(labels))
+		matrix = tagger.logtrans(None, {u'switch': True})
+		tagger._classifier = RandomClassifier(labels + [u'ru'])
+		self.assertEqual(25, len(tagger.logtrans(None, {u'switch': True})))
+		self.assertEqual(16, len(matrix))
+		tagger._classifier.labels().append(u'it')
+		self.assertEqual(36, len(tagger.logtrans(None, {u'switch': True})))
+		
+		# The states can be assigned instead of the labels of the classifier
+		tagger = ClassifierBasedHMMTagger(RandomClassifier(labels))
+		tagger.states = labels[:2]
+		self.assertEqual(labels[:2], tagger.states)
+		self.assertEqual(4, len(tagger.logtrans(None, None)))
+		self.assertAlmostEqual(log(0.5), tagger._uniform_logprob)
+		sequence = random_sequence(rng, labels[:2], 10)
+		self.assertEqual(reference_viterbi(tagger, sequence), tagger.viterbi(sequence))
+		tagger.states = None
+		self.assertEqual(labels, tagger.states)
+		self.assertEqual(16, len(tagger.logtrans(None, None)))
+	
+	
+	def test_random_matrices(self):
+		rng = random.Random(1)
+		labels = [u'a', u'b', u'c']
+		sequence = random_sequence(rng, labels, 50)
+		expected = reference_viterbi(RandomHMMTagger(RandomClassifier(labels), 2), sequence)
+		self.assertEqual(expected, RandomHMMTagger(RandomClassifier(labels), 2).viterbi(sequence))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_vectorized(self):
+		rng = random.Random(3)
+		labels = [u'l%02i' % i for i in xrange(12)]
+		taggers = [
+			ClassifierBasedHMMTagger(RandomClassifier(labels)),
+			SwitchHMMTagger(RandomClassifier(labels)),
+			RandomHMMTagger(RandomClassifier(labels), 4),
+			MixedHMMTagger(RandomClassifier(labels), 4),
+		]
+		for tagger in taggers:
+			for length in (0, 1, 2, 30):
+				sequence = random_sequence(rng, labels, length)
+				for element in sequence[20:]:
+					element[u'random'] = True
+				tagger.vectorize_min_states = 1000
+				if isinstance(tagger, RandomHMMTagger):
+					tagger._rng.seed(4)
+				expected = tagger.viterbi(sequence)
+				tagger.vectorize_min_states = 1
+				if isinstance(tagger, RandomHMMTagger):
+					tagger._rng.seed(4)
+				self.assertEqual(expected, tagger.viterbi(sequence))
+		
+		# Ties are broken as by the dictionaries
+		tagger = ClassifierBasedHMMTagger(RandomClassifier(labels))
+		sequence = [{u'probs': dict((label, 1.0) for label in labels)}] * 5
+		tagger.vectorize_min_states = 1
+		self.assertEqual([labels[-1]] * 5, tagger.viterbi(sequence))
+		
+		# The transitions are converted one at a time when the matrices are not constant
+		states = sorted(labels, reverse=True)
+		sequence = random_sequence(rng, labels, 30)
+		self.assertEqual(2, len(SwitchHMMTagger(RandomClassifier(labels))._get_arrays(sequence, states)[2]))
+		loginit, logemit, logtrans, index = RandomHMMTagger(RandomClassifier(labels), 4)._get_arrays(sequence, states)
+		self.assertTrue(index is None)
+		self.assertFalse(isinstance(logtrans, numpy.ndarray))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_viterbi_arrays(self):
+		# Compare with the best path among all the paths
+		rng = numpy.random.RandomState(0)
+		size, length = 3, 5
+		loginit = numpy.log(rng.rand(size))
+		logemit = numpy.log(rng.rand(length, size))
+		logtrans = numpy.log(rng.rand(length - 1, size, size))
+		def best_path(matrices):
+			def logprob(path):
+				return loginit[path[0]] + logemit[0, path[0]] + sum(matrices[t][path[t], path[t+1]] + logemit[t+1, path[t+1]] for t in xrange(length - 1))
+			return list(max(itertools.product(range(size), repeat=length), key=logprob))
+		self.assertEqual(best_path(logtrans), list(viterbi_arrays(loginit, logemit, logtrans)))
+		self.assertEqual(best_path([logtrans[0]] * 4), list(viterbi_arrays(loginit, logemit, logtrans[0])))
+		index = numpy.array([1, 0, 1, 1])
+		self.assertEqual(best_path(logtrans[index]), list(viterbi_arrays(loginit, logemit, logtrans[:2], index)))
+		self.assertEqual(0, len(viterbi_arrays(loginit, logemit[:0], logtrans[0])))
+		self.assertEqual([numpy.argmax(loginit + logemit[0])], list(viterbi_arrays(loginit, logemit[:1], logtrans[0])))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_switch(self):
+		rng = random.Random(5)
+		for size in (4, 12):
+			labels = [u'l%02i' % i for i in xrange(size)]
+			tagger = SwitchHMMTagger(RandomClassifier(labels))
+			tagger.switch_min_states = 0
+			for length in (0, 1, 2, 30, 200):
+				sequence = random_sequence(rng, labels, length)
+				tagger.switch = False
+				expected = tagger.viterbi(sequence)
+				tagger.switch = True
+				self.assertEqual(expected, tagger.viterbi(sequence))
+		
+		# Ties are broken as by the dictionaries
+		sequence = [{u'probs': dict((label, 1.0) for label in labels), u'switch': True}] * 5
+		self.assertEqual([labels[-1]] * 5, tagger.viterbi(sequence))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_viterbi_switch_arrays(self):
+		rng = numpy.random.RandomState(1)
+		for size, length in ((1, 5), (2, 10), (6, 100)):
+			loginit = numpy.log(rng.rand(size))
+			logemit = numpy.log(rng.rand(length, size) ** 3)
+			logswitch = numpy.log(rng.rand(length - 1) / size)
+			logstay = numpy.log(1 - numpy.exp(logswitch) * (size - 1))
+			logtrans = numpy.empty((length - 1, size, size))
+			logtrans[:] = logswitch[:, numpy.newaxis, numpy.newaxis]
+			logtrans[:, numpy.arange(size), numpy.arange(size)] = logstay[:, numpy.newaxis]
+			self.assertEqual(list(viterbi_arrays(loginit, logemit, logtrans)),
+				list(viterbi_switch_arrays(loginit, logemit, logstay, logswitch)))
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_viterbi_beam_arrays(self):
+		rng = numpy.random.RandomState(2)
+		size, length = 8, 50
+		loginit = numpy.log(rng.rand(size))
+		logemit = numpy.log(rng.rand(length, size) ** 3)
+		logtrans = numpy.log(rng.rand(3, size, size))
+		index = rng.randint(0, 3, length - 1)
+		def logprob(path):
+			return loginit[path[0]] + logemit[0, path[0]] + sum(logtrans[index[t], path[t], path[t+1]] + logemit[t+1, path[t+1]] for t in xrange(length - 1))
+		
+		# Without pruning, the path is the exact one
+		expected = list(viterbi_arrays(loginit, logemit, logtrans, index))
+		self.assertEqual(expected, list(viterbi_beam_arrays(loginit, logemit, logtrans, index)))
+		self.assertEqual(expected, list(viterbi_beam_arrays(loginit, logemit, logtrans, index, beam=size)))
+		self.assertEqual(expected, list(viterbi_beam_arrays(loginit, logemit, logtrans, index, threshold=float('inf'))))
+		self.assertEqual(list(viterbi_arrays(loginit, logemit, logtrans[0])), list(viterbi_beam_arrays(loginit, logemit, logtrans[0], beam=size + 1)))
+		
+		# With pruning, the path is valid and not better than the exact one
+		for beam, threshold in ((1, None), (2, None), (None, 0.0), (None, 2.0), (3, 2.0)):
+			path = viterbi_beam_arrays(loginit, logemit, logtrans, index, beam=beam, threshold=threshold)
+			self.assertEqual(length, len(path))
+			self.assertTrue(all(0 <= k < size for k in path))
+			self.assertTrue(logprob(path) <= logprob(expected) + 1e-9)
+		
+		# A beam of one state follows the best state after each transition
+		P = loginit + logemit[0]
+		scores = P[:, numpy.newaxis] + logtrans[index[0]]
+		Q = scores.max(axis=0) + logemit[1]
+		greedy = [scores.argmax(axis=0)[Q.argmax()], Q.argmax()]
+		P = Q.max()
+		for t in xrange(2, length):
+			Q = P + logtrans[index[t-1], greedy[-1]] + logemit[t]
+			greedy.append(Q.argmax())
+			P = Q[greedy[-1]]
+		self.assertEqual(greedy, list(viterbi_beam_arrays(loginit, logemit, logtrans, index, beam=1)))
+		
+		self.assertEqual(0, len(viterbi_beam_arrays(loginit, logemit[:0], logtrans[0], beam=2)))
+		self.assertEqual([numpy.argmax(loginit + logemit[0])], list(viterbi_beam_arrays(loginit, logemit[:1], logtrans[0], beam=2)))
+		self.assertRaises(ValueError, viterbi_beam_arrays, loginit, logemit, logtrans[0], beam=0)
+		self.assertRaises(ValueError, viterbi_beam_arrays, loginit, logemit, logtrans[0], threshold=-1)
+	
+	
+	@unittest.skipIf(numpy is None, 'NumPy is not installed.')
+	def test_beam(self):
+		rng = random.Random(6)
+		labels = [u'l%02i' % i for i in xrange(12)]
+		for tagger in (ClassifierBasedHMMTagger(RandomClassifier(labels)), SwitchHMMTagger(RandomClassifier(labels))):
+			for length in (0, 1, 2, 30):
+				sequence = random_sequence(rng, labels, length)
+				expected = tagger.tag(sequence)
+				self.assertEqual(expected, tagger.tag(sequence, beam=len(labels)))
+				self.assertEqual(expected, tagger.tag(sequence, beam_threshold=float('inf')))
+				path = tagger.viterbi(sequence, beam=1)
+				self.assertEqual(length, len(path))
+				self.assertTrue(set(path) <= set(labels))
+		
+		# Transition matrices that are not constant
+		for tagger in (RandomHMMTagger(RandomClassifier(labels), 7), MixedHMMTagger(RandomClassifier(labels), 7)):
+			sequence = random_sequence(rng, labels, 30)
+			for element in sequence[10:]:
+				element[u'random'] = True
+			tagger._rng.seed(8)
+			expected = tagger.tag(sequence)
+			tagger._rng.seed(8)
+			self.assertEqual(expected, tagger.tag(sequence, beam=len(labels)))
+			tagger._rng.seed(8)
+			self.assertEqual(30, len(tagger.viterbi(sequence, beam=2, beam_threshold=1.0)))
+		
+		# Ties are broken as by the dictionaries
+		tagger = ClassifierBasedHMMTagger(RandomClassifier(labels))
+		sequence = [{u'probs': dict((label, 1.0) for label in labels)}] * 5
+		self.assertEqual([labels[-1]] * 5, tagger.viterbi(sequence, beam=1))
+		self.assertEqual([labels[-1]] * 5, tagger.viterbi(sequence, beam_threshold=0.0))
+
+
+
+def suite():
+	suite = unittest.TestLoader().loadTestsFromTestCase(TestViterbi)
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
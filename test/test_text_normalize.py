@@ -1,8 +1,11 @@
 # -*- coding: UTF-8 -*-
 import unittest, doctest
 import unicodedata
+import io
+import re
 
-from tagenwa.text.normalize import remove_combining_marks, remove_ligatures, collapse_spaces, normalize_eol
+from tagenwa.text.normalize import remove_combining_marks, remove_ligatures, collapse_spaces, normalize_eol, Normalizer, \
+	StreamNormalizer, OffsetMap
 
 class TestNormalize(unittest.TestCase):	
 	
@@ -22,6 +25,24 @@ class TestNormalize(unittest.TestCase):
 			self.assertEqual(e, remove_combining_marks(i))
 	
 	
+	def test_combining_marks_nfd(self):
+		def nfd_remove_combining_marks(text):
+			return u''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+		testcases = [
+			u'abc',
+			u'e\u0301\u0327',
+			u'\u1e69\u0323\u0307', # s with dot below and dot above and more marks
+			u'\u01d5\u0308',
+			u'\u212b\u2126', # singleton decompositions
+			u'\ud55c\uad6d\uc5b4', # hangul syllables
+		]
+		# All the characters of the Latin, Greek and Cyrillic blocks
+		testcases.append(u''.join(unichr(o) for o in xrange(0x80, 0x530)))
+		testcases.append(u''.join(unichr(o) for o in xrange(0x1e00, 0x2000)))
+		for i in testcases:
+			self.assertEqual(nfd_remove_combining_marks(i), remove_combining_marks(i), repr(i))
+	
+	
 	def test_ligatures(self):
 		testcases = [
 			#(u'straß',u'strass'),
@@ -44,6 +65,75 @@ class TestNormalize(unittest.TestCase):
 			self.assertEqual(e, normalize_eol(i))
 	
 	
+	def test_normalizer(self):
+		texts = [
+			u'',
+			u'abc',
+			u'ex  æquo\t\tŒuvre',
+			u'a \r\n b\r\rc\n\r d',
+			u' \t\r \r\n\u3000\u00a0\u2000x\u2001 ',
+			u' \u0301 e\u0301 ',
+			u'Ångström ĳ ᵫ café\u200b\ufeff',
+			u'한국어 ǆ ﬁ',
+		]
+		steps = [normalize_eol, collapse_spaces, remove_ligatures, remove_combining_marks]
+		for flags in xrange(16):
+			selection = [(flags >> i) & 1 == 1 for i in xrange(4)]
+			normalizer = Normalizer(*selection)
+			for text in texts:
+				expected = text
+				for selected, step in zip(selection, steps):
+					if selected:
+						expected = step(expected)
+				self.assertEqual(expected, normalizer.normalize(text), repr((selection, text)))
+				self.assertEqual(expected, normalizer(text))
+	
+	
+	def test_stream_normalizer(self):
+		text = u''.join([
+			u'ex  æquo\t\tŒuvre\r\n',
+			u'a \r\n b\r\rc\n\r d  ',
+			u' \t\r \r\n\u3000\u00a0\u2000x\u2001 ',
+			u' \u0301 e\u0301 Ångström ĳ ᵫ café\u200b\r',
+			u'한국어 ǆ ﬁ\r',
+		])
+		for flags in xrange(16):
+			selection = [(flags >> i) & 1 == 1 for i in xrange(4)]
+			expected = Normalizer(*selection).normalize(text)
+			normalizer = StreamNormalizer(*selection)
+			for size in (1, 2, 3, 5, 8, 1000):
+				chunks = [text[i:i+size] for i in xrange(0, len(text), size)]
+				self.assertEqual(expected, u''.join(normalizer.normalize_stream(chunks)), repr((selection, size)))
+				self.assertEqual(expected, u''.join(normalizer.normalize_stream(io.StringIO(text), chunk_size=size)))
+	
+	
+	def test_stream_normalizer_offsets(self):
+		text = u'ex  æquo\t\tŒuvre\r\n \u0301 e\u0301 Ångström ĳ  한국어\r\rcafe\u0301 '
+		normalizer = StreamNormalizer()
+		for size in (1, 3, 1000):
+			chunks = [text[i:i+size] for i in xrange(0, len(text), size)]
+			normalized = u''.join(normalizer.normalize_stream(chunks))
+			offsets = normalizer.offsets
+			self.assertEqual(len(text), offsets.original(len(normalized)))
+			# The words of the normalized text are the normalization of the original words
+			for match in re.finditer(ur'\w+', normalized, re.U):
+				start, end = offsets.original_span(*match.span())
+				self.assertEqual(match.group(0), normalizer.normalize(text[start:end]).strip(), repr(match.group(0)))
+			self.assertEqual((0, 2), offsets.original_span(0, 2))
+			self.assertEqual((4, 5), offsets.original_span(3, 5)) # æ
+	
+	
+	def test_offset_map(self):
+		offsets = OffsetMap()
+		self.assertEqual(5, offsets.original(5))
+		offsets.add(3, 3)
+		offsets.add(4, 6)
+		offsets.add(5, 6)
+		offsets.add(6, 7)
+		self.assertEqual(3, len(offsets))
+		self.assertEqual([0, 1, 2, 3, 6, 6, 7, 8], [offsets.original(i) for i in xrange(8)])
+	
+	
 
 def suite():
 	suite = unittest.TestSuite([
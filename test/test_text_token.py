@@ -1,7 +1,8 @@
 # -*- coding: UTF-8 -*-
 import unittest, doctest
 
-from tagenwa.text.token import is_eol, is_hexadecimal, is_term, is_word
+from tagenwa.text.token import is_eol, is_hexadecimal, is_term, is_word, classify_token, classify_tokens, \
+	TERM, WORD, EOL, HEXADECIMAL, NUMERIC, PUNCTUATION
 
 class TestToken(unittest.TestCase):	
 	
@@ -125,6 +126,39 @@ class TestToken(unittest.TestCase):
 		]
 		for i,e in testcases:
 			self.assertEqual(e, is_word(i), repr(i))
+	
+	
+	def test_classify_token(self):
+		tokens = [
+			u'abcde', u'abc-de', u'é', u'あ', u'a_b', u'abc_x1', u'ಠ_ಠ', u'a-b',
+			u'1', u'①', u'ⅱ', u'四', u'1.0', u'1000', u'1,000', u'1,000.00',
+			u'0x', u'0xABCDE', u'0x1234', u'0x12AB', u'0xFFFF', u'0xFFFG', u'x0x1',
+			u'_', u'-', u'--', u'=', u'.', u'。', u'...', u':',
+			u'', u' ', u'　', u'\t', u'\n', u'\r', u'\r\n', u'\n\n', u'a\n',
+		]
+		predicates = [(TERM, is_term), (WORD, is_word), (EOL, is_eol), (HEXADECIMAL, is_hexadecimal)]
+		for token in tokens:
+			flags = classify_token(token)
+			for flag, predicate in predicates:
+				self.assertEqual(predicate(token), bool(flags & flag), repr(token))
+		self.assertEqual([classify_token(t) for t in tokens], classify_tokens(tokens))
+	
+	
+	def test_classify_token_numeric_punctuation(self):
+		testcases = [
+			(u'1000', NUMERIC),
+			(u'①', NUMERIC),
+			(u'ⅱ', NUMERIC),
+			(u'1.0', 0),
+			(u'a1', 0),
+			(u'...', PUNCTUATION),
+			(u'。', PUNCTUATION),
+			(u'-', PUNCTUATION),
+			(u'=', 0),
+			(u'', 0),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, classify_token(i) & (NUMERIC | PUNCTUATION), repr(i))
 
 
 def suite():
@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+import unittest, doctest
+
+from tagenwa.tokenize.maxmatch import MaximumMatchingSegmenter
+from tagenwa.tokenize.treebank import GenericTreebankWordTokenizer
+
+
+class TestMaximumMatchingSegmenter(unittest.TestCase):
+
+	words = [u'東京', u'東京都', u'京都', u'都庁', u'に', u'行きます', u'ภาษา', u'ไทย', u'ภาษาไทย', u'コーヒー']
+	
+	def setUp(self):
+		self.longest = MaximumMatchingSegmenter(self.words)
+		self.minimum = MaximumMatchingSegmenter(self.words, method=u'minimum')
+	
+	
+	def test_doctest(self):
+		import tagenwa.tokenize.maxmatch
+		failure_count, test_count = doctest.testmod(tagenwa.tokenize.maxmatch)
+		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.tokenize.maxmatch: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_dictionary(self):
+		self.assertEqual(len(self.words), len(self.longest))
+		self.assertTrue(u'東京' in self.longest)
+		self.assertFalse(u'東' in self.longest)
+		self.assertRaises(ValueError, MaximumMatchingSegmenter, self.words, method=u'unknown')
+	
+	
+	def test_longest(self):
+		testcases = [
+			(u'', []),
+			(u'東京', [u'東京']),
+			(u'東京都庁', [u'東京都', u'庁']),
+			(u'東京都庁に行きます', [u'東京都', u'庁', u'に', u'行きます']),
+			(u'東西', [u'東', u'西']),
+			(u'ภาษาไทย', [u'ภาษาไทย']),
+			(u'コーヒー', [u'コーヒー']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.longest.segment(i))
+	
+	
+	def test_minimum(self):
+		testcases = [
+			(u'', []),
+			(u'東京', [u'東京']),
+			(u'東京都庁', [u'東京', u'都庁']),
+			(u'東京都庁に行きます', [u'東京', u'都庁', u'に', u'行きます']),
+			(u'東西', [u'東', u'西']),
+			(u'ภาษาไทย', [u'ภาษาไทย']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.minimum.segment(i))
+	
+	
+	def test_outside_runs(self):
+		testcases = [
+			(u'abc', [u'abc']),
+			(u'abc東京def', [u'abc', u'東京', u'def']),
+			(u'東京 2011', [u'東京', u' 2011']),
+			(u'京都。東京', [u'京都', u'。', u'東京']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.longest.segment(i))
+			self.assertEqual(e, self.minimum.segment(i))
+	
+	
+	def test_retokenize(self):
+		tokenizer = GenericTreebankWordTokenizer()
+		tokens = tokenizer.tokenize(u'Tokyo (東京都庁に行きます)')
+		self.assertEqual(
+			[u'Tokyo', u'(', u'東京', u'都庁', u'に', u'行きます', u')'],
+			list(self.minimum.retokenize(tokens))
+		)
+
+
+
+def suite():
+	suite = unittest.TestSuite([
+		unittest.TestLoader().loadTestsFromTestCase(TestMaximumMatchingSegmenter),
+	])
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
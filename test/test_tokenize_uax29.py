@@ -0,0 +1,143 @@
+# -*- coding: UTF-8 -*-
+import unittest, doctest
+
+from tagenwa.tokenize.uax29 import UAX29WordTokenizer, word_break
+from tagenwa.tokenize.treebank import get_tokenizer
+
+
+class TestWordBreak(unittest.TestCase):
+
+	def test_doctest(self):
+		import tagenwa.tokenize.uax29
+		failure_count, test_count = doctest.testmod(tagenwa.tokenize.uax29)
+		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.tokenize.uax29: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_word_break(self):
+		testcases = [
+			(u'\r', u'CR'),
+			(u'\n', u'LF'),
+			(u'\u2028', u'Newline'),
+			(u'\u0301', u'Extend'),
+			(u'\u200d', u'Extend'),
+			(u'\u00ad', u'Format'),
+			(u'\u200b', u'Other'),
+			(u'ア', u'Katakana'),
+			(u'ー', u'Katakana'),
+			(u'あ', u'Other'),
+			(u'気', u'Other'),
+			(u'々', u'ALetter'),
+			(u'ก', u'Other'),
+			(u'é', u'ALetter'),
+			(u'Ж', u'ALetter'),
+			(u':', u'MidLetter'),
+			(u',', u'MidNum'),
+			(u"'", u'MidNumLet'),
+			(u'’', u'MidNumLet'),
+			(u'7', u'Numeric'),
+			(u'१', u'Numeric'),
+			(u'７', u'Other'),
+			(u'_', u'ExtendNumLet'),
+			(u'\u00a0', u'Other'),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, word_break(i))
+
+
+
+class TestUAX29WordTokenizer(unittest.TestCase):
+
+	def setUp(self):
+		self.tokenizer = UAX29WordTokenizer()
+	
+	
+	def test_spaces(self):
+		testcases = [
+			(u'',       [], []),
+			(u' ',      [], [u' ']),
+			(u'   ',    [], [u' ', u' ', u' ']),
+			(u'\n\n',   [], [u'\n', u'\n']),
+			(u'\r\n',   [], [u'\r\n']),
+			(u'\r\r\n', [], [u'\r', u'\r\n']),
+		]
+		for i,e,e_space in testcases:
+			self.assertEqual(e, self.tokenizer.tokenize(i))
+			self.assertEqual(e_space, self.tokenizer.tokenize(i, no_space=False))
+	
+	
+	def test_sentence(self):
+		# Example from UAX #29
+		text = u'The quick (“brown”) fox can’t jump 32.3 feet, right?'
+		expected = [
+			u'The', u'quick', u'(', u'“', u'brown', u'”', u')', u'fox',
+			u'can’t', u'jump', u'32.3', u'feet', u',', u'right', u'?',
+		]
+		self.assertEqual(expected, self.tokenizer.tokenize(text))
+	
+	
+	def test_letters_numbers(self):
+		testcases = [
+			(u'a01',         [u'a01']),
+			(u'1,000.00',    [u'1,000.00']),
+			(u'1,,000',      [u'1', u',', u',', u'000']),
+			(u'3.',          [u'3', u'.']),
+			(u'e.g.',        [u'e.g', u'.']),
+			(u"l'homme",     [u"l'homme"]),
+			(u"'quoted'",    [u"'", u'quoted', u"'"]),
+			(u'foo_bar',     [u'foo_bar']),
+			(u'__init__',    [u'__init__']),
+			(u'a:b',         [u'a:b']),
+			(u'1:2',         [u'1', u':', u'2']),
+			(u'a-b',         [u'a', u'-', u'b']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.tokenizer.tokenize(i))
+	
+	
+	def test_extend_format(self):
+		testcases = [
+			(u'cafe\u0301',     [u'cafe\u0301']),
+			(u'cafe\u0301s',    [u'cafe\u0301s']),
+			(u'\u0301a',        [u'\u0301', u'a']),
+			(u'a\u00adb',       [u'a\u00adb']),
+			(u"can\u0301't",    [u"can\u0301't"]),
+			(u'\n\u0301\u0301',  [u'\u0301\u0301']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.tokenizer.tokenize(i))
+	
+	
+	def test_scripts(self):
+		testcases = [
+			(u'カタカナ',         [u'カタカナ']),
+			(u'ひらがな',         [u'ひ', u'ら', u'が', u'な']),
+			(u'東京タワーへ',     [u'東', u'京', u'タワー', u'へ']),
+			(u'Москва 2011',      [u'Москва', u'2011']),
+		]
+		for i,e in testcases:
+			self.assertEqual(e, self.tokenizer.tokenize(i))
+	
+	
+	def test_span_tokenize(self):
+		text = u' Hello, world!\r\n'
+		spans = self.tokenizer.span_tokenize(text)
+		self.assertEqual([(1, 6), (6, 7), (8, 13), (13, 14)], spans)
+		spans = self.tokenizer.span_tokenize(text, no_space=False)
+		self.assertEqual([(0, 1), (1, 6), (6, 7), (7, 8), (8, 13), (13, 14), (14, 16)], spans)
+	
+	
+	def test_get_tokenizer(self):
+		self.assertTrue(isinstance(get_tokenizer(u'fr', engine=u'uax29'), UAX29WordTokenizer))
+		self.assertRaises(ValueError, get_tokenizer, u'fr', engine=u'unknown')
+
+
+
+def suite():
+	suite = unittest.TestSuite([
+		unittest.TestLoader().loadTestsFromTestCase(TestWordBreak),
+		unittest.TestLoader().loadTestsFromTestCase(TestUAX29WordTokenizer),
+	])
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+import unittest, doctest
+import random
+import threading
+
+from tagenwa.utils.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+	def test_doctest(self):
+		import tagenwa.utils.cache
+		failure_count, test_count = doctest.testmod(tagenwa.utils.cache)
+		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.utils.cache: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_lru(self):
+		cache = LRUCache(3)
+		for key in 'abc':
+			cache[key] = key.upper()
+		self.assertEqual(['a', 'b', 'c'], cache.keys())
+		self.assertEqual('A', cache.get('a'))
+		self.assertEqual(['b', 'c', 'a'], cache.keys())
+		cache['b'] = 'B2'
+		self.assertEqual(['c', 'a', 'b'], cache.keys())
+		cache['d'] = 'D'
+		self.assertEqual(['a', 'b', 'd'], cache.keys())
+		self.assertFalse('c' in cache)
+		self.assertEqual('B2', cache.get('b'))
+		self.assertEqual('default', cache.get('c', 'default'))
+		self.assertEqual({'hits': 2, 'misses': 1, 'maxsize': 3, 'size': 3}, cache.info())
+		cache.clear()
+		self.assertEqual(0, len(cache))
+		self.assertEqual([], cache.keys())
+		cache['e'] = 'E'
+		self.assertEqual(['e'], cache.keys())
+		self.assertRaises(ValueError, LRUCache, 0)
+	
+	
+	def test_random(self):
+		# Compare with a list of the keys from the least to the most recently used
+		rng = random.Random(0)
+		cache = LRUCache(10)
+		keys = []
+		for i in xrange(2000):
+			key = rng.randint(0, 20)
+			if rng.random() < 0.5:
+				value = cache.get(key)
+				if key in keys:
+					self.assertEqual(key * 2, value)
+					keys.remove(key)
+					keys.append(key)
+				else:
+					self.assertEqual(None, value)
+			else:
+				cache[key] = key * 2
+				if key in keys:
+					keys.remove(key)
+				keys.append(key)
+				del keys[:-10]
+			self.assertEqual(keys, cache.keys())
+			self.assertEqual(len(keys), len(cache))
+	
+	
+	def test_threads(self):
+		# The linked list stays consistent with concurrent lookups and insertions
+		cache = LRUCache(50)
+		def work(seed):
+			rng = random.Random(seed)
+			for i in xrange(5000):
+				key = rng.randint(0, 100)
+				if cache.get(key) is None:
+					cache[key] = key
+		threads = [threading.Thread(target=work, args=(seed,)) for seed in xrange(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		keys = cache.keys()
+		self.assertEqual(len(cache), len(keys))
+		self.assertEqual(sorted(set(keys)), sorted(keys))
+		info = cache.info()
+		self.assertEqual(20000, info['hits'] + info['misses'])
+		self.assertTrue(all(cache.get(key) == key for key in keys))
+
+
+
+def suite():
+	suite = unittest.TestLoader().loadTestsFromTestCase(TestLRUCache)
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,7 +1,8 @@
 # -*- coding: UTF-8 -*-
 import unittest, doctest
+import itertools
 
-from tagenwa.utils.iterators import sliding_tuples, counts
+from tagenwa.utils.iterators import sliding_tuples, sliding_window, counts, merge_tagged, merge_tagged_spans
 
 
 class TestIterators(unittest.TestCase):
@@ -70,6 +71,61 @@ class TestIterators(unittest.TestCase):
 		]
 		for (i,e) in testcases:
 			self.assertEqual(e, list(sliding_tuples(*i)))
+			self.assertEqual(e, list(sliding_window(*i)))
+	
+	def test_sliding_window_short(self):
+		testcases = [
+			(
+				('', 3),
+				[(None,None,None), (None,None,None)]
+			),
+			(
+				('', 3, None, False, True),
+				[]
+			),
+			(
+				('a', 3, None, False, False),
+				[]
+			),
+			(
+				('ab', 3, None, True, False),
+				[(None,None,'a'), (None,'a','b')]
+			),
+			(
+				(iter('ab'), 3, 'x', False, True),
+				[('a','b','x'), ('b','x','x')]
+			),
+		]
+		for (i,e) in testcases:
+			self.assertEqual(e, list(sliding_window(*i)))
+	
+	def test_merge_tagged(self):
+		testcases = [
+			(
+				[],
+				[],
+				[]
+			),
+			(
+				[('a',1)],
+				[(['a'],1)],
+				[(0,1,1)]
+			),
+			(
+				[('a',1),('b',1),('c',2),('d',1),('e',1)],
+				[(['a','b'],1), (['c'],2), (['d','e'],1)],
+				[(0,2,1), (2,3,2), (3,5,1)]
+			),
+		]
+		for (i,e,e_spans) in testcases:
+			self.assertEqual(e, list(merge_tagged(i)))
+			self.assertEqual(e, list(merge_tagged(iter(i))))
+			self.assertEqual(e_spans, list(merge_tagged_spans(i)))
+		self.assertEqual([('ab',1), ('c',2)], list(merge_tagged([('a',1),('b',1),('c',2)], lambda x:''.join(x))))
+		# The iterable is read lazily
+		tagged = ((i, i // 3) for i in itertools.count())
+		self.assertEqual([([0,1,2],0), ([3,4,5],1)], list(itertools.islice(merge_tagged(tagged), 2)))
+		self.assertEqual(7, tagged.next()[0])
 
 
 
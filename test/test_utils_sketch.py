@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+import unittest, doctest
+import random
+from collections import Counter
+
+from tagenwa.utils.sketch import MisraGries
+
+
+class TestMisraGries(unittest.TestCase):
+
+	def test_doctest(self):
+		import tagenwa.utils.sketch
+		failure_count, test_count = doctest.testmod(tagenwa.utils.sketch)
+		self.assertEqual(failure_count, 0, 'Testing doctest from tagenwa.utils.sketch: %i failed out of %i' % (failure_count, test_count))
+	
+	
+	def test_exact(self):
+		summary = MisraGries(10)
+		summary.update('abcab')
+		summary.update_counts({'a': 3, 'z': 1})
+		self.assertEqual(dict(Counter('abcab') + Counter({'a': 3, 'z': 1})), summary.counts)
+		self.assertEqual(9, summary.n)
+		self.assertEqual(0, summary.error)
+		self.assertEqual(5, summary['a'])
+		self.assertEqual(0, summary['x'])
+		self.assertTrue('z' in summary)
+		self.assertEqual(4, len(summary))
+		self.assertRaises(ValueError, MisraGries, 0)
+	
+	
+	def test_bounds(self):
+		rng = random.Random(0)
+		stream = [int(rng.paretovariate(1.0)) for i in xrange(20000)]
+		exact = Counter(stream)
+		summary = MisraGries(20)
+		summary.update(stream)
+		self.assertEqual(len(stream), summary.n)
+		self.assertTrue(len(summary) <= 40)
+		self.assertTrue(0 < summary.error <= len(stream) // 21)
+		for item, c in exact.iteritems():
+			self.assertTrue(c - summary.error <= summary[item] <= c)
+			if c > summary.error:
+				self.assertTrue(item in summary)
+	
+	
+	def test_merge(self):
+		rng = random.Random(1)
+		stream = [int(rng.paretovariate(1.0)) for i in xrange(10000)]
+		exact = Counter(stream)
+		summary1, summary2 = MisraGries(10), MisraGries(10)
+		summary1.update(stream[:5000])
+		summary2.update(stream[5000:])
+		summary1.merge(summary2)
+		self.assertEqual(len(stream), summary1.n)
+		self.assertTrue(summary1.error <= len(stream) // 11)
+		for item, c in exact.iteritems():
+			self.assertTrue(c - summary1.error <= summary1[item] <= c)
+
+
+
+def suite():
+	suite = unittest.TestLoader().loadTestsFromTestCase(TestMisraGries)
+	return suite
+
+if __name__ == '__main__':
+	unittest.main()